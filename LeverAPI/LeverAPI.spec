@@ -1,7 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_submodules
 
-hiddenimports = ['engineio.async_drivers.eventlet', 'eventlet.hubs.epolls', 'eventlet.hubs.kqueue', 'eventlet.hubs.selects', 'api.discovery', 'api.device_manager', 'api.transformers', 'api.cache']
+hiddenimports = ['engineio.async_drivers.eventlet', 'eventlet.hubs.epolls', 'eventlet.hubs.kqueue', 'eventlet.hubs.selects', 'api.discovery', 'api.device_manager', 'api.transformers', 'api.cache', 'api.delta', 'api.metrics', 'api.frame_clock', 'api.sse', 'api.slots', 'api.registry', 'api.registry_store', 'api.ingest', 'api.serial_source', 'api.simulation', 'api.replay', 'api.columnar', 'api.recorder', 'api.session_reader', 'api.session_stream', 'api.analytics', 'api.history', 'api.export', 'api.sketch', 'api.socket_metrics', 'serial', 'numpy']
 hiddenimports += collect_submodules('dns')
 
 
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+セッション分析モジュール
+
+記録したセッションのレコードをデバイスごとの配列にまとめ、分位点、値の範囲ごとの滞在時間、
+動作回数、レバー間の反応時間、レバー間の相関をNumPyの配列演算で求めます。
+"""
+
+import time
+import json
+import logging
+
+import numpy as np
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+DEFAULT_PARAMS = {
+    "percentiles": (5, 25, 50, 75, 95),  # 求める分位点（%）
+    "bands": (0, 20, 40, 60, 80, 100),  # 滞在時間を集計する値の範囲の境界
+    "move_threshold": 5.0,  # 動作とみなす値の変化幅
+    "deadband": 0.0,  # この変化量以下のサンプル間の変化は静止とみなす
+    "max_gap": 2.0,  # サンプル間隔がこれ以上空いた区間は滞在時間・動作に数えない（秒）
+    "reaction_window": 2.0,  # 反応時間とみなす、他のレバーの動作開始からの最大時間（秒）
+    "resample": 0.1  # 相関を求めるときの再標本化の間隔（秒）
+}
+MAX_BANDS = 100  # 値の範囲の最大数
+MIN_RESAMPLE = 0.01  # 再標本化の最小間隔（秒）
+MAX_RESAMPLE_POINTS = 5_000_000  # 再標本化の最大点数（デバイスあたり）
+
+
+def parse_params(args):
+    """
+    クエリパラメータから分析の設定を作成
+
+    Args:
+        args (dict): クエリパラメータ（文字列、省略した項目はデフォルト値）
+
+    Returns:
+        dict: 分析の設定
+
+    Raises:
+        ValueError: 値が不正な場合
+    """
+    params = dict(DEFAULT_PARAMS)
+    for key in ("percentiles", "bands"):
+        if args.get(key):
+            params[key] = tuple(float(v) for v in args[key].split(","))
+    for key in ("move_threshold", "deadband", "max_gap", "reaction_window", "resample"):
+        if args.get(key):
+            params[key] = float(args[key])
+
+    if not all(0 <= p <= 100 for p in params["percentiles"]):
+        raise ValueError("percentiles は0から100の範囲で指定してください")
+    bands = params["bands"]
+    if not 2 <= len(bands) <= MAX_BANDS + 1 or any(b <= a for a, b in zip(bands, bands[1:])):
+        raise ValueError(f"bands は昇順の境界を2個から{MAX_BANDS + 1}個で指定してください")
+    for key in ("move_threshold", "deadband", "max_gap", "reaction_window"):
+        if not np.isfinite(params[key]) or params[key] < 0:
+            raise ValueError(f"{key} は0以上の数値で指定してください")
+    if not np.isfinite(params["resample"]) or params["resample"] < MIN_RESAMPLE:
+        raise ValueError(f"resample は{MIN_RESAMPLE}以上で指定してください")
+    return params
+
+
+def cache_key(session_id, params, start=None, end=None, devices=None):
+    """
+    分析結果のキャッシュキーを作成
+
+    Args:
+        session_id (str): セッションID
+        params (dict): 分析の設定
+        start (float, optional): 開始位置（セッション開始からの秒）
+        end (float, optional): 終了位置（セッション開始からの秒）
+        devices (list, optional): 対象のデバイスID
+
+    Returns:
+        str: キャッシュキー
+    """
+    return json.dumps([session_id, params, start, end, sorted(devices) if devices else None], sort_keys=True)
+
+
+def load_device_arrays(reader, start=None, end=None, devices=None):
+    """
+    セッションのレコードをデバイスごとの時刻順の配列にまとめる
+
+    Args:
+        reader (SessionReader): セッションの読み取り
+        start (float, optional): 開始時刻（UNIX秒）
+        end (float, optional): 終了時刻（UNIX秒）
+        devices (list, optional): 対象のデバイスID
+
+    Returns:
+        dict: {device_id: (時刻 ndarray（セッション開始からの秒）, 値 ndarray)}
+    """
+    views = reader.slice(start, end)
+    if not views:
+        return {}
+
+    started_at = reader.started_at
+    t = np.concatenate([view["ts"] / 1000 + (base_time - started_at) for base_time, view in views])
+    slots = np.concatenate([view["slot"] for _, view in views])
+    values = np.concatenate([view["value"] for _, view in views]).astype(np.float64)
+
+    if devices is not None:
+        mask = np.isin(slots, reader.slots_for(devices))
+        t, slots, values = t[mask], slots[mask], values[mask]
+
+    # スロットごと・時刻順に並べ、スロットの境界で分割する
+    order = np.lexsort((t, slots))
+    t, slots, values = t[order], slots[order], values[order]
+    bounds = np.flatnonzero(np.diff(slots)) + 1
+    names = reader.devices
+    return {
+        names[int(slot_group[0])]: (t_group, v_group)
+        for slot_group, t_group, v_group in zip(np.split(slots, bounds), np.split(t, bounds), np.split(values, bounds))
+        if len(slot_group)
+    }
+
+
+def _number(value):
+    """JSONに変換できる数値（NaNはNone）"""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _hold_durations(t, max_gap):
+    """各サンプルが次のサンプルまで保持された時間（間隔が max_gap 以上の区間は0）"""
+    dt = np.diff(t, append=t[-1])
+    dt[dt >= max_gap] = 0.0
+    return dt
+
+
+def _band_times(t, values, params):
+    """値の範囲ごとの滞在時間"""
+    edges = np.asarray(params["bands"], dtype=np.float64)
+    dt = _hold_durations(t, params["max_gap"])
+    # 範囲外の値は最初・最後の範囲に含める（最後の範囲は上限を含む）
+    index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    seconds = np.bincount(index, weights=dt, minlength=len(edges) - 1)
+    total = seconds.sum()
+    return [{
+        "from": _number(edges[i]),
+        "to": _number(edges[i + 1]),
+        "seconds": _number(seconds[i]),
+        "ratio": _number(seconds[i] / total) if total > 0 else None
+    } for i in range(len(edges) - 1)]
+
+
+def _movements(t, values, params):
+    """
+    動作（静止から静止までの連続した変化）を検出
+
+    Returns:
+        tuple: (動作の開始時刻 ndarray, 変化幅 ndarray, 所要時間 ndarray)
+    """
+    empty = np.empty(0)
+    if len(values) < 2:
+        return empty, empty, empty
+
+    moving = (np.abs(np.diff(values)) > params["deadband"]) & (np.diff(t) < params["max_gap"])
+    edges = np.diff(np.concatenate(([0], moving.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)  # 動作の最初のサンプル
+    ends = np.flatnonzero(edges == -1)  # 動作の最後のサンプル
+    if not len(starts):
+        return empty, empty, empty
+
+    # 動作ごとの最大値と最小値の差を変化幅とする（往復した場合も含める）
+    bounds = np.column_stack((starts, ends + 1)).ravel()
+    if bounds[-1] >= len(values):
+        bounds = bounds[:-1]  # 末尾まで続く動作は配列の終わりまでを集計する
+    peaks = np.maximum.reduceat(values, bounds)[::2]
+    troughs = np.minimum.reduceat(values, bounds)[::2]
+    amplitude = peaks - troughs
+    keep = amplitude >= params["move_threshold"]
+    return t[starts][keep], amplitude[keep], (t[ends] - t[starts])[keep]
+
+
+def _summary(values, params):
+    """値の統計と分位点"""
+    percentiles = np.percentile(values, params["percentiles"])
+    return {
+        "min": _number(values.min()),
+        "max": _number(values.max()),
+        "mean": _number(values.mean()),
+        "std": _number(values.std()),
+        "percentiles": {f"p{p:g}": _number(v) for p, v in zip(params["percentiles"], percentiles)}
+    }
+
+
+def _reaction_times(move_starts, window):
+    """レバーの組ごとに、先に動いたレバーの動作開始から後のレバーの動作開始までの時間"""
+    results = []
+    for leader, leader_starts in move_starts.items():
+        if not len(leader_starts):
+            continue
+        for follower, follower_starts in move_starts.items():
+            if follower == leader or not len(follower_starts):
+                continue
+            # 後のレバーの各動作について、直前に始まった先のレバーの動作を探す
+            index = np.searchsorted(leader_starts, follower_starts, side="right") - 1
+            valid = index >= 0
+            lags = follower_starts[valid] - leader_starts[index[valid]]
+            lags = lags[lags <= window]
+            if not len(lags):
+                continue
+            results.append({
+                "leader": leader,
+                "follower": follower,
+                "count": int(len(lags)),
+                "mean": _number(lags.mean()),
+                "median": _number(np.median(lags)),
+                "p95": _number(np.percentile(lags, 95))
+            })
+    return results
+
+
+def _correlation(arrays, resample):
+    """共通の時刻に再標本化（直前の値を保持）した値の相関行列"""
+    ids = [device_id for device_id, (t, _) in arrays.items() if len(t) > 1]
+    if len(ids) < 2:
+        return {"devices": ids, "matrix": [[1.0] for _ in ids]}
+
+    begin = max(arrays[d][0][0] for d in ids)  # 全デバイスの値が揃った時刻から
+    finish = min(arrays[d][0][-1] for d in ids)
+    if finish <= begin:
+        return {"devices": ids, "matrix": None}
+    step = max(resample, (finish - begin) / MAX_RESAMPLE_POINTS)
+    grid = np.arange(begin, finish, step)
+
+    matrix = np.empty((len(ids), len(grid)))
+    for row, device_id in enumerate(ids):
+        t, values = arrays[device_id]
+        matrix[row] = values[np.searchsorted(t, grid, side="right") - 1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.corrcoef(matrix)
+    return {
+        "devices": ids,
+        "matrix": [[_number(v) for v in row] for row in corr],
+        "resample": step,
+        "points": int(len(grid))
+    }
+
+
+def analyze(arrays, params):
+    """
+    デバイスごとの配列から分析結果を求める
+
+    Args:
+        arrays (dict): {device_id: (時刻 ndarray（秒）, 値 ndarray)}（load_device_arrays の戻り値）
+        params (dict): 分析の設定（parse_params の戻り値）
+
+    Returns:
+        dict: デバイスごとの統計（分位点・滞在時間・動作回数）、反応時間、相関
+    """
+    started = time.perf_counter()
+    devices = {}
+    move_starts = {}
+    for device_id, (t, values) in arrays.items():
+        starts, amplitude, durations = _movements(t, values, params)
+        move_starts[device_id] = starts
+        duration = float(t[-1] - t[0])
+        devices[device_id] = {
+            "samples": int(len(values)),
+            "first": _number(t[0]),
+            "last": _number(t[-1]),
+            **_summary(values, params),
+            "bands": _band_times(t, values, params),
+            "movements": {
+                "count": int(len(starts)),
+                "per_minute": _number(len(starts) / duration * 60) if duration > 0 else None,
+                "mean_amplitude": _number(amplitude.mean()) if len(amplitude) else None,
+                "mean_duration": _number(durations.mean()) if len(durations) else None
+            }
+        }
+
+    result = {
+        "devices": devices,
+        "reaction_times": _reaction_times(move_starts, params["reaction_window"]),
+        "correlation": _correlation(arrays, params["resample"]),
+        "records": int(sum(len(t) for t, _ in arrays.values())),
+        "params": params
+    }
+    result["elapsed"] = time.perf_counter() - started
+    return result
@@ -31,15 +31,18 @@ class ValueCache:
         self.lock = Lock()  # スレッドセーフ操作のためのロック
         self.hit_count = 0  # キャッシュヒット数
         self.miss_count = 0  # キャッシュミス数
+        self.version_miss_count = 0  # バージョン不一致による無効化数
+        self.eviction_count = 0  # 期限切れ・無効化で削除したエントリ数
         self.created_at = time.time()  # キャッシュ作成時間
 
-    def get(self, key, ttl=None):
+    def get(self, key, ttl=None, version=None):
         """
         キャッシュから値を取得
 
         Args:
             key (str): キャッシュキー
             ttl (float, optional): このリクエスト用のTTL（指定がなければデフォルト値）
+            version (int, optional): 元データのバージョン。保存時と異なる場合は無効として扱う
 
         Returns:
             any: キャッシュされた値、または無効/不存在の場合はNone
@@ -50,6 +53,14 @@ class ValueCache:
 
             if key in self.cache:
                 cache_entry = self.cache[key]
+                # 元データのバージョンが変わっていれば無効
+                if version is not None and cache_entry.get('version') != version:
+                    del self.cache[key]
+                    self.version_miss_count += 1
+                    self.eviction_count += 1
+                    self.miss_count += 1
+                    logger.debug(f"キャッシュバージョン不一致: {key}")
+                    return None
                 # キャッシュが有効期限内かチェック
                 if current_time - cache_entry['timestamp'] < cache_entry['ttl']:
                     self.hit_count += 1
@@ -58,13 +69,14 @@ class ValueCache:
                 else:
                     # 有効期限切れのエントリを削除
                     del self.cache[key]
+                    self.eviction_count += 1
                     logger.debug(f"キャッシュ期限切れ: {key}")
 
             self.miss_count += 1
             logger.debug(f"キャッシュミス: {key}")
             return None
 
-    def set(self, key, value, ttl=None):
+    def set(self, key, value, ttl=None, version=None):
         """
         値をキャッシュに保存
 
@@ -72,6 +84,7 @@ class ValueCache:
             key (str): キャッシュキー
             value (any): 保存する値
             ttl (float, optional): このエントリのTTL（指定がなければデフォルト値）
+            version (int, optional): 元データのバージョン
 
         Returns:
             bool: 保存が成功した場合True
@@ -81,7 +94,8 @@ class ValueCache:
             self.cache[key] = {
                 'value': value,
                 'timestamp': time.time(),
-                'ttl': ttl
+                'ttl': ttl,
+                'version': version
             }
             logger.debug(f"キャッシュ保存: {key}, TTL: {ttl}秒")
             return True
@@ -100,12 +114,14 @@ class ValueCache:
             if key:
                 if key in self.cache:
                     del self.cache[key]
+                    self.eviction_count += 1
                     logger.debug(f"キャッシュ無効化: {key}")
                     return 1
                 return 0
             else:
                 count = len(self.cache)
                 self.cache.clear()
+                self.eviction_count += count
                 logger.debug(f"全キャッシュ無効化: {count}エントリ")
                 return count
 
@@ -159,6 +175,7 @@ class ValueCache:
             # 特定したエントリを削除
             for key in keys_to_remove:
                 del self.cache[key]
+            self.eviction_count += len(keys_to_remove)
 
             logger.debug(f"キャッシュクリーンアップ: {len(keys_to_remove)}エントリ削除")
             return len(keys_to_remove)
@@ -178,6 +195,8 @@ class ValueCache:
                 'size': len(self.cache),
                 'hit_count': self.hit_count,
                 'miss_count': self.miss_count,
+                'version_miss_count': self.version_miss_count,
+                'eviction_count': self.eviction_count,
                 'hit_rate': hit_rate,
                 'uptime': time.time() - self.created_at
             }
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+列形式ログモジュール
+
+positionVisualizer のセッションログ（[{"id", "value", "ts"}, ...] のJSON）を逐次解析し、
+デバイスごとのタイムスタンプ配列と値配列からなる列形式（.lvc）に変換します。
+列形式はNumPyの .npz と同じZIPコンテナで、任意で圧縮でき、np.load でそのまま読み込めます。
+
+変換中にメモリ上に保持するレコード数には上限があり、超えた分はデバイスごとの一時ファイルに書き出すため、
+ログの長さに関わらずメモリ使用量は一定です。
+"""
+
+import os
+import json
+import array
+import logging
+import tempfile
+import zipfile
+
+import numpy as np
+
+from .replay import iter_log_records, LogFormatError
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+COLUMNAR_SUFFIX = ".lvc"  # 列形式ログの拡張子
+FORMAT_NAME = "lever-columnar"  # メタデータに記録する形式名
+FORMAT_VERSION = 1  # ファイル形式のバージョン
+META_MEMBER = "meta.json"  # メタデータのメンバー名
+SPILL_RECORDS = 1 << 20  # メモリ上に保持するレコード数の上限（超えると一時ファイルに書き出す）
+COPY_CHUNK = 1 << 18  # 一時ファイルからコンテナへ書き込む単位（レコード数）
+_PAIR_DTYPE = np.dtype([("ts", "<f8"), ("value", "<f8")])  # 一時ファイルのレコード
+
+
+def _member_names(index):
+    """デバイスの列のメンバー名（タイムスタンプ, 値）"""
+    return f"d{index}_ts", f"d{index}_value"
+
+
+class _Column:
+    """変換中の1デバイス分の列（上限を超えた分は一時ファイルに書き出す）"""
+
+    def __init__(self, log_id):
+        self.log_id = log_id
+        self.ts = array.array("d")
+        self.values = array.array("d")
+        self.spill = None  # 一時ファイル（(ts, value) のfloat64の組）
+        self.count = 0
+        self.ts_integral = True
+        self.value_integral = True
+        self.value_min = None
+        self.value_max = None
+
+    def append(self, ts, value):
+        self.ts.append(ts)
+        self.values.append(value)
+        self.count += 1
+        if self.ts_integral and not ts.is_integer():
+            self.ts_integral = False
+        if self.value_integral and not value.is_integer():
+            self.value_integral = False
+        if self.value_min is None or value < self.value_min:
+            self.value_min = value
+        if self.value_max is None or value > self.value_max:
+            self.value_max = value
+
+    def flush(self):
+        """メモリ上のレコードを一時ファイルに書き出す"""
+        if not self.ts:
+            return
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile()
+        pairs = np.empty(len(self.ts), dtype=_PAIR_DTYPE)
+        pairs["ts"] = np.frombuffer(self.ts, dtype=np.float64)
+        pairs["value"] = np.frombuffer(self.values, dtype=np.float64)
+        self.spill.write(pairs.tobytes())
+        self.ts = array.array("d")
+        self.values = array.array("d")
+
+    def dtypes(self):
+        """列のデータ型（整数のみの列は整数型にして小さくする）"""
+        ts_dtype = np.dtype("<i8") if self.ts_integral else np.dtype("<f8")
+        if self.value_integral and self.value_min is not None and -32768 <= self.value_min and self.value_max <= 32767:
+            value_dtype = np.dtype("<i2")
+        elif self.value_integral:
+            value_dtype = np.dtype("<i8")
+        else:
+            value_dtype = np.dtype("<f8")
+        return ts_dtype, value_dtype
+
+    def iter_chunks(self):
+        """書き出したレコードを先頭から一定数ずつ読み込む"""
+        self.flush()
+        if self.spill is None:
+            return
+        self.spill.seek(0)
+        while True:
+            data = self.spill.read(COPY_CHUNK * _PAIR_DTYPE.itemsize)
+            if not data:
+                return
+            yield np.frombuffer(data, dtype=_PAIR_DTYPE)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+
+def _write_member(zf, name, dtype, count, chunks):
+    """NumPyの .npy 形式のメンバーを逐次書き込む"""
+    with zf.open(f"{name}.npy", "w", force_zip64=True) as fp:
+        np.lib.format.write_array_header_1_0(fp, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (count,)
+        })
+        for chunk in chunks:
+            fp.write(chunk.astype(dtype).tobytes())
+
+
+def convert_log(src, dst, compress=False):
+    """
+    JSONのセッションログを列形式に変換
+
+    Args:
+        src (str): 変換元のJSONログのパス
+        dst (str): 変換先の列形式ログのパス
+        compress (bool): Trueの場合はDeflateで圧縮
+
+    Returns:
+        dict: レコード数、デバイス数、読み飛ばしたレコード数、変換前後のサイズ
+
+    Raises:
+        LogFormatError: ログの形式が不正な場合
+        OSError: ファイルを読み書きできない場合
+    """
+    columns = {}
+    buffered = 0
+    skipped = 0
+    try:
+        for record in iter_log_records(src):
+            try:
+                log_id = record["id"]
+                ts = float(record["ts"])
+                value = float(record["value"])
+                column = columns.get(log_id)
+            except (KeyError, TypeError, ValueError):
+                skipped += 1  # 欠損したレコードは読み飛ばす（再生時と同じ）
+                continue
+            if column is None:
+                column = columns[log_id] = _Column(log_id)
+            column.append(ts, value)
+            buffered += 1
+            if buffered >= SPILL_RECORDS:
+                for c in columns.values():
+                    c.flush()
+                buffered = 0
+
+        ordered = list(columns.values())
+        records = sum(c.count for c in ordered)
+        meta = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "source": os.path.basename(src),
+            "ids": [c.log_id for c in ordered],
+            "records": records,
+            "counts": [c.count for c in ordered]
+        }
+
+        # 一時ファイルに書き込んでから置き換える（途中で失敗しても既存のファイルを壊さない）
+        tmp_path = f"{dst}.tmp"
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(tmp_path, "w", compression=compression, allowZip64=True) as zf:
+            zf.writestr(META_MEMBER, json.dumps(meta, ensure_ascii=False))
+            for index, column in enumerate(ordered):
+                ts_name, value_name = _member_names(index)
+                ts_dtype, value_dtype = column.dtypes()
+                _write_member(zf, ts_name, ts_dtype, column.count, (c["ts"] for c in column.iter_chunks()))
+                _write_member(zf, value_name, value_dtype, column.count, (c["value"] for c in column.iter_chunks()))
+        os.replace(tmp_path, dst)
+    finally:
+        for column in columns.values():
+            column.close()
+
+    result = {
+        "records": records,
+        "devices": len(ordered),
+        "skipped": skipped,
+        "source_size": os.path.getsize(src),
+        "size": os.path.getsize(dst),
+        "compressed": bool(compress)
+    }
+    logger.info(f"列形式に変換: {os.path.basename(src)} -> {os.path.basename(dst)} "
+                f"({records}レコード, {result['source_size']} -> {result['size']}バイト)")
+    return result
+
+
+def read_columnar_meta(path):
+    """
+    列形式ログのメタデータを読み込む
+
+    Args:
+        path (str): 列形式ログのパス
+
+    Returns:
+        dict: メタデータ（ids, records, counts など）
+
+    Raises:
+        LogFormatError: 列形式ログではない場合
+    """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            meta = json.loads(zf.read(META_MEMBER))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise LogFormatError(f"列形式ログではありません: {path} - {e}")
+    if not isinstance(meta, dict) or meta.get("format") != FORMAT_NAME:
+        raise LogFormatError(f"列形式ログではありません: {path}")
+    if meta.get("version") != FORMAT_VERSION:
+        raise LogFormatError(f"未対応の列形式ログのバージョンです: {meta.get('version')}")
+    return meta
+
+
+def load_columnar(path):
+    """
+    列形式ログをNumPy配列として読み込む
+
+    Args:
+        path (str): 列形式ログのパス
+
+    Returns:
+        dict: {ログのid: (タイムスタンプ ndarray（ミリ秒）, 値 ndarray)}（ログ内の登場順）
+
+    Raises:
+        LogFormatError: 列形式ログではない場合
+    """
+    meta = read_columnar_meta(path)
+    columns = {}
+    with np.load(path, allow_pickle=False) as data:
+        for index, log_id in enumerate(meta["ids"]):
+            ts_name, value_name = _member_names(index)
+            columns[log_id] = (data[ts_name], data[value_name])
+    return columns
+
+
+def iter_columnar_records(path):
+    """
+    列形式ログをJSONログと同じレコードとして時刻順に読み込む
+
+    同じ時刻のレコードはログ内のデバイスの登場順に並びます。
+
+    Args:
+        path (str): 列形式ログのパス
+
+    Yields:
+        dict: {"id", "value", "ts"}
+    """
+    columns = load_columnar(path)
+    if not columns:
+        return
+    ids = list(columns)
+    ts = np.concatenate([column[0] for column in columns.values()])
+    device = np.concatenate([np.full(len(column[0]), i, dtype=np.int32) for i, column in enumerate(columns.values())])
+    values = np.concatenate([column[1] for column in columns.values()])
+    order = np.argsort(ts, kind="stable")
+
+    for start in range(0, len(order), COPY_CHUNK):
+        part = order[start:start + COPY_CHUNK]
+        for d, value, t in zip(device[part].tolist(), values[part].tolist(), ts[part].tolist()):
+            yield {"id": ids[d], "value": value, "ts": t}
+
+
+def write_legacy_json(src, dst, indent=2):
+    """
+    列形式ログをJSONログ（generate-log.js と同じ配列形式）に戻す
+
+    Args:
+        src (str): 列形式ログのパス
+        dst (str): 出力するJSONログのパス
+        indent (int): インデント幅（Noneまたは0で改行なし）
+
+    Returns:
+        int: 書き込んだレコード数
+    """
+    if indent:
+        pad = " " * indent
+        inner = pad * 2
+        template = pad + "{{\n" + inner + '"id": {},\n' + inner + '"value": {},\n' + inner + '"ts": {}\n' + pad + "}}"
+        separator, opening, closing = ",\n", "[\n", "\n]"
+    else:
+        template = '{{"id":{},"value":{},"ts":{}}}'
+        separator, opening, closing = ",", "[", "]"
+
+    count = 0
+    tmp_path = f"{dst}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(opening)
+        batch = []
+        for record in iter_columnar_records(src):
+            batch.append(template.format(json.dumps(record["id"], ensure_ascii=False), record["value"], record["ts"]))
+            if len(batch) >= COPY_CHUNK:
+                f.write((separator if count else "") + separator.join(batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            f.write((separator if count else "") + separator.join(batch))
+            count += len(batch)
+        f.write(closing if count else "]")
+    os.replace(tmp_path, dst)
+    return count
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+差分フレームモジュール
+
+WebSocketクライアントごとに送信済み・確認応答済みの状態を保持し、
+前回から変化したフィールドだけを含む差分フレームを生成します。
+変化がない更新（ハートビート）はフィールドを含まない空の差分として、
+レコードからなくなったフィールドは removed として送信します。
+一定フレームごと、または要求があった場合はキーフレーム（全フィールド）を送信します。
+"""
+
+import logging
+from threading import Lock
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+DEFAULT_KEYFRAME_INTERVAL = 50  # キーフレームを送信するフレーム間隔
+DEFAULT_TIMESTAMP_TOLERANCE = 0.25  # フレーム時刻との差がこの秒数以内ならデバイス時刻を省略
+FRAME_RELATIVE_FIELDS = ("timestamp", "timestamp_formatted")  # フレーム時刻から復元できるフィールド
+
+
+class _ClientState:
+    """単一クライアントの差分送信状態"""
+
+    def __init__(self, keyframe_interval):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0  # 最後に送信したフレーム番号
+        self.acked_seq = 0  # クライアントが確認応答した最新のフレーム番号
+        self.frames_since_keyframe = 0
+        self.force_keyframe = True  # 初回は必ずキーフレーム
+        self.sent = {}  # {device_id: record} 送信済みフレームを全て適用した状態
+        self.acked = {}  # {device_id: record} 確認応答済みの状態
+        self.pending = {}  # {seq: {device_id: record}} 確認応答待ちのフレーム
+
+
+class DeltaEncoder:
+    """クライアントごとの差分フレームを生成するクラス"""
+
+    def __init__(self, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 timestamp_tolerance=DEFAULT_TIMESTAMP_TOLERANCE, max_pending=64):
+        """
+        初期化
+
+        Args:
+            keyframe_interval (int): デフォルトのキーフレーム間隔（フレーム数）
+            timestamp_tolerance (float): デバイス時刻を省略できるフレーム時刻との差（秒）
+            max_pending (int): 確認応答待ちフレームの上限。超えた場合は次回キーフレームを送信
+        """
+        self.keyframe_interval = keyframe_interval
+        self.timestamp_tolerance = timestamp_tolerance
+        self.max_pending = max_pending
+        self.clients = {}  # {client_id: _ClientState}
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+
+    def register(self, client_id, keyframe_interval=None):
+        """
+        差分モードのクライアントを登録
+
+        Args:
+            client_id (str): クライアントID（Socket.IOのsid）
+            keyframe_interval (int, optional): このクライアント用のキーフレーム間隔
+        """
+        interval = keyframe_interval if keyframe_interval else self.keyframe_interval
+        with self.lock:
+            self.clients[client_id] = _ClientState(max(1, int(interval)))
+        logger.debug(f"差分モードクライアント登録: {client_id} (キーフレーム間隔: {interval})")
+
+    def unregister(self, client_id):
+        """
+        クライアントの登録を解除
+
+        Args:
+            client_id (str): クライアントID
+
+        Returns:
+            bool: 登録されていた場合True
+        """
+        with self.lock:
+            return self.clients.pop(client_id, None) is not None
+
+    def is_registered(self, client_id):
+        """クライアントが差分モードで登録されているかどうか"""
+        with self.lock:
+            return client_id in self.clients
+
+    def client_ids(self):
+        """
+        登録済みクライアントIDの一覧を取得
+
+        Returns:
+            list: クライアントIDのリスト
+        """
+        with self.lock:
+            return list(self.clients.keys())
+
+    def request_keyframe(self, client_id):
+        """次回のフレームをキーフレームにする"""
+        with self.lock:
+            state = self.clients.get(client_id)
+            if state:
+                state.force_keyframe = True
+
+    def forget_device(self, device_id):
+        """
+        切断されたデバイスの状態を全クライアントから削除
+
+        Args:
+            device_id (str): デバイスID
+        """
+        with self.lock:
+            for state in self.clients.values():
+                state.sent.pop(device_id, None)
+                state.acked.pop(device_id, None)
+
+    def encode(self, client_id, updates, timestamp):
+        """
+        クライアント向けの差分フレームを生成
+
+        Args:
+            client_id (str): クライアントID
+            updates (dict): デバイスIDをキーとする最新レコードの辞書
+            timestamp (float): フレーム時刻
+
+        Returns:
+            dict: 差分フレーム。未登録クライアントまたは送信不要の場合はNone
+        """
+        with self.lock:
+            state = self.clients.get(client_id)
+            if state is None:
+                return None
+
+            keyframe = (state.force_keyframe
+                        or state.frames_since_keyframe + 1 >= state.keyframe_interval
+                        or len(state.pending) >= self.max_pending)
+
+            removed = {}
+            if keyframe:
+                # キーフレームは送信済みの全デバイスを含めて状態を再同期する
+                records = dict(state.sent)
+                records.update(updates)
+                payload = {device_id: dict(record) for device_id, record in records.items()}
+            else:
+                if not updates:
+                    return None
+                # 変化がないデバイスも空の差分として含め、更新（ハートビート）が届いたことを伝える
+                payload = {}
+                for device_id, record in updates.items():
+                    payload[device_id], removed_keys = self._diff(record, state.acked.get(device_id),
+                                                                  state.sent.get(device_id), timestamp)
+                    if removed_keys:
+                        removed[device_id] = removed_keys
+
+            state.seq += 1
+            for device_id, record in updates.items():
+                state.sent[device_id] = dict(record)
+            state.pending[state.seq] = {device_id: state.sent[device_id] for device_id in updates}
+
+            if keyframe:
+                state.force_keyframe = False
+                state.frames_since_keyframe = 0
+                state.pending = {state.seq: dict(state.sent)}
+            else:
+                state.frames_since_keyframe += 1
+
+            frame = {
+                "seq": state.seq,
+                "base": state.acked_seq,
+                "keyframe": keyframe,
+                "timestamp": timestamp,
+                "updates": payload
+            }
+            if removed:
+                frame["removed"] = removed
+            return frame
+
+    def acknowledge(self, client_id, seq):
+        """
+        クライアントからの確認応答を反映
+
+        Args:
+            client_id (str): クライアントID
+            seq (int): 確認応答されたフレーム番号
+
+        Returns:
+            bool: 確認応答が反映された場合True
+        """
+        with self.lock:
+            state = self.clients.get(client_id)
+            if state is None or seq <= state.acked_seq:
+                return False
+
+            # TCP上で順序が保証されるため、seq以前のフレームはすべて受信済み
+            for pending_seq in sorted(s for s in state.pending if s <= seq):
+                state.acked.update(state.pending.pop(pending_seq))
+            state.acked_seq = seq
+            return True
+
+    def _diff(self, record, acked, sent, timestamp):
+        """
+        確認応答済み・送信済みの状態と比較して変化したフィールドを抽出
+
+        Args:
+            record (dict): 最新レコード
+            acked (dict): 確認応答済みのレコード
+            sent (dict): 最後に送信したレコード
+
+        Returns:
+            tuple: (変化したフィールドの辞書（変化がない場合は空）, レコードからなくなったフィールド名のリスト)
+        """
+        if sent is None:
+            return dict(record), []
+
+        changed = {}
+        for key, value in record.items():
+            if key in FRAME_RELATIVE_FIELDS:
+                continue
+            if value != sent.get(key) or (acked is not None and value != acked.get(key)):
+                changed[key] = value
+
+        # 送信済みまたは確認応答済みの状態にあり、最新レコードにないフィールド
+        previous_keys = sent.keys() | (acked.keys() if acked is not None else set())
+        removed = sorted(key for key in previous_keys - record.keys() if key not in FRAME_RELATIVE_FIELDS)
+
+        # デバイス時刻がフレーム時刻から大きくずれている場合のみ送信（ハートビートでも同様）
+        device_timestamp = record.get("timestamp")
+        if device_timestamp is not None and abs(device_timestamp - timestamp) > self.timestamp_tolerance:
+            changed["timestamp"] = device_timestamp
+
+        return changed, removed
+
+    def get_stats(self):
+        """
+        差分エンコーダーの統計情報を取得
+
+        Returns:
+            dict: 統計情報
+        """
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "pending_frames": sum(len(s.pending) for s in self.clients.values())
+            }
@@ -13,6 +13,7 @@ import time
 from datetime import datetime
 from .transformers import transform_device_for_frontend, transform_value_for_frontend, transform_statistics_for_frontend, transform_device_summary_for_frontend
 from .cache import ValueCache, StatsCache, SummaryCache
+from .discovery import PUSH_SOURCES
 
 # ロギング設定
 logger = logging.getLogger(__name__)
@@ -62,7 +63,8 @@ class DeviceManager:
             return self._fetch_device_value(device_id)
 
         # キャッシュから値を取得（ヒットすればそのまま返す）
-        cached_value = self.value_cache.get(device_id)
+        # デバイスごとのバージョンと照合するため、他のデバイスの変更では無効にならない
+        cached_value = self.value_cache.get(device_id, version=self.discovery.device_version(device_id))
         if cached_value is not None:
             return cached_value
 
@@ -83,16 +85,25 @@ class DeviceManager:
         if device_id.startswith('sim_'):
             return None
         
-        # デバイス情報の取得
+        # デバイス情報の取得（キャッシュのバージョンは変換に使うデバイス情報より先に読む）
+        version = self.discovery.device_version(device_id)
         device_info = self.discovery.get_device(device_id)
         if not device_info or device_info["status"] != "online":
             return None
 
+        # プッシュ型のデバイスは最後に受信した値を返す（HTTPでは問い合わせない）
+        if device_info.get("source") in PUSH_SOURCES:
+            last_value = self.device_values.get(device_id)
+            return transform_value_for_frontend(device_id, last_value, device_info) if last_value else None
+
         current_time = datetime.now().timestamp()
 
         try:
             # デバイスのAPIエンドポイントにリクエスト（タイムアウト設定の最適化）
-            url = f"http://{device_info['ip']}/api"
+            host = device_info['ip']
+            if device_info.get('http_port'):
+                host = f"{host}:{device_info['http_port']}"
+            url = f"http://{host}/api"
             # connect timeout=1秒、read timeout=1.5秒で設定
             response = requests.get(url, timeout=(1.0, 1.5))
 
@@ -124,12 +135,10 @@ class DeviceManager:
 
                     # キャッシュに変換済みデータを保存（値の変動が少ないほど長めのTTL）
                     ttl = self._calculate_value_ttl(device_id, value)
-                    self.value_cache.set(device_id, transformed_data, ttl)
+                    self.value_cache.set(device_id, transformed_data, ttl, version=version)
 
                     # デバイスの最終応答時間を更新
-                    if device_id in self.discovery.devices:
-                        self.discovery.devices[device_id]["last_seen"] = timestamp
-                        self.discovery.devices[device_id]["status"] = "online"
+                    self.discovery.touch(device_id, timestamp)
 
                     return transformed_data
 
@@ -144,12 +153,43 @@ class DeviceManager:
                 transformed_data = transform_value_for_frontend(device_id, last_value, self.discovery.get_device(device_id))
 
                 # エラー時は短いTTLを設定（0.5秒）
-                self.value_cache.set(device_id, transformed_data, ttl=0.5)
+                self.value_cache.set(device_id, transformed_data, ttl=0.5, version=version)
 
                 return transformed_data
 
         return None
 
+    def ingest_value(self, device_id, value_data):
+        """
+        デバイスからプッシュされた値を保存
+
+        Args:
+            device_id (str): デバイスID
+            value_data (dict): 値データ（value, raw, calibrated, timestamp）
+
+        Returns:
+            dict: フロントエンド用に変換した値データ
+        """
+        version = self.discovery.device_version(device_id)
+        device_info = self.discovery.get_device(device_id)
+        transformed_data = transform_value_for_frontend(device_id, value_data, device_info)
+
+        # TTLは前回値との変化量から求めるため、内部保存より先に計算する
+        ttl = self._calculate_value_ttl(device_id, value_data["value"])
+        self.device_values[device_id] = value_data.copy()
+        self.value_cache.set(device_id, transformed_data, ttl, version=version)
+        return transformed_data
+
+    def forget_device(self, device_id):
+        """
+        削除したデバイスの保存済みの値とキャッシュを破棄
+
+        Args:
+            device_id (str): デバイスID
+        """
+        self.device_values.pop(device_id, None)
+        self.value_cache.invalidate(device_id)
+
     def _calculate_value_ttl(self, device_id, current_value):
         """
         値の特性に応じてキャッシュTTLを計算する
@@ -210,8 +250,6 @@ class DeviceManager:
         """
         import concurrent.futures
 
-        self.discovery.check_device_timeouts()  # タイムアウトチェック
-
         values = {}
         online_devices = {
             device_id: info for device_id, info in self.discovery.devices.items()
@@ -264,7 +302,7 @@ class DeviceManager:
 
         # キャッシュから統計情報を取得
         cache_key = "device_statistics"
-        cached_stats = self.stats_cache.get(cache_key)
+        cached_stats = self.stats_cache.get(cache_key, version=self.discovery.version)
         if cached_stats is not None:
             logger.debug("統計情報をキャッシュから取得")
             return cached_stats
@@ -280,6 +318,7 @@ class DeviceManager:
             dict: 統計情報の辞書
         """
         current_time = datetime.now().timestamp()
+        version = self.discovery.version  # 計算開始時点のレジストリバージョン
 
         # 値を取得（並行処理済み）
         values = self.get_all_values()
@@ -299,7 +338,7 @@ class DeviceManager:
             transformed_stats = transform_statistics_for_frontend(stats)
 
             # キャッシュに保存（短いTTLで）
-            self.stats_cache.set("device_statistics", transformed_stats, ttl=0.5)
+            self.stats_cache.set("device_statistics", transformed_stats, ttl=0.5, version=version)
 
             return transformed_stats
 
@@ -323,7 +362,7 @@ class DeviceManager:
         ttl = self.stats_cache.adaptive_ttl(transformed_stats)
 
         # キャッシュに保存
-        self.stats_cache.set("device_statistics", transformed_stats, ttl)
+        self.stats_cache.set("device_statistics", transformed_stats, ttl, version=version)
 
         return transformed_stats
 
@@ -347,7 +386,7 @@ class DeviceManager:
 
         # キャッシュからサマリー情報を取得
         cache_key = "device_summary"
-        cached_summary = self.summary_cache.get(cache_key)
+        cached_summary = self.summary_cache.get(cache_key, version=self.discovery.version)
         if cached_summary is not None:
             logger.debug("サマリー情報をキャッシュから取得")
             return cached_summary
@@ -363,6 +402,7 @@ class DeviceManager:
             dict: デバイス要約情報
         """
         current_time = datetime.now().timestamp()
+        version = self.discovery.version  # 生成開始時点のレジストリバージョン
 
         # デバイス情報の効率的な取得
         devices = self.discovery.get_devices()
@@ -380,6 +420,6 @@ class DeviceManager:
         ttl = self.summary_cache.adaptive_ttl(summary)
 
         # キャッシュに保存
-        self.summary_cache.set("device_summary", summary, ttl)
+        self.summary_cache.set("device_summary", summary, ttl, version=version)
 
         return summary
\ No newline at end of file
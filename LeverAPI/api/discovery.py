@@ -10,8 +10,17 @@
 import socket
 import json
 import time
+import heapq
+import ipaddress
+import random
 import logging
 from datetime import datetime
+from threading import Lock
+
+import eventlet
+
+from .registry import DeviceRegistry
+from .simulation import SIM_PREFIX
 
 # ロギング設定
 logger = logging.getLogger(__name__)
@@ -21,6 +30,12 @@ UDP_PORT = 4210
 DISCOVERY_TOKEN = "DISCOVER_LEVER"
 BROADCAST_IP = "255.255.255.255"
 DEVICE_TIMEOUT = 30  # デバイスがタイムアウトするまでの秒数
+ANNOUNCE_INTERVAL = 5.0  # 常駐リスナーのディスカバリー送信間隔（秒）
+ANNOUNCE_JITTER = 0.2  # 送信間隔に加えるゆらぎ（割合）
+SWEEP_RATE = 5000  # サブネットスイープの送信レート（パケット/秒）
+SWEEP_INTERVAL = 60.0  # 常駐リスナーでのサブネットスイープの間隔（秒）
+SWEEP_MAX_HOSTS = 65536  # 1回のスイープで送信する最大ホスト数
+PUSH_SOURCES = frozenset({"push", "serial", "replay"})  # ポーリングせずデバイス側から値が届く取得経路
 
 class LeverDiscovery:
     """レバーデバイスのディスカバリーを管理するクラス"""
@@ -28,7 +43,29 @@ class LeverDiscovery:
     def __init__(self):
         """ディスカバリーマネージャーの初期化"""
         self.is_scanning = False
-        self.devices = {}  # 検出されたデバイスの辞書 {device_id: device_info}
+        self.registry = DeviceRegistry()  # 検出されたデバイスのレジストリ {device_id: device_info}
+
+        # 常駐リスナーの状態
+        self.listener_socket = None
+        self.listener_threads = []
+        self.announce_interval = ANNOUNCE_INTERVAL
+        self.on_device_online = None  # デバイスがオンラインになった時のコールバック
+        self.responses_received = 0  # 常駐リスナーで受信したレバーの応答数
+
+        # サブネットスイープの設定と状態
+        self.sweep_networks = []  # [ipaddress.IPv4Network]
+        self.sweep_rate = SWEEP_RATE
+        self.sweep_interval = SWEEP_INTERVAL
+        self.sweep_thread = None
+        self.is_sweeping = False
+        self.last_sweep = None  # 直近のスイープ結果
+
+        # 生存監視（期限ヒープ）
+        self.expiry_heap = []  # [(expires_at, device_id)] デバイスごとに最大1件
+        self.expires_at = {}  # {device_id: 最新の期限} ヒープより新しければ取り出し時に再登録
+        self.expiry_lock = Lock()  # スレッドセーフ操作のためのロック
+        self.reaper_thread = None
+        self.on_device_offline = None  # デバイスがタイムアウトした時のコールバック
 
     def discover_devices(self, timeout=3, retries=3, retry_interval=0.5):
         """
@@ -72,34 +109,9 @@ class LeverDiscovery:
                     while time.time() - broadcast_time < retry_interval:
                         try:
                             data, addr = sock.recvfrom(1024)
-
-                            # JSONレスポンスの解析
-                            try:
-                                response = json.loads(data.decode())
-                                if "type" in response and response["type"] == "lever":
-                                    device_id = response["id"]
-                                    ip = addr[0]  # 応答送信元IPを使用（より信頼性が高い）
-
-                                    # デバイス情報を格納
-                                    if device_id not in self.devices:
-                                        self.devices[device_id] = {
-                                            "id": device_id,
-                                            "name": f"レバー {len(self.devices) + 1}",  # デフォルト名
-                                            "ip": ip,
-                                            "last_seen": datetime.now().timestamp(),
-                                            "status": "online"
-                                        }
-                                        logger.info(f"新規デバイス検出: {device_id} ({ip})")
-                                        discovered += 1
-                                    else:
-                                        # 既存デバイスの情報を更新
-                                        self.devices[device_id]["ip"] = ip
-                                        self.devices[device_id]["last_seen"] = datetime.now().timestamp()
-                                        self.devices[device_id]["status"] = "online"
-                                        logger.info(f"既存デバイス更新: {device_id} ({ip})")
-                            except json.JSONDecodeError:
-                                logger.warning(f"無効なJSONレスポンス: {data} from {addr}")
-
+                            result = self._handle_response(data, addr)
+                            if result and result[1]:
+                                discovered += 1
                         except socket.timeout:
                             continue
 
@@ -112,30 +124,9 @@ class LeverDiscovery:
                     while time.time() < wait_end:
                         try:
                             data, addr = sock.recvfrom(1024)
-                            # 上記と同様のレスポンス処理
-                            try:
-                                response = json.loads(data.decode())
-                                if "type" in response and response["type"] == "lever":
-                                    device_id = response["id"]
-                                    ip = addr[0]
-
-                                    if device_id not in self.devices:
-                                        self.devices[device_id] = {
-                                            "id": device_id,
-                                            "name": f"レバー {len(self.devices) + 1}",
-                                            "ip": ip,
-                                            "last_seen": datetime.now().timestamp(),
-                                            "status": "online"
-                                        }
-                                        logger.info(f"最終待機中の新規デバイス検出: {device_id} ({ip})")
-                                        discovered += 1
-                                    else:
-                                        self.devices[device_id]["ip"] = ip
-                                        self.devices[device_id]["last_seen"] = datetime.now().timestamp()
-                                        self.devices[device_id]["status"] = "online"
-                                        logger.debug(f"最終待機中の既存デバイス更新: {device_id} ({ip})")
-                            except json.JSONDecodeError:
-                                logger.warning(f"最終待機中の無効なJSONレスポンス: {data} from {addr}")
+                            result = self._handle_response(data, addr)
+                            if result and result[1]:
+                                discovered += 1
                         except socket.timeout:
                             continue
 
@@ -153,31 +144,548 @@ class LeverDiscovery:
             "total_devices": len(self.devices)
         }
 
-    def check_device_timeouts(self):
+    @property
+    def devices(self):
+        """
+        検出されたデバイスの読み取り専用スナップショット
+
+        Returns:
+            MappingProxyType: {device_id: device_info}
+        """
+        return self.registry.snapshot()
+
+    @property
+    def version(self):
+        """デバイスレジストリのバージョン"""
+        return self.registry.version
+
+    def device_version(self, device_id):
+        """指定デバイスのバージョン（そのデバイスが最後に変更された時点のレジストリバージョン）"""
+        return self.registry.record_version(device_id)
+
+    def add_device(self, device_info):
+        """
+        デバイスを直接登録（シミュレーションデバイスなど）
+
+        Args:
+            device_info (dict): デバイス情報（idを含む）
         """
-        一定時間応答のないデバイスをオフライン状態に設定
+        self.registry.upsert(device_info["id"], device_info)
+
+    def add_devices(self, devices):
+        """
+        複数のデバイスをまとめて直接登録（シミュレーションデバイスなど）
+
+        Args:
+            devices (iterable): デバイス情報（idを含む）のリスト
+        """
+        self.registry.upsert_many(devices)
+
+    def remove_device(self, device_id):
+        """
+        デバイスを登録から削除
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            bool: 削除した場合True
+        """
+        with self.expiry_lock:
+            self.expires_at.pop(device_id, None)
+        return self.registry.remove(device_id) is not None
+
+    def remove_devices(self, device_ids):
+        """
+        複数のデバイスをまとめて登録から削除
+
+        Args:
+            device_ids (iterable): デバイスIDのリスト
+
+        Returns:
+            list: 削除したデバイスID
+        """
+        device_ids = list(device_ids)
+        with self.expiry_lock:
+            for device_id in device_ids:
+                self.expires_at.pop(device_id, None)
+        return self.registry.remove_many(device_ids)
+
+    def _handle_response(self, data, addr):
         """
-        current_time = datetime.now().timestamp()
-        timeout_count = 0
+        ディスカバリー応答パケットを解析してデバイス情報を登録・更新
 
+        Args:
+            data (bytes): 受信データ
+            addr (tuple): 送信元アドレス (ip, port)
+
+        Returns:
+            tuple: (device_id, is_new, came_online)、レバーの応答でない場合はNone
+        """
+        try:
+            response = json.loads(data.decode())
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logger.warning(f"無効なJSONレスポンス: {data} from {addr}")
+            return None
+
+        if not isinstance(response, dict) or response.get("type") != "lever" or "id" not in response:
+            return None
+
+        device_id = response["id"]
+        ip = addr[0]  # 応答送信元IPを使用（より信頼性が高い）
+        now = datetime.now().timestamp()
+
+        # 80番以外でHTTPを提供するデバイス（エミュレーターなど）は応答にポート番号を含める
+        fields = {"ip": ip}
+        http_port = response.get("http_port")
+        if isinstance(http_port, int) and 0 < http_port < 65536 and http_port != 80:
+            fields["http_port"] = http_port
+
+        if self.registry.get(device_id) is None:
+            # デバイス情報を格納
+            self.registry.upsert(device_id, {
+                "id": device_id,
+                "name": f"レバー {len(self.devices) + 1}",  # デフォルト名
+                **fields,
+                "last_seen": now,
+                "status": "online"
+            })
+            self._schedule_expiry(device_id, now)
+            logger.info(f"新規デバイス検出: {device_id} ({ip})")
+            return device_id, True, True
+
+        # 既存デバイスの情報を更新
+        came_online = self.touch(device_id, now, **fields)
+        logger.debug(f"既存デバイス更新: {device_id} ({ip})")
+        return device_id, False, came_online
+
+    def start_listener(self, on_device_online=None, announce_interval=ANNOUNCE_INTERVAL):
+        """
+        常駐ディスカバリーリスナーを開始
+
+        1つのUDPソケットでディスカバリーを定期的にブロードキャストし、
+        応答を受信した時点でレジストリを更新します。
+
+        Args:
+            on_device_online (callable, optional): デバイスが新規検出またはオンライン復帰した時に
+                device_idを引数に呼び出されるコールバック
+            announce_interval (float): ブロードキャストの間隔（秒）
+
+        Returns:
+            bool: 開始した場合True（既に実行中の場合False）
+        """
+        if self.listener_socket is not None:
+            return False
+
+        self.on_device_online = on_device_online
+        self.announce_interval = announce_interval
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # スイープ時に応答が集中しても取りこぼさないよう受信バッファを拡張
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        sock.bind(("", 0))  # デバイスは送信元ポートに応答する
+        self.listener_socket = sock
+
+        self.listener_threads = [
+            eventlet.spawn(self._listen_loop, sock),
+            eventlet.spawn(self._announce_loop, sock)
+        ]
+        if self.sweep_networks:
+            self.sweep_thread = eventlet.spawn(self._sweep_loop, sock)
+        logger.info(f"常駐ディスカバリーリスナー開始: ポート {sock.getsockname()[1]}, 間隔 {announce_interval}秒")
+        return True
+
+    def stop_listener(self):
+        """常駐ディスカバリーリスナーを停止"""
+        if self.listener_socket is None:
+            return
+        for thread in self.listener_threads:
+            thread.kill()
+        self.listener_threads = []
+        if self.sweep_thread is not None:
+            self.sweep_thread.kill()
+            self.sweep_thread = None
+        self.listener_socket.close()
+        self.listener_socket = None
+        logger.info("常駐ディスカバリーリスナー停止")
+
+    @property
+    def is_listening(self):
+        """常駐リスナーが動作中かどうか"""
+        return self.listener_socket is not None
+
+    def announce(self, target=(BROADCAST_IP, UDP_PORT)):
+        """
+        常駐リスナーのソケットからディスカバリーパケットを送信（応答は非同期で処理）
+
+        Args:
+            target (tuple): 送信先アドレス
+
+        Returns:
+            bool: 送信した場合True
+        """
+        sock = self.listener_socket
+        if sock is None:
+            return False
+        try:
+            sock.sendto(DISCOVERY_TOKEN.encode(), target)
+            return True
+        except OSError as e:
+            logger.warning(f"ディスカバリーパケット送信エラー: {e}")
+            return False
+
+    def probe_known_devices(self):
+        """
+        登録済みデバイスの最後のIPへディスカバリーパケットをユニキャストで一斉送信
+
+        起動直後にブロードキャストを待たず既知のデバイスを復帰させるために使用します。
+        応答は常駐リスナーで受信されます。
+
+        Returns:
+            int: 送信したデバイス数
+        """
+        sent = 0
         for device_id, info in self.devices.items():
-            if current_time - info["last_seen"] > DEVICE_TIMEOUT:
-                if info["status"] != "offline":
-                    info["status"] = "offline"
-                    logger.info(f"デバイスがオフラインになりました: {device_id}")
-                    timeout_count += 1
+            ip = info.get("ip")
+            if not ip or device_id.startswith(SIM_PREFIX):
+                continue
+            if self.announce((ip, UDP_PORT)):
+                sent += 1
+        if sent:
+            logger.info(f"既知デバイスへのユニキャスト問い合わせ: {sent}台")
+        return sent
+
+    @staticmethod
+    def parse_networks(cidrs):
+        """
+        CIDR表記のリストをネットワークに変換
+
+        Args:
+            cidrs (iterable): CIDR表記の文字列（例: "192.168.1.0/24"）
+
+        Returns:
+            list: IPv4Networkのリスト
+
+        Raises:
+            ValueError: 不正なCIDR、IPv6、またはホスト数が上限を超える場合
+        """
+        networks = [ipaddress.ip_network(str(cidr).strip(), strict=False) for cidr in cidrs if str(cidr).strip()]
+        for network in networks:
+            if network.version != 4:
+                raise ValueError(f"IPv4のみ対応しています: {network}")
+        if sum(network.num_addresses for network in networks) > SWEEP_MAX_HOSTS:
+            raise ValueError(f"スイープ対象が多すぎます（最大{SWEEP_MAX_HOSTS}アドレス）")
+        return networks
+
+    @staticmethod
+    def host_count(network):
+        """
+        スイープで送信するホスト数を取得
 
-        return timeout_count
+        /31（RFC 3021のポイントツーポイント）と/32はネットワーク・ブロードキャストアドレスを持たないため、
+        全アドレスを送信対象とします（network.hosts() と同じ扱い）。
+
+        Args:
+            network (IPv4Network): ネットワーク
+
+        Returns:
+            int: ホスト数
+        """
+        if network.prefixlen >= network.max_prefixlen - 1:
+            return network.num_addresses
+        return network.num_addresses - 2
+
+    def configure_sweep(self, cidrs, rate=SWEEP_RATE, interval=SWEEP_INTERVAL):
+        """
+        常駐リスナーで定期的に実行するサブネットスイープを設定
+
+        Args:
+            cidrs (iterable): スイープするCIDR範囲（空の場合は無効）
+            rate (float): 送信レート（パケット/秒）
+            interval (float): スイープの間隔（秒）
+        """
+        self.sweep_networks = self.parse_networks(cidrs)
+        self.sweep_rate = rate
+        self.sweep_interval = interval
+
+        if self.sweep_networks and self.sweep_thread is None and self.listener_socket is not None:
+            self.sweep_thread = eventlet.spawn(self._sweep_loop, self.listener_socket)
+
+    def sweep(self, networks=None, rate=None, grace=0.5):
+        """
+        CIDR範囲の各ホストへディスカバリーパケットをユニキャストで送信
+
+        ブロードキャストが届かないネットワーク向けの検出モードです。
+        送信は指定レートで行い、応答は常駐リスナーのソケットで非同期に受信して
+        ブロードキャスト検出と同じレジストリに反映されます。
+
+        Args:
+            networks (list, optional): スイープするネットワーク（省略時は設定済みの範囲）
+            rate (float, optional): 送信レート（パケット/秒）
+            grace (float): 送信完了後に応答を待つ時間（秒）
+
+        Returns:
+            dict: スイープ結果
+        """
+        networks = networks if networks is not None else self.sweep_networks
+        rate = rate or self.sweep_rate
+        sock = self.listener_socket
+        if sock is None:
+            return {"status": "error", "message": "ディスカバリーリスナーが起動していません"}
+        if self.is_sweeping:
+            return {"status": "error", "message": "スイープは既に実行中です"}
+
+        self.is_sweeping = True
+        token = DISCOVERY_TOKEN.encode()
+        responses_before = self.responses_received
+        started = time.perf_counter()
+        sent = 0
+
+        try:
+            # 1ミリ秒ごとにまとめて送信してレートを維持する
+            batch = max(1, int(rate / 1000))
+            for network in networks:
+                for host in network.hosts():
+                    try:
+                        sock.sendto(token, (str(host), UDP_PORT))
+                        sent += 1
+                    except OSError as e:
+                        logger.debug(f"スイープ送信エラー: {host} - {e}")
+                    if sent % batch == 0:
+                        delay = started + sent / rate - time.perf_counter()
+                        eventlet.sleep(delay if delay > 0 else 0)
+
+            send_duration = time.perf_counter() - started
+            eventlet.sleep(grace)
+        finally:
+            self.is_sweeping = False
+
+        self.last_sweep = {
+            "status": "success",
+            "networks": [str(network) for network in networks],
+            "hosts": sent,
+            "send_duration": send_duration,
+            "responses": self.responses_received - responses_before,
+            "timestamp": datetime.now().timestamp()
+        }
+        logger.info(f"サブネットスイープ完了: {sent}ホスト, 送信 {send_duration * 1000:.0f}ms, 応答 {self.last_sweep['responses']}件")
+        return self.last_sweep
+
+    def _sweep_loop(self, sock):
+        """設定されたCIDR範囲を定期的にスイープ"""
+        while self.listener_socket is sock and self.sweep_networks:
+            self.sweep()
+            jitter = random.uniform(-ANNOUNCE_JITTER, ANNOUNCE_JITTER)
+            eventlet.sleep(self.sweep_interval * (1 + jitter))
+        self.sweep_thread = None
+
+    def _announce_loop(self, sock, initial_burst=3, burst_interval=0.5):
+        """ディスカバリーパケットを定期送信（起動直後は短い間隔で複数回）"""
+        for _ in range(initial_burst):
+            self.announce()
+            eventlet.sleep(burst_interval)
+
+        while self.listener_socket is sock:
+            # 複数サーバーの送信が同期しないようゆらぎを加える
+            jitter = random.uniform(-ANNOUNCE_JITTER, ANNOUNCE_JITTER)
+            eventlet.sleep(self.announce_interval * (1 + jitter))
+            self.announce()
+
+    def _listen_loop(self, sock):
+        """応答を受信し、到着した時点でレジストリを更新"""
+        while self.listener_socket is sock:
+            try:
+                data, addr = sock.recvfrom(1024)
+            except OSError:
+                if self.listener_socket is not sock:
+                    break
+                eventlet.sleep(0.1)
+                continue
+
+            result = self._handle_response(data, addr)
+            if result:
+                self.responses_received += 1
+            if result and result[2] and self.on_device_online:
+                try:
+                    self.on_device_online(result[0])
+                except Exception as e:
+                    logger.error(f"デバイス検出コールバックでエラー: {e}")
+
+    def touch(self, device_id, timestamp=None, **fields):
+        """
+        デバイスの応答を記録し、オンライン状態と生存期限を更新
+
+        Args:
+            device_id (str): デバイスID
+            timestamp (float, optional): 応答時刻（省略時は現在時刻）
+            **fields: 同時に更新するフィールド（ipなど）
+
+        Returns:
+            bool: オフラインからオンラインに復帰した場合True
+        """
+        timestamp = timestamp if timestamp is not None else datetime.now().timestamp()
+        previous = self.registry.update(device_id, last_seen=timestamp, status="online", **fields)
+        if previous is None:
+            return False
+
+        self._schedule_expiry(device_id, timestamp)
+        return previous["status"] != "online"
+
+    def record_push(self, device_fields, timestamp=None, source="push"):
+        """
+        値をプッシュしてきたデバイスをまとめて登録または更新
+
+        プッシュ型のデバイス（UDP/HTTP取り込み、シリアル接続）は source を付けて登録され、
+        ポーリングの対象から外れます。既存デバイスの更新はスナップショットを1回だけ作り直します。
+
+        Args:
+            device_fields (dict): {device_id: 接続先のフィールド（{"ip": ...} や {"port": ...}）}
+            timestamp (float, optional): 受信時刻（省略時は現在時刻）
+            source (str): 値の取得経路（PUSH_SOURCES のいずれか）
+
+        Returns:
+            list: 新規登録またはオフラインから復帰したデバイスIDのリスト
+        """
+        timestamp = timestamp if timestamp is not None else datetime.now().timestamp()
+        snapshot = self.devices
+        came_online = []
+
+        for device_id, fields in device_fields.items():
+            if device_id in snapshot:
+                continue
+            self.registry.upsert(device_id, {
+                "id": device_id,
+                "name": f"レバー {len(self.devices) + 1}",  # デフォルト名
+                **fields,
+                "last_seen": timestamp,
+                "status": "online",
+                "source": source
+            })
+            came_online.append(device_id)
+            logger.info(f"プッシュ型デバイスを登録: {device_id} ({source})")
+
+        previous_records = self.registry.update_many({
+            device_id: {"last_seen": timestamp, "status": "online", "source": source, **fields}
+            for device_id, fields in device_fields.items() if device_id in snapshot
+        })
+        came_online.extend(d for d, previous in previous_records.items() if previous["status"] != "online")
+
+        for device_id in device_fields:
+            self._schedule_expiry(device_id, timestamp)
+        return came_online
+
+    def _schedule_expiry(self, device_id, last_seen):
+        """
+        生存期限を更新（O(1)）
+
+        ヒープにはデバイスごとに1件だけ積み、期限が延びた場合は
+        リーパーが取り出した時点で新しい期限で積み直します。
+        """
+        expires_at = last_seen + DEVICE_TIMEOUT
+        with self.expiry_lock:
+            scheduled = device_id in self.expires_at
+            self.expires_at[device_id] = expires_at
+            if not scheduled:
+                heapq.heappush(self.expiry_heap, (expires_at, device_id))
+
+    def check_device_timeouts(self, now=None):
+        """
+        期限を過ぎたデバイスをオフライン状態に設定
+
+        期限ヒープの先頭から期限切れのエントリだけを取り出すため、
+        タイムアウトしていないデバイスは走査しません。
+
+        Args:
+            now (float, optional): 判定時刻（省略時は現在時刻）
+
+        Returns:
+            list: オフラインになったデバイスIDのリスト
+        """
+        now = now if now is not None else datetime.now().timestamp()
+        expired = []
+
+        with self.expiry_lock:
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                expires_at, device_id = heapq.heappop(self.expiry_heap)
+                current = self.expires_at.get(device_id)
+                if current is None:
+                    continue
+                if current > expires_at:
+                    # 期限が延長されているので積み直す
+                    heapq.heappush(self.expiry_heap, (current, device_id))
+                    continue
+                del self.expires_at[device_id]
+                expired.append(device_id)
+
+        timed_out = []
+        for device_id in expired:
+            previous = self.registry.update(device_id, status="offline")
+            if previous and previous["status"] != "offline":
+                logger.info(f"デバイスがオフラインになりました: {device_id}")
+                timed_out.append(device_id)
+
+        return timed_out
+
+    def next_expiry(self):
+        """
+        最も近い生存期限を取得
+
+        Returns:
+            float: 期限のタイムスタンプ、監視対象がない場合はNone
+        """
+        with self.expiry_lock:
+            return self.expiry_heap[0][0] if self.expiry_heap else None
+
+    def start_reaper(self, on_device_offline=None):
+        """
+        生存期限を監視するリーパーを開始
+
+        次の期限まで眠り、期限切れのデバイスをオフラインにしてコールバックで通知します。
+
+        Args:
+            on_device_offline (callable, optional): オフラインになったデバイスIDのリストを
+                引数に呼び出されるコールバック
+        """
+        if self.reaper_thread is not None:
+            return
+        self.on_device_offline = on_device_offline
+        self.reaper_thread = eventlet.spawn(self._reaper_loop)
+        logger.info("デバイス生存監視を開始")
+
+    def stop_reaper(self):
+        """生存期限の監視を停止"""
+        if self.reaper_thread is not None:
+            self.reaper_thread.kill()
+            self.reaper_thread = None
+
+    def _reaper_loop(self):
+        """期限ヒープに従ってデバイスをオフラインにするループ"""
+        while True:
+            next_expiry = self.next_expiry()
+            now = datetime.now().timestamp()
+            # 新規デバイスの期限は常に既存の期限より後になるため、最大でもタイムアウト時間だけ眠ればよい
+            wait = DEVICE_TIMEOUT if next_expiry is None else next_expiry - now
+            if wait > 0:
+                eventlet.sleep(min(wait, DEVICE_TIMEOUT))
+                continue
+
+            timed_out = self.check_device_timeouts()
+            if timed_out and self.on_device_offline:
+                try:
+                    self.on_device_offline(timed_out)
+                except Exception as e:
+                    logger.error(f"タイムアウト通知コールバックでエラー: {e}")
 
     def get_devices(self):
         """
         検出されたすべてのデバイスのリストを取得
 
         Returns:
-            list: デバイス情報のリスト
+            list: デバイス情報（最新の生存確認用フィールドを反映済み）のリスト
         """
-        self.check_device_timeouts()  # タイムアウトチェック
-        return list(self.devices.values())
+        return [self.registry.current(device) for device in self.devices.values()]
 
     def get_device(self, device_id):
         """
@@ -189,9 +697,20 @@ class LeverDiscovery:
         Returns:
             dict: デバイス情報、存在しない場合はNone
         """
-        if device_id in self.devices:
-            return self.devices[device_id]
-        return None
+        return self.registry.get(device_id)
+
+    def update_notification_profile(self, device_id, profile):
+        """
+        デバイスの通知プロファイル（通知しきい値の上書き）を更新
+
+        Args:
+            device_id (str): デバイスID
+            profile (dict): 通知しきい値の辞書、Noneでデフォルトに戻す
+
+        Returns:
+            bool: 更新に成功したかどうか
+        """
+        return self.registry.update(device_id, notification_profile=profile) is not None
 
     def update_device_name(self, device_id, name):
         """
@@ -204,7 +723,4 @@ class LeverDiscovery:
         Returns:
             bool: 更新に成功したかどうか
         """
-        if device_id in self.devices:
-            self.devices[device_id]["name"] = name
-            return True
-        return False
\ No newline at end of file
+        return self.registry.update(device_id, name=name) is not None
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+データのエクスポートモジュール
+
+値の履歴と記録したセッションをCSVまたはNDJSON（1行1レコードのJSON）に変換し、
+一定数のレコードごとの文字列（任意でgzip圧縮したバイト列）として順に返します。
+レコードはチャンク単位で配列から文字列にするため、エクスポートの大きさに関わらずメモリ使用量は一定です。
+"""
+
+import json
+import zlib
+import logging
+
+import numpy as np
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", ".csv"),
+    "ndjson": ("application/x-ndjson", ".ndjson")
+}  # 形式ごとの (Content-Type, 拡張子)
+EXPORT_CHUNK_RECORDS = 16384  # 1回に文字列にするレコード数
+GZIP_LEVEL = 6  # gzip圧縮レベル
+SESSION_COLUMNS = ("id", "value", "raw", "ts")  # セッションのエクスポートの列
+HISTORY_COLUMNS = ("id", "value", "ts")  # 値の履歴のエクスポートの列
+
+
+def _csv_field(text):
+    """CSVのフィールド（区切り文字や引用符を含む場合は引用符で囲む）"""
+    if any(c in text for c in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _quote_names(fmt, names):
+    """デバイスIDを出力形式に合わせてエスケープしたリスト"""
+    if fmt == "csv":
+        return [_csv_field(str(name)) for name in names]
+    return [json.dumps(name, ensure_ascii=False) for name in names]
+
+
+def _format_rows(fmt, columns, names, index, *values):
+    """
+    レコードの配列を出力形式の文字列にする
+
+    Args:
+        fmt (str): 出力形式（csv / ndjson）
+        columns (tuple): 列名（先頭はデバイスID）
+        names (list): エスケープ済みのデバイスID
+        index (list): 各レコードのデバイスの位置（names のインデックス）
+        *values (list): デバイスID以外の列の値のリスト
+
+    Returns:
+        str: 改行で終わる複数行の文字列
+    """
+    if fmt == "csv":
+        template = "{}" + ",{}" * len(values) + "\n"
+    else:
+        template = "{{" + ",".join(f'"{column}":{{}}' for column in columns) + "}}\n"
+    return "".join(template.format(names[i], *row) for i, *row in zip(index, *values))
+
+
+def header(fmt, columns):
+    """
+    出力の先頭（CSVのヘッダー行、NDJSONの場合は空文字列）
+
+    Args:
+        fmt (str): 出力形式
+        columns (tuple): 列名
+
+    Returns:
+        str: ヘッダー
+    """
+    return ",".join(columns) + "\n" if fmt == "csv" else ""
+
+
+def iter_session_export(reader, fmt, start=None, end=None, devices=None):
+    """
+    記録したセッションのレコードを出力形式の文字列として順に返す
+
+    レコードは記録順（id, value, raw, ts（UNIXミリ秒））で、時間範囲の読み出しと同じ内容です。
+
+    Args:
+        reader (SessionReader): セッションの読み取り
+        fmt (str): 出力形式（csv / ndjson）
+        start (float, optional): 開始時刻（UNIX秒）
+        end (float, optional): 終了時刻（UNIX秒、この時刻を含まない）
+        devices (list, optional): 対象のデバイスID
+
+    Yields:
+        str: ヘッダーと、一定数のレコードごとの文字列
+    """
+    names = _quote_names(fmt, reader.devices)
+    yield header(fmt, SESSION_COLUMNS)
+    for base_time, chunk in reader.iter_chunks(start, end, devices, chunk_records=EXPORT_CHUNK_RECORDS):
+        ts = (chunk["ts"].astype(np.int64) + round(base_time * 1000)).tolist()
+        yield _format_rows(fmt, SESSION_COLUMNS, names, chunk["slot"].tolist(),
+                           chunk["value"].tolist(), chunk["raw"].tolist(), ts)
+
+
+def iter_history_export(history, fmt, start=None, end=None, devices=None):
+    """
+    値の履歴を出力形式の文字列として順に返す
+
+    レコードはデバイスごとに時刻順（id, value, ts（UNIXミリ秒））で、1台ずつ履歴をコピーして変換します。
+
+    Args:
+        history (HistoryStore): 値の履歴
+        fmt (str): 出力形式（csv / ndjson）
+        start (float, optional): 開始時刻（UNIX秒）
+        end (float, optional): 終了時刻（UNIX秒、この時刻を含まない）
+        devices (list, optional): 対象のデバイスID（省略時は履歴のある全デバイス）
+
+    Yields:
+        str: ヘッダーと、一定数のレコードごとの文字列
+    """
+    yield header(fmt, HISTORY_COLUMNS)
+    for device_id in (devices if devices is not None else history.list_devices()):
+        found = history.get_history(device_id, since=start)
+        if found is None:
+            continue
+        ts, values = found
+        if end is not None:
+            stop = int(np.searchsorted(ts, end, side="left"))
+            ts, values = ts[:stop], values[:stop]
+        names = _quote_names(fmt, [device_id])
+        ts_ms = np.round(ts * 1000).astype(np.int64)
+        # float32の値は表示用に丸める（整数値は整数で出力）
+        rounded = np.round(values.astype(np.float64), 3)
+        for offset in range(0, len(ts), EXPORT_CHUNK_RECORDS):
+            part = slice(offset, offset + EXPORT_CHUNK_RECORDS)
+            value_list = [int(v) if v.is_integer() else v for v in rounded[part].tolist()]
+            yield _format_rows(fmt, HISTORY_COLUMNS, names, [0] * len(value_list), value_list, ts_ms[part].tolist())
+
+
+def encode_stream(parts, compress=False):
+    """
+    文字列の列をUTF-8のバイト列（任意でgzip圧縮）に変換
+
+    圧縮する場合もチャンクごとに圧縮データを書き出すため、クライアントはすぐに受信を始められます。
+
+    Args:
+        parts (iterable): 文字列の列
+        compress (bool): Trueの場合はgzip圧縮
+
+    Yields:
+        bytes: 送信するバイト列
+    """
+    if not compress:
+        for part in parts:
+            if part:
+                yield part.encode("utf-8")
+        return
+
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 でgzip形式
+    for part in parts:
+        if part:
+            data = compressor.compress(part.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+    yield compressor.flush()
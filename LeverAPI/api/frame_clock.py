@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+フレームクロックモジュール
+
+通知パイプラインの更新を固定周期（30Hz、60Hzなど）のフレームにまとめて送信します。
+フレーム間に到着した変更は1つのフレームに集約され、送信ジッターと送信時間を計測します。
+"""
+
+import time
+import logging
+from threading import Lock
+
+import eventlet
+
+from .metrics import Histogram
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+DEFAULT_FRAME_RATE = 60  # デフォルトのフレームレート（Hz）
+DEFAULT_JITTER_TARGET = 0.002  # 送信ジッターの目標上限（秒）
+JITTER_BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+COALESCED_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # 1フレームで上書きされた更新数のバケット境界
+
+
+class FrameClock:
+    """固定周期で集約済みの更新を送信するフレームクロック"""
+
+    def __init__(self, send_func, frame_rate=DEFAULT_FRAME_RATE, jitter_target=DEFAULT_JITTER_TARGET):
+        """
+        初期化
+
+        Args:
+            send_func (callable): フレーム送信関数 send_func(updates: dict)
+            frame_rate (float): フレームレート（Hz）
+            jitter_target (float): 送信ジッターの目標上限（秒）
+        """
+        self.send_func = send_func
+        self.frame_rate = frame_rate
+        self.jitter_target = jitter_target
+        self.running = False
+        self.pending = {}  # {device_id: value_data} 前回フレーム以降の更新
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+        self._thread = None
+
+        # 計測値
+        self.jitter_histogram = Histogram(JITTER_BUCKETS)
+        self.send_histogram = Histogram()
+        self.frames_sent = 0
+        self.frames_empty = 0
+        self.frames_skipped = 0  # 処理遅延により飛ばしたフレーム数
+        self.jitter_over_target = 0  # ジッターが目標を超えたフレーム数
+        self.updates_submitted = 0  # 登録された更新数
+        self.updates_coalesced = 0  # 同じフレーム内の新しい値で上書きされた更新数
+        self.coalesced_histogram = Histogram(COALESCED_BUCKETS)  # フレームごとの上書きされた更新数
+        self._frame_coalesced = 0  # 現在のフレームで上書きされた更新数
+
+    @property
+    def period(self):
+        """フレーム周期（秒）"""
+        return 1.0 / self.frame_rate
+
+    def configure(self, frame_rate=None, jitter_target=None):
+        """
+        フレームレートとジッター目標を変更
+
+        Args:
+            frame_rate (float, optional): フレームレート（Hz）
+            jitter_target (float, optional): 送信ジッターの目標上限（秒）
+        """
+        if frame_rate is not None:
+            if frame_rate <= 0:
+                raise ValueError("frame_rate must be positive")
+            self.frame_rate = float(frame_rate)
+        if jitter_target is not None:
+            self.jitter_target = max(0.0, float(jitter_target))
+
+    def start(self):
+        """フレームクロックを開始"""
+        if self.running:
+            return
+        self.running = True
+        self._thread = eventlet.spawn(self._run)
+        logger.info(f"フレームクロック開始: {self.frame_rate}Hz")
+
+    def stop(self):
+        """フレームクロックを停止し、残っている更新を送信"""
+        if not self.running:
+            return
+        self.running = False
+        if self._thread:
+            self._thread.kill()
+            self._thread = None
+        self._flush()
+        logger.info("フレームクロック停止")
+
+    def submit(self, device_id, value_data):
+        """
+        次のフレームに含める更新を登録（同一デバイスは最新値で上書き）
+
+        Args:
+            device_id (str): デバイスID
+            value_data (dict): 更新データ
+        """
+        with self.lock:
+            if device_id in self.pending:
+                self._frame_coalesced += 1
+            self.pending[device_id] = value_data
+            self.updates_submitted += 1
+
+    def submit_many(self, updates):
+        """
+        複数の更新を次のフレームに登録
+
+        Args:
+            updates (dict): デバイスIDをキーとする更新データ辞書
+        """
+        if not updates:
+            return
+        with self.lock:
+            self._frame_coalesced += len(self.pending.keys() & updates.keys())
+            self.pending.update(updates)
+            self.updates_submitted += len(updates)
+
+    def discard(self, device_id):
+        """切断されたデバイスの未送信更新を破棄"""
+        with self.lock:
+            self.pending.pop(device_id, None)
+
+    def _flush(self):
+        """集約済みの更新を取り出して送信"""
+        with self.lock:
+            updates, self.pending = self.pending, {}
+            coalesced, self._frame_coalesced = self._frame_coalesced, 0
+
+        self.updates_coalesced += coalesced
+        self.coalesced_histogram.observe(coalesced)
+        if not updates:
+            self.frames_empty += 1
+            return
+
+        started = time.perf_counter()
+        try:
+            self.send_func(updates)
+        except Exception as e:
+            logger.error(f"フレーム送信エラー: {e}")
+        self.send_histogram.observe(time.perf_counter() - started)
+        self.frames_sent += 1
+
+    def _run(self):
+        """
+        フレームループ
+
+        次の期限までハブのタイマーで眠ってから送信します
+        （期限の直前を eventlet.sleep(0) で譲りながら待つとCPUを1コア使い続けるため）。
+        処理が1周期以上遅れた場合は期限を再設定します。
+        """
+        deadline = time.perf_counter() + self.period
+
+        while self.running:
+            eventlet.sleep(max(0, deadline - time.perf_counter()))
+
+            jitter = time.perf_counter() - deadline
+            self.jitter_histogram.observe(jitter)
+            if jitter > self.jitter_target:
+                self.jitter_over_target += 1
+
+            self._flush()
+
+            deadline += self.period
+            now = time.perf_counter()
+            if now > deadline:
+                # 遅延分のフレームは飛ばして位相を維持する
+                missed = int((now - deadline) / self.period) + 1
+                self.frames_skipped += missed
+                deadline += missed * self.period
+
+    def get_stats(self):
+        """
+        フレームクロックの状態と計測値を取得
+
+        Returns:
+            dict: 統計情報
+        """
+        return {
+            "enabled": self.running,
+            "frame_rate": self.frame_rate,
+            "jitter_target": self.jitter_target,
+            "frames_sent": self.frames_sent,
+            "frames_empty": self.frames_empty,
+            "frames_skipped": self.frames_skipped,
+            "jitter_over_target": self.jitter_over_target,
+            "updates_submitted": self.updates_submitted,
+            "updates_coalesced": self.updates_coalesced,
+            "coalesced": self.coalesced_histogram.snapshot(),
+            "jitter": self.jitter_histogram.snapshot(),
+            "send_latency": self.send_histogram.snapshot()
+        }
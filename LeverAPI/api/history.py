@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+値の履歴モジュール
+
+デバイスごとの直近の値を固定長のリングバッファ（NumPy配列）に保持し、
+グラフ表示用に Largest-Triangle-Three-Buckets（LTTB）で間引いて返します。
+シミュレーションデバイスのように同じ時刻に全台の値が揃うデバイス群は、
+時刻を共有する1つの行列にまとめて1行ずつ書き込みます。
+"""
+
+import logging
+from threading import Lock
+
+import numpy as np
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+DEFAULT_HISTORY_LENGTH = 6000  # デバイスごとに保持するサンプル数（10Hzで10分）
+GROUP_MEMORY_BUDGET = 64 * 1024 * 1024  # デバイス群の行列に使う最大メモリ（バイト、超える場合は保持数を減らす）
+VALUE_DTYPE = np.float32  # 値の保存形式
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets で表示用の点を選ぶ
+
+    先頭と末尾の点を残し、残りを threshold-2 個のバケットに分けて、各バケットから
+    前に選んだ点と次のバケットの平均とで作る三角形の面積が最大になる点を選びます。
+    バケット内の面積の計算は配列演算で行うため、計算量はサンプル数に比例し、
+    Pythonのループはバケット数の回数だけです。
+
+    Args:
+        x (ndarray): 時刻（昇順）
+        y (ndarray): 値
+        threshold (int): 選ぶ点の数
+
+    Returns:
+        ndarray: 選んだ点のインデックス（昇順）
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 次のバケットの平均（最後のバケットでは末尾の点）
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+class HistoryRing:
+    """1台分の固定長の履歴"""
+
+    def __init__(self, length):
+        """
+        初期化
+
+        Args:
+            length (int): 保持するサンプル数
+        """
+        self.ts = np.zeros(length, dtype=np.float64)
+        self.values = np.zeros(length, dtype=VALUE_DTYPE)
+        self.position = 0  # 次に書き込む位置
+        self.count = 0
+
+    def append(self, ts, value):
+        i = self.position
+        self.ts[i] = ts
+        self.values[i] = value
+        self.position = (i + 1) % len(self.ts)
+        if self.count < len(self.ts):
+            self.count += 1
+
+    def ordered(self):
+        """古い順に並べた (時刻, 値) のコピー"""
+        if self.count < len(self.ts):
+            return self.ts[:self.count].copy(), self.values[:self.count].copy()
+        p = self.position
+        return np.concatenate((self.ts[p:], self.ts[:p])), np.concatenate((self.values[p:], self.values[:p]))
+
+
+class HistoryGroup:
+    """同じ時刻に全台の値が揃うデバイス群の履歴（時刻を共有する行列）"""
+
+    def __init__(self, device_ids, length):
+        """
+        初期化
+
+        Args:
+            device_ids (list): デバイスIDのリスト（行列の列の順）
+            length (int): 保持するサンプル数
+        """
+        self.device_ids = device_ids
+        self.columns = {device_id: i for i, device_id in enumerate(device_ids)}
+        self.ts = np.zeros(length, dtype=np.float64)
+        self.values = np.zeros((length, len(device_ids)), dtype=VALUE_DTYPE)
+        self.position = 0
+        self.count = 0
+
+    def append(self, ts, values):
+        i = self.position
+        self.ts[i] = ts
+        self.values[i] = values
+        self.position = (i + 1) % len(self.ts)
+        if self.count < len(self.ts):
+            self.count += 1
+
+    def ordered(self, device_id):
+        """指定デバイスの古い順に並べた (時刻, 値) のコピー"""
+        column = self.columns[device_id]
+        if self.count < len(self.ts):
+            return self.ts[:self.count].copy(), self.values[:self.count, column].copy()
+        p = self.position
+        return (np.concatenate((self.ts[p:], self.ts[:p])),
+                np.concatenate((self.values[p:, column], self.values[:p, column])))
+
+
+class HistoryStore:
+    """全デバイスの値の履歴を管理するクラス"""
+
+    def __init__(self, length=DEFAULT_HISTORY_LENGTH):
+        """
+        初期化
+
+        Args:
+            length (int): デバイスごとに保持するサンプル数
+        """
+        self.length = length
+        self.rings = {}  # {device_id: HistoryRing}
+        self.groups = {}  # {グループ名: HistoryGroup}
+        self.lock = Lock()  # 履歴の作成・読み出しの排他用
+
+    def append(self, device_id, ts, value):
+        """
+        1サンプルを追加
+
+        Args:
+            device_id (str): デバイスID
+            ts (float): 時刻（UNIX秒）
+            value (float): 値
+        """
+        with self.lock:
+            ring = self.rings.get(device_id)
+            if ring is None:
+                ring = self.rings[device_id] = HistoryRing(self.length)
+            try:
+                ring.append(ts, value)
+            except (TypeError, ValueError):
+                pass  # 数値でない値は記録しない
+
+    def append_group(self, name, device_ids, values, ts):
+        """
+        デバイス群の同じ時刻の値をまとめて追加
+
+        デバイスIDのリストが前回と異なる（別のリストオブジェクトの）場合は、その群の履歴を作り直します。
+
+        Args:
+            name (str): グループ名
+            device_ids (list): デバイスIDのリスト
+            values (ndarray): 値の配列（device_ids の順）
+            ts (float): 時刻（UNIX秒）
+        """
+        with self.lock:
+            group = self.groups.get(name)
+            if group is None or group.device_ids is not device_ids:
+                if not len(device_ids):
+                    self.groups.pop(name, None)
+                    return
+                row_bytes = len(device_ids) * np.dtype(VALUE_DTYPE).itemsize + 8
+                length = max(1, min(self.length, GROUP_MEMORY_BUDGET // row_bytes))
+                if length < self.length:
+                    logger.info(f"履歴の保持数を{length}サンプルに制限: {name} ({len(device_ids)}台)")
+                group = self.groups[name] = HistoryGroup(device_ids, length)
+            group.append(ts, values)
+
+    def discard(self, device_id):
+        """1台分の履歴を破棄"""
+        with self.lock:
+            self.rings.pop(device_id, None)
+
+    def discard_group(self, name):
+        """デバイス群の履歴を破棄"""
+        with self.lock:
+            self.groups.pop(name, None)
+
+    def list_devices(self):
+        """
+        履歴のあるデバイスIDの一覧を取得
+
+        Returns:
+            list: デバイスID
+        """
+        with self.lock:
+            device_ids = list(self.rings)
+            for group in self.groups.values():
+                device_ids.extend(group.device_ids)
+        return device_ids
+
+    def get_history(self, device_id, since=None):
+        """
+        デバイスの履歴を取得
+
+        Args:
+            device_id (str): デバイスID
+            since (float, optional): この時刻以降のサンプルだけを返す（UNIX秒）
+
+        Returns:
+            tuple: (時刻 ndarray, 値 ndarray)、履歴がない場合はNone
+        """
+        with self.lock:
+            ring = self.rings.get(device_id)
+            if ring is not None:
+                ts, values = ring.ordered()
+            else:
+                group = next((g for g in self.groups.values() if device_id in g.columns), None)
+                if group is None:
+                    return None
+                ts, values = group.ordered(device_id)
+
+        if since is not None:
+            first = int(np.searchsorted(ts, since, side="left"))
+            ts, values = ts[first:], values[first:]
+        return ts, values
+
+    def get_stats(self):
+        """
+        履歴の保持状況を取得
+
+        Returns:
+            dict: デバイス数、グループ数、使用メモリ（バイト）
+        """
+        with self.lock:
+            ring_bytes = sum(r.ts.nbytes + r.values.nbytes for r in self.rings.values())
+            group_bytes = sum(g.ts.nbytes + g.values.nbytes for g in self.groups.values())
+            return {
+                "length": self.length,
+                "devices": len(self.rings) + sum(len(g.device_ids) for g in self.groups.values()),
+                "groups": len(self.groups),
+                "memory_bytes": ring_bytes + group_bytes
+            }
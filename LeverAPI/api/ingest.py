@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+テレメトリ取り込みモジュール
+
+デバイス（またはゲートウェイ）からプッシュされる値のサンプルを受信します。
+コンパクトなバイナリ形式とJSON形式に対応し、デバイスごとのシーケンス番号で
+重複・順序逆転を判定してパケットロスを集計します。
+
+バイナリ形式（リトルエンディアン）:
+    ヘッダー:   magic "LV" (2B), version (1B), count (1B)
+    レコード:   id_len (1B), id (id_len B, UTF-8), seq (uint32), device_ts_ms (uint64),
+                value (int16), raw (uint16), flags (1B, bit0 = calibrated)
+"""
+
+import json
+import time
+import struct
+import logging
+from threading import Lock
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+INGEST_PORT = 4211  # UDPテレメトリの受信ポート（4210はディスカバリー用）
+PACKET_MAGIC = b"LV"
+PACKET_VERSION = 1
+MAX_RECORDS_PER_PACKET = 255
+MAX_BATCH_SAMPLES = 50000  # HTTP取り込みの1リクエストあたりの最大サンプル数
+SEQ_MODULO = 1 << 32  # シーケンス番号の周期（uint32）
+REORDER_WINDOW = 64  # 重複判定に使う直近のシーケンス番号の幅
+MAX_TRACKED_DEVICES = 1024  # 取り込みを受け付けるデバイス数の上限（未知のIDの送信によるメモリの増加を防ぐ）
+TRACKER_IDLE_TIMEOUT = 300  # 上限に達した時、この時間サンプルが届いていないデバイスの追跡をやめる（秒）
+EVICT_INTERVAL = 1.0  # 上限に達した時に休止中のデバイスを探す最小間隔（秒）
+
+_HEADER = struct.Struct("<2sBB")
+_RECORD = struct.Struct("<IQhHB")
+FLAG_CALIBRATED = 0x01
+
+
+class IngestError(ValueError):
+    """取り込みデータの形式エラー"""
+
+
+def encode_samples(samples):
+    """
+    サンプルのリストをバイナリ形式にエンコード
+
+    Args:
+        samples (list): {"id", "seq", "ts", "value", "raw", "calibrated"} の辞書のリスト
+
+    Returns:
+        bytes: エンコードされたデータ
+    """
+    if len(samples) > MAX_RECORDS_PER_PACKET:
+        raise IngestError(f"1パケットのレコード数は{MAX_RECORDS_PER_PACKET}件までです")
+
+    parts = [_HEADER.pack(PACKET_MAGIC, PACKET_VERSION, len(samples))]
+    for sample in samples:
+        device_id = str(sample["id"]).encode("utf-8")
+        flags = FLAG_CALIBRATED if sample.get("calibrated") else 0
+        parts.append(struct.pack("<B", len(device_id)))
+        parts.append(device_id)
+        parts.append(_RECORD.pack(
+            int(sample.get("seq", 0)) % SEQ_MODULO,
+            int(sample.get("ts", 0)),
+            int(sample["value"]),
+            int(sample.get("raw", 0)),
+            flags
+        ))
+    return b"".join(parts)
+
+
+def decode_samples(data):
+    """
+    バイナリ形式またはJSON形式のデータをサンプルのリストにデコード
+
+    Args:
+        data (bytes): 受信データ
+
+    Returns:
+        list: {"id", "seq", "ts", "value", "raw", "calibrated"} の辞書のリスト
+
+    Raises:
+        IngestError: 形式が不正な場合
+    """
+    if data[:2] == PACKET_MAGIC:
+        samples, offset = _decode_binary(data)
+        return samples
+
+    try:
+        payload = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise IngestError(f"不正なデータ形式: {e}")
+
+    records = payload.get("samples", [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        raise IngestError("samplesは配列である必要があります")
+    return [_normalize_json_sample(record) for record in records]
+
+
+def decode_batch(data):
+    """
+    HTTPで受信した一括データをデコード
+
+    バイナリ形式の場合は複数のパケットを連結したデータを受け付けます。
+
+    Args:
+        data (bytes): リクエストボディ
+
+    Returns:
+        list: サンプルのリスト
+
+    Raises:
+        IngestError: 形式が不正な場合、またはサンプル数が上限を超えた場合
+    """
+    if data[:2] != PACKET_MAGIC:
+        samples = decode_samples(data)
+    else:
+        samples = []
+        offset = 0
+        while offset < len(data):
+            if data[offset:offset + 2] != PACKET_MAGIC:
+                raise IngestError(f"パケットの区切りが不正です（オフセット {offset}）")
+            frame, offset = _decode_binary(data, offset)
+            samples.extend(frame)
+            if len(samples) > MAX_BATCH_SAMPLES:
+                break
+
+    if len(samples) > MAX_BATCH_SAMPLES:
+        raise IngestError(f"1リクエストのサンプル数は{MAX_BATCH_SAMPLES}件までです")
+    return samples
+
+
+def _decode_binary(data, offset=0):
+    """
+    バイナリ形式の1パケットをデコード
+
+    Returns:
+        tuple: (サンプルのリスト, 次のパケットの開始位置)
+    """
+    if len(data) - offset < _HEADER.size:
+        raise IngestError("ヘッダーが不足しています")
+    magic, version, count = _HEADER.unpack_from(data, offset)
+    if version != PACKET_VERSION:
+        raise IngestError(f"未対応のバージョン: {version}")
+
+    samples = []
+    offset += _HEADER.size
+    for _ in range(count):
+        if offset >= len(data):
+            raise IngestError("レコードが不足しています")
+        id_len = data[offset]
+        if id_len == 0:
+            raise IngestError("デバイスIDが空です")
+        offset += 1
+        end = offset + id_len + _RECORD.size
+        if end > len(data):
+            raise IngestError("レコードが途中で切れています")
+        try:
+            device_id = data[offset:offset + id_len].decode("utf-8")
+        except UnicodeDecodeError:
+            raise IngestError("デバイスIDがUTF-8ではありません")
+        seq, ts, value, raw, flags = _RECORD.unpack_from(data, offset + id_len)
+        samples.append({
+            "id": device_id,
+            "seq": seq,
+            "ts": ts,
+            "value": value,
+            "raw": raw,
+            "calibrated": bool(flags & FLAG_CALIBRATED)
+        })
+        offset = end
+    return samples, offset
+
+
+def _normalize_json_sample(record):
+    """JSON形式のサンプルを検証して正規化"""
+    if not isinstance(record, dict) or not record.get("id") or "value" not in record:
+        raise IngestError("各サンプルにはidとvalueが必要です")
+    try:
+        return {
+            "id": str(record["id"]),
+            "seq": int(record["seq"]) % SEQ_MODULO if record.get("seq") is not None else None,
+            "ts": int(record.get("ts", 0)),
+            "value": int(record["value"]),
+            "raw": int(record.get("raw", 0)),
+            "calibrated": bool(record.get("calibrated", False))
+        }
+    except (TypeError, ValueError) as e:
+        raise IngestError(f"数値フィールドが不正です: {e}")
+
+
+class SequenceTracker:
+    """デバイスごとのシーケンス番号から重複・順序逆転・ロスを判定するクラス"""
+
+    __slots__ = ("highest", "window", "received", "duplicates", "reordered", "late", "first", "updated")
+
+    def __init__(self):
+        self.highest = None  # 受信した最大のシーケンス番号
+        self.window = 0  # highestから遡ってREORDER_WINDOW件の受信済みビットマップ
+        self.first = None  # 最初に受信したシーケンス番号
+        self.received = 0  # 重複を除いた受信数
+        self.duplicates = 0
+        self.reordered = 0  # 遅れて到着したが受理したサンプル数
+        self.late = 0  # 判定範囲より古く破棄したサンプル数
+        self.updated = 0.0  # 最後にサンプルを受信した時刻（time.monotonic）
+
+    def accept(self, seq):
+        """
+        シーケンス番号を判定
+
+        Args:
+            seq (int): シーケンス番号
+
+        Returns:
+            str: "new"（最新として適用）、"reordered"（受理するが最新値ではない）、
+                 "duplicate"、"late" のいずれか
+        """
+        if self.highest is None:
+            self.highest = seq
+            self.first = seq
+            self.window = 1
+            self.received = 1
+            return "new"
+
+        # シーケンス番号の周回を考慮した差分（RFC 1982 のシリアル番号演算）
+        diff = (seq - self.highest) % SEQ_MODULO
+        if diff == 0:
+            self.duplicates += 1
+            return "duplicate"
+
+        if diff < SEQ_MODULO // 2:
+            self.window = ((self.window << diff) | 1) & ((1 << REORDER_WINDOW) - 1) if diff < REORDER_WINDOW else 1
+            self.highest = seq
+            self.received += 1
+            return "new"
+
+        behind = SEQ_MODULO - diff
+        if behind >= REORDER_WINDOW:
+            self.late += 1
+            return "late"
+        bit = 1 << behind
+        if self.window & bit:
+            self.duplicates += 1
+            return "duplicate"
+        self.window |= bit
+        self.received += 1
+        self.reordered += 1
+        return "reordered"
+
+    def get_stats(self):
+        """
+        受信統計を取得
+
+        Returns:
+            dict: 受信数、重複、順序逆転、ロス率など
+        """
+        expected = ((self.highest - self.first) % SEQ_MODULO) + 1 if self.highest is not None else 0
+        lost = max(0, expected - self.received)
+        return {
+            "last_seq": self.highest,
+            "received": self.received,
+            "expected": expected,
+            "lost": lost,
+            "loss_rate": lost / expected if expected else 0.0,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "late": self.late
+        }
+
+
+class IngestStats:
+    """取り込み経路全体のデバイスごとの統計を管理するクラス"""
+
+    def __init__(self, max_devices=MAX_TRACKED_DEVICES, on_evict=None):
+        """
+        初期化
+
+        Args:
+            max_devices (int): 取り込みを受け付けるデバイス数の上限
+            on_evict (callable, optional): 追跡をやめたデバイスIDのリストを受け取るコールバック
+        """
+        self.trackers = {}  # {device_id: SequenceTracker}（取り込みを受け付けているデバイス）
+        self.max_devices = max_devices
+        self.on_evict = on_evict
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+        self.packets = 0  # UDPパケット数
+        self.batches = 0  # HTTP一括取り込みのリクエスト数
+        self.samples = 0
+        self.errors = 0
+        self.over_capacity = 0  # デバイス数の上限により破棄したサンプル数
+        self.evicted = 0  # 休止中のため追跡をやめたデバイス数
+        self._last_evict = float("-inf")
+
+    def count_packet(self):
+        """UDPパケットの受信を記録"""
+        with self.lock:
+            self.packets += 1
+
+    def count_batch(self):
+        """HTTP一括取り込みのリクエストを記録"""
+        with self.lock:
+            self.batches += 1
+
+    def count_error(self):
+        """デコードできなかったデータを記録"""
+        with self.lock:
+            self.errors += 1
+
+    def _evict_idle(self, now):
+        """
+        休止中のデバイスの追跡をやめる（ロック取得済みで呼び出す）
+
+        上限に達している間に未知のIDが届き続けても走査が繰り返されないよう、EVICT_INTERVAL ごとに1回だけ行います。
+
+        Returns:
+            list: 追跡をやめたデバイスID
+        """
+        if now - self._last_evict < EVICT_INTERVAL:
+            return []
+        self._last_evict = now
+        idle = [device_id for device_id, t in self.trackers.items() if now - t.updated >= TRACKER_IDLE_TIMEOUT]
+        for device_id in idle:
+            del self.trackers[device_id]
+        self.evicted += len(idle)
+        return idle
+
+    def classify_many(self, samples, now=None):
+        """
+        サンプルをまとめて判定し、受理したものだけを返す（シーケンス番号がない場合は常に最新として扱う）
+
+        追跡中のデバイス数が上限に達している場合、未知のデバイスのサンプルは休止中のデバイスの追跡を
+        やめて空きができるまで破棄します。
+
+        Args:
+            samples (list): デコード済みのサンプルのリスト
+            now (float, optional): 受信時刻（time.monotonic、省略時は現在時刻）
+
+        Returns:
+            tuple: (受理したサンプルのリスト, 破棄したサンプル数)。
+                受理したサンプルには判定結果 "order"（"new" または "reordered"）が付与される
+        """
+        now = now if now is not None else time.monotonic()
+        accepted = []
+        evicted = []
+        with self.lock:
+            self.samples += len(samples)
+            trackers = self.trackers
+            for sample in samples:
+                tracker = trackers.get(sample["id"])
+                if tracker is None:
+                    if len(trackers) >= self.max_devices:
+                        evicted.extend(self._evict_idle(now))
+                        if len(trackers) >= self.max_devices:
+                            self.over_capacity += 1
+                            continue
+                    tracker = trackers[sample["id"]] = SequenceTracker()
+                tracker.updated = now
+
+                seq = sample["seq"]
+                order = "new" if seq is None else tracker.accept(seq)
+                if order in ("new", "reordered"):
+                    sample["order"] = order
+                    accepted.append(sample)
+
+        if evicted and self.on_evict:
+            try:
+                self.on_evict(evicted)
+            except Exception as e:
+                logger.error(f"取り込みデバイスの破棄でエラー: {e}")
+        return accepted, len(samples) - len(accepted)
+
+    def get_stats(self):
+        """
+        統計情報を取得
+
+        Returns:
+            dict: 全体とデバイスごとの統計
+        """
+        with self.lock:
+            return {
+                "packets": self.packets,
+                "batches": self.batches,
+                "samples": self.samples,
+                "errors": self.errors,
+                "max_devices": self.max_devices,
+                "over_capacity": self.over_capacity,
+                "evicted": self.evicted,
+                "devices": {device_id: t.get_stats() for device_id, t in self.trackers.items()}
+            }
+
+
+class UdpIngestListener:
+    """UDPでプッシュされたテレメトリを受信するリスナー"""
+
+    def __init__(self, on_samples, port=INGEST_PORT, host="0.0.0.0", stats=None):
+        """
+        初期化
+
+        Args:
+            on_samples (callable): 受理したサンプルを渡すコールバック
+                on_samples(samples: list, addr: tuple)。各サンプルには判定結果 "order" が付与される
+            port (int): 受信ポート
+            host (str): 受信アドレス
+            stats (IngestStats, optional): 統計（HTTP取り込みと共有する場合に指定）
+        """
+        self.on_samples = on_samples
+        self.port = port
+        self.host = host
+        self.stats = stats or IngestStats()
+        self.sock = None
+        self._thread = None
+
+    def start(self):
+        """リスナーを開始"""
+        import socket
+        import eventlet
+
+        if self.sock is not None:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self.sock = sock
+        self._thread = eventlet.spawn(self._run, sock)
+        logger.info(f"UDPテレメトリ受信開始: {self.host}:{self.port}")
+
+    def stop(self):
+        """リスナーを停止"""
+        if self.sock is None:
+            return
+        sock, self.sock = self.sock, None
+        if self._thread:
+            self._thread.kill()
+            self._thread = None
+        sock.close()
+        logger.info("UDPテレメトリ受信停止")
+
+    @property
+    def running(self):
+        """リスナーが動作中かどうか"""
+        return self.sock is not None
+
+    def _run(self, sock):
+        """受信ループ"""
+        while self.sock is sock:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except OSError:
+                if self.sock is not sock:
+                    break
+                continue
+            self.handle_packet(data, addr)
+
+    def handle_packet(self, data, addr):
+        """
+        1パケット分のデータを処理
+
+        Args:
+            data (bytes): 受信データ
+            addr (tuple): 送信元アドレス
+
+        Returns:
+            int: 受理したサンプル数
+        """
+        self.stats.count_packet()
+        try:
+            samples = decode_samples(data)
+        except IngestError as e:
+            self.stats.count_error()
+            logger.debug(f"不正なテレメトリパケット: {addr} - {e}")
+            return 0
+
+        accepted, _ = self.stats.classify_many(samples)
+        if accepted:
+            try:
+                self.on_samples(accepted, addr)
+            except Exception as e:
+                logger.error(f"テレメトリ処理でエラー: {e}")
+        return len(accepted)
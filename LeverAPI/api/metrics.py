@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+メトリクスモジュール
+
+ホットパスで常時使用できる軽量な計測用プリミティブと、
+それらをPrometheusのテキスト形式で出力するレジストリを提供します。
+"""
+
+import bisect
+from threading import Lock
+
+# 秒単位の計測に使うデフォルトのバケット境界
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0
+)
+
+
+class Histogram:
+    """固定バケットのヒストグラム（累積ではなくバケットごとに計数）"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        初期化
+
+        Args:
+            buckets (tuple): 昇順のバケット上限値
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は+Infバケット
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+
+    def observe(self, value):
+        """
+        値を記録
+
+        Args:
+            value (float): 観測値
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def reset(self):
+        """記録をすべて消去"""
+        with self.lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def quantile(self, q):
+        """
+        バケット内の線形補間で分位点を推定
+
+        Args:
+            q (float): 分位（0.0-1.0）
+
+        Returns:
+            float: 推定値、記録がない場合はNone
+        """
+        with self.lock:
+            return self._quantile(q)
+
+    def _quantile(self, q):
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                return min(self.max, lower + (upper - lower) * fraction)
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self):
+        """
+        ヒストグラムの状態を取得
+
+        Returns:
+            dict: バケット、件数、合計、主要な分位点
+        """
+        with self.lock:
+            labels = [str(b) for b in self.buckets] + ["+Inf"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "sum": self.sum,
+                "max": self.max,
+                "p50": self._quantile(0.50),
+                "p95": self._quantile(0.95),
+                "p99": self._quantile(0.99)
+            }
+
+
+class Counter:
+    """単調増加するカウンター"""
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+
+    def inc(self, amount=1):
+        """
+        カウンターを増やす
+
+        Args:
+            amount (float): 増分
+        """
+        with self.lock:
+            self.value += amount
+
+
+class MetricFamily:
+    """ラベルの値ごとに子のメトリクスを持つメトリクス"""
+
+    def __init__(self, name, help_text, kind, label_names=(), factory=Counter):
+        """
+        初期化
+
+        Args:
+            name (str): メトリクス名
+            help_text (str): 説明
+            kind (str): 種類（counter / histogram）
+            label_names (tuple): ラベル名
+            factory (callable): 子のメトリクスを作成する関数
+        """
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.factory = factory
+        self.children = {}  # {ラベルの値のタプル: Counter または Histogram}
+        self.lock = Lock()  # 子の作成の排他用
+        if not self.label_names:
+            self.children[()] = factory()  # ラベルのないメトリクスは記録前から0として出力する
+
+    def labels(self, *values):
+        """
+        ラベルの値に対応する子のメトリクスを取得（なければ作成）
+
+        Args:
+            *values (str): ラベルの値（label_names の順）
+
+        Returns:
+            Counter または Histogram
+        """
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.factory())
+        return child
+
+    def inc(self, amount=1):
+        """ラベルのないカウンターを増やす"""
+        self.labels().inc(amount)
+
+    def observe(self, value):
+        """ラベルのないヒストグラムに値を記録"""
+        self.labels().observe(value)
+
+
+class CallbackMetric:
+    """出力時に関数を呼び出して値を取得するメトリクス（既存の統計情報の公開用）"""
+
+    def __init__(self, name, help_text, kind, label_names, func):
+        """
+        初期化
+
+        Args:
+            name (str): メトリクス名
+            help_text (str): 説明
+            kind (str): 種類（gauge / counter）
+            label_names (tuple): ラベル名
+            func (callable): {ラベルの値のタプル: 値} を返す関数
+        """
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.func = func
+
+
+def _escape_label(value):
+    """ラベルの値をエスケープ"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    """ラベルの文字列（{name="value",...}）"""
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    """サンプルの値の文字列"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """メトリクスを登録し、Prometheusのテキスト形式で出力するクラス"""
+
+    def __init__(self, prefix=""):
+        """
+        初期化
+
+        Args:
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.prefix = prefix
+        self.metrics = []  # 登録順
+
+    def counter(self, name, help_text, label_names=()):
+        """
+        カウンターを登録（名前は _total で終わるものとする）
+
+        Returns:
+            MetricFamily: 登録したカウンター
+        """
+        family = MetricFamily(self.prefix + name, help_text, "counter", label_names, Counter)
+        self.metrics.append(family)
+        return family
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        ヒストグラムを登録
+
+        Returns:
+            MetricFamily: 登録したヒストグラム
+        """
+        family = MetricFamily(self.prefix + name, help_text, "histogram", label_names, lambda: Histogram(buckets))
+        self.metrics.append(family)
+        return family
+
+    def callback(self, name, help_text, kind, label_names, func):
+        """
+        出力時に値を取得するメトリクスを登録
+
+        Args:
+            name (str): メトリクス名
+            help_text (str): 説明
+            kind (str): 種類（gauge / counter）
+            label_names (tuple): ラベル名
+            func (callable): {ラベルの値のタプル: 値} を返す関数
+        """
+        self.metrics.append(CallbackMetric(self.prefix + name, help_text, kind, label_names, func))
+
+    def render(self):
+        """
+        全メトリクスをPrometheusのテキスト形式で出力
+
+        Returns:
+            str: テキスト形式（version 0.0.4）
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, CallbackMetric):
+                try:
+                    samples = metric.func()
+                except Exception as e:
+                    lines.append(f"# {metric.name} の取得でエラー: {e}")
+                    continue
+                for values, value in samples.items():
+                    lines.append(f"{metric.name}{_format_labels(metric.label_names, values)} {_format_value(value)}")
+                continue
+
+            for values, child in list(metric.children.items()):
+                labels = _format_labels(metric.label_names, values)
+                if metric.kind == "counter":
+                    lines.append(f"{metric.name}{labels} {_format_value(child.value)}")
+                    continue
+                with child.lock:
+                    counts, count, total = list(child.counts), child.count, child.sum
+                cumulative = 0
+                for bound, bucket_count in zip(child.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = _format_labels(metric.label_names, values, f'le="{_format_value(float(bound))}"')
+                    lines.append(f"{metric.name}_bucket{le} {cumulative}")
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
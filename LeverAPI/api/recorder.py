@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+セッション記録モジュール
+
+取り込んだすべてのサンプルをサーバー側で固定長のバイナリレコードとして追記保存します。
+セッションはディレクトリ単位で、メタデータ（meta.json）とセグメントファイル（*.lvr）で構成されます。
+
+セグメントファイルの形式（リトルエンディアン）:
+    ヘッダー（32バイト）: マジック, バージョン, レコード長, セグメント番号, 基準時刻（UNIX秒）
+    レコード（10バイト）: 基準時刻からの経過ミリ秒(uint32), スロット(uint16), 値(int16), 生値(uint16)
+
+スロットはセッション内でデバイスに割り当てた番号で、meta.json の devices[スロット] がデバイスIDです。
+監視ループからの記録はメモリ上のバッファへの追記だけで、ファイルへの書き込みと fsync は
+バックグラウンドのタスクがまとめて行います。
+"""
+
+import os
+import json
+import time
+import struct
+import logging
+from datetime import datetime
+from threading import Lock
+
+import eventlet
+from eventlet import tpool
+import numpy as np
+
+from .metrics import Histogram
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+SEGMENT_MAGIC = b"LVSESS1\0"  # セグメントファイルの識別子
+FORMAT_VERSION = 1  # ファイル形式のバージョン
+SEGMENT_HEADER = struct.Struct("<8sHHId8x")  # マジック, バージョン, レコード長, セグメント番号, 基準時刻
+RECORD = struct.Struct("<IHhH")  # 経過ミリ秒, スロット, 値, 生値
+RECORD_DTYPE = np.dtype([("ts", "<u4"), ("slot", "<u2"), ("value", "<i2"), ("raw", "<u2")])  # RECORDと同じ配置
+SEGMENT_SUFFIX = ".lvr"  # セグメントファイルの拡張子
+META_FILE = "meta.json"  # セッションのメタデータファイル名
+MAX_SLOTS = 0xFFFF  # 1セッションで記録できるデバイス数
+FLUSH_INTERVAL = 1.0  # バッファをファイルに書き込む間隔（秒）
+FSYNC_INTERVAL = 5.0  # fsyncでディスクへの書き込みを確定する間隔（秒）
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024  # セグメントを切り替えるサイズ（バイト）
+DEFAULT_SEGMENT_SECONDS = 3600.0  # セグメントを切り替える経過時間（秒）
+MAX_SEGMENT_SECONDS = 7 * 24 * 3600.0  # 経過ミリ秒がuint32に収まる範囲で設定できる上限
+FLUSH_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+def segment_name(index):
+    """
+    セグメント番号からファイル名を作成
+
+    Args:
+        index (int): セグメント番号
+
+    Returns:
+        str: ファイル名
+    """
+    return f"{index:06d}{SEGMENT_SUFFIX}"
+
+
+def read_meta(session_dir):
+    """
+    セッションのメタデータを読み込む
+
+    Args:
+        session_dir (str): セッションのディレクトリ
+
+    Returns:
+        dict: メタデータ（読み込めない場合はNone）
+    """
+    try:
+        with open(os.path.join(session_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+class SessionRecorder:
+    """取り込んだサンプルをセッションファイルに追記するクラス"""
+
+    def __init__(self, base_dir, segment_bytes=DEFAULT_SEGMENT_BYTES, segment_seconds=DEFAULT_SEGMENT_SECONDS):
+        """
+        初期化
+
+        Args:
+            base_dir (str): セッションを保存するディレクトリ
+            segment_bytes (int): セグメントを切り替えるサイズ（バイト）
+            segment_seconds (float): セグメントを切り替える経過時間（秒）
+        """
+        self.base_dir = base_dir
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.lock = Lock()  # バッファとスロット表の排他用
+        self.io_lock = Lock()  # ファイル操作の排他用
+        self.session_id = None
+        self.session_dir = None
+        self.meta = None
+        self._buffer = bytearray()
+        self._slots = {}  # {device_id: スロット}
+        self._slot_cache = (None, None)  # (デバイスIDのリスト, スロット配列) record_many の再計算を省く
+        self._file = None
+        self._thread = None
+        self._base_time = 0.0  # 現在のセグメントの基準時刻
+        self._segment_started = 0.0  # 現在のセグメントを開始した時刻（切り替え判定用）
+        self._segment_size = 0
+        self._meta_dirty = False
+        self._last_fsync = 0.0
+        self.samples = 0
+        self.dropped = 0  # スロットが足りない・値が範囲外で記録できなかったサンプル数
+        self.bytes_written = 0
+        self.flush_time = Histogram(FLUSH_BUCKETS)  # 1回の書き込みにかかった時間
+
+    @property
+    def recording(self):
+        """記録中かどうか"""
+        return self._file is not None
+
+    def start(self, name=None, segment_bytes=None, segment_seconds=None):
+        """
+        新しいセッションの記録を開始
+
+        Args:
+            name (str, optional): セッションの表示名
+            segment_bytes (int, optional): セグメントを切り替えるサイズ（バイト）
+            segment_seconds (float, optional): セグメントを切り替える経過時間（秒）
+
+        Returns:
+            dict: 作成したセッションのメタデータ
+
+        Raises:
+            RuntimeError: すでに記録中の場合
+            ValueError: 設定が不正な場合
+            OSError: セッションのディレクトリを作成できない場合
+        """
+        segment_bytes = self.segment_bytes if segment_bytes is None else segment_bytes
+        segment_seconds = self.segment_seconds if segment_seconds is None else segment_seconds
+        if isinstance(segment_bytes, bool) or not isinstance(segment_bytes, int) or segment_bytes < 1024:
+            raise ValueError("segment_bytes は1024以上の整数で指定してください")
+        if not 1 <= float(segment_seconds) <= MAX_SEGMENT_SECONDS:
+            raise ValueError(f"segment_seconds は1から{MAX_SEGMENT_SECONDS:g}の範囲で指定してください")
+        if name is not None and not isinstance(name, str):
+            raise ValueError("name は文字列で指定してください")
+
+        with self.io_lock:
+            if self.recording:
+                raise RuntimeError(f"セッションを記録中です: {self.session_id}")
+
+            now = time.time()
+            session_id = self._new_session_id(now)
+            session_dir = os.path.join(self.base_dir, session_id)
+            os.makedirs(session_dir)
+
+            self.session_id = session_id
+            self.session_dir = session_dir
+            self.segment_bytes = segment_bytes
+            self.segment_seconds = float(segment_seconds)
+            self.meta = {
+                "version": FORMAT_VERSION,
+                "id": session_id,
+                "name": name or session_id,
+                "started_at": now,
+                "stopped_at": None,
+                "record_format": RECORD.format,
+                "record_size": RECORD.size,
+                "header_size": SEGMENT_HEADER.size,
+                "devices": [],
+                "segments": [],
+                "samples": 0,
+                "dropped": 0
+            }
+            with self.lock:
+                self._buffer = bytearray()
+                self._slots = {}
+                self._slot_cache = (None, None)
+                self.samples = 0
+                self.dropped = 0
+            self.bytes_written = 0
+            self.flush_time.reset()
+            self._open_segment(now)
+            self._last_fsync = now
+            self._write_meta()
+            self._thread = eventlet.spawn(self._flush_loop)
+
+        logger.info(f"セッション記録開始: {session_id} ({session_dir})")
+        return self.get_session_meta(session_id)
+
+    def stop(self):
+        """
+        記録を停止し、残りのバッファを書き込んでファイルを閉じる
+
+        Returns:
+            dict: 停止したセッションのメタデータ（記録中でなかった場合はNone）
+        """
+        with self.io_lock:
+            if not self.recording:
+                return None
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                thread.kill()
+            try:
+                self._flush(sync=True)
+            except OSError as e:
+                logger.error(f"セッションの書き込みに失敗しました: {e}")
+            self._close_segment()
+            self.meta["stopped_at"] = time.time()
+            self._write_meta()
+            session_id = self.session_id
+
+        logger.info(f"セッション記録停止: {session_id} ({self.samples}サンプル, {self.bytes_written}バイト)")
+        return self.get_session_meta(session_id)
+
+    def record(self, device_id, value, raw, timestamp):
+        """
+        1サンプルをバッファに追記（記録中でない場合は何もしない）
+
+        Args:
+            device_id (str): デバイスID
+            value (int): 値（0-100）
+            raw (int): 生値
+            timestamp (float): 取得時刻（UNIX秒）
+        """
+        if self._file is None:
+            return
+        with self.lock:
+            slot = self._slots.get(device_id)
+            if slot is None:
+                slot = self._assign_slot(device_id)
+                if slot is None:
+                    self.dropped += 1
+                    return
+            offset = int((timestamp - self._base_time) * 1000)
+            try:
+                self._buffer += RECORD.pack(max(0, offset), slot, int(value), int(raw or 0))
+            except (struct.error, TypeError, ValueError):
+                self.dropped += 1
+                return
+            self.samples += 1
+
+    def record_many(self, device_ids, values, raw, timestamp):
+        """
+        同じ時刻の複数デバイスのサンプルをまとめてバッファに追記（シミュレーション用）
+
+        Args:
+            device_ids (list): デバイスIDのリスト（同じリストを渡し続けるとスロットの変換を省略）
+            values (ndarray): 値の配列
+            raw (ndarray): 生値の配列
+            timestamp (float): 取得時刻（UNIX秒）
+        """
+        if self._file is None or not len(device_ids):
+            return
+        with self.lock:
+            cached_ids, slots = self._slot_cache
+            if cached_ids is not device_ids or len(slots) != len(device_ids):
+                slots = []
+                for device_id in device_ids:
+                    slot = self._slots.get(device_id)
+                    if slot is None:
+                        slot = self._assign_slot(device_id)
+                    slots.append(-1 if slot is None else slot)  # -1: スロットが尽きて記録できないデバイス
+                slots = np.array(slots, dtype=np.int64)
+                self._slot_cache = (device_ids, slots)
+
+            mask = slots >= 0
+            records = np.empty(int(mask.sum()), dtype=RECORD_DTYPE)
+            records["ts"] = max(0, int((timestamp - self._base_time) * 1000))
+            records["slot"] = slots[mask]
+            records["value"] = np.asarray(values)[mask]
+            records["raw"] = np.asarray(raw)[mask]
+            self._buffer += records.tobytes()
+            self.samples += len(records)
+            self.dropped += len(device_ids) - len(records)
+
+    def _assign_slot(self, device_id):
+        """新しいデバイスにスロットを割り当てる（ロック取得済みで呼び出す）"""
+        devices = self.meta["devices"]
+        if len(devices) >= MAX_SLOTS:
+            return None  # スロットが尽きた場合は記録しない
+        slot = len(devices)
+        devices.append(device_id)
+        self._slots[device_id] = slot
+        self._meta_dirty = True
+        return slot
+
+    def _new_session_id(self, now):
+        """開始時刻からセッションIDを作成（同じ秒に開始した場合は連番を付与）"""
+        base = datetime.fromtimestamp(now).strftime("%Y%m%d-%H%M%S")
+        session_id, suffix = base, 1
+        while os.path.exists(os.path.join(self.base_dir, session_id)):
+            suffix += 1
+            session_id = f"{base}-{suffix}"
+        return session_id
+
+    def _open_segment(self, now):
+        """新しいセグメントファイルを作成（io_lock取得済みで呼び出す）"""
+        index = len(self.meta["segments"])
+        path = os.path.join(self.session_dir, segment_name(index))
+        f = open(path, "ab")
+        f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, FORMAT_VERSION, RECORD.size, index, now))
+        with self.lock:
+            self._base_time = now  # 以降のレコードは新しいセグメントの基準時刻からの経過時間（切り替え時は設定済み）
+        self._file = f
+        self._segment_started = now
+        self._segment_size = SEGMENT_HEADER.size
+        self.bytes_written += SEGMENT_HEADER.size
+        self.meta["segments"].append({"file": segment_name(index), "base_time": now, "records": 0})
+        self._meta_dirty = True
+
+    def _close_segment(self):
+        """現在のセグメントファイルを閉じる（io_lock取得済みで呼び出す）"""
+        f, self._file = self._file, None
+        if f is not None:
+            try:
+                f.close()
+            except OSError as e:
+                logger.error(f"セグメントファイルを閉じられません: {e}")
+
+    def _flush(self, sync=False):
+        """
+        バッファをファイルに書き込み、必要であればfsyncとセグメントの切り替えを行う（io_lock取得済みで呼び出す）
+
+        Args:
+            sync (bool): Trueの場合は間隔に関わらずfsyncする
+        """
+        started = time.perf_counter()
+        with self.lock:
+            data, self._buffer = self._buffer, bytearray()
+            samples, dropped = self.samples, self.dropped
+
+        if data:
+            self._file.write(data)
+            self._segment_size += len(data)
+            self.bytes_written += len(data)
+            self.meta["segments"][-1]["records"] = (self._segment_size - SEGMENT_HEADER.size) // RECORD.size
+
+        now = time.time()
+        if sync or now - self._last_fsync >= FSYNC_INTERVAL:
+            self._file.flush()
+            # fsyncはディスクの応答を待つため、イベントループを止めないようにスレッドプールで実行する
+            tpool.execute(os.fsync, self._file.fileno())
+            self._last_fsync = now
+            self.meta["samples"], self.meta["dropped"] = samples, dropped
+            self._meta_dirty = True
+
+        if self._meta_dirty:
+            self._write_meta()
+        if data:
+            self.flush_time.observe(time.perf_counter() - started)
+
+        if self._segment_size >= self.segment_bytes or now - self._segment_started >= self.segment_seconds:
+            self._rotate(now)
+
+    def _rotate(self, now):
+        """現在のセグメントを確定して次のセグメントに切り替える（io_lock取得済みで呼び出す）"""
+        # 基準時刻の切り替えとバッファの取り出しを同時に行う（fsyncで待つ間に追記されたレコードは
+        # 古い基準時刻からの経過時間のため、ここで古いセグメントに書き込む）
+        with self.lock:
+            data, self._buffer = self._buffer, bytearray()
+            self._base_time = now
+        if data:
+            self._file.write(data)
+            self._segment_size += len(data)
+            self.bytes_written += len(data)
+            self.meta["segments"][-1]["records"] = (self._segment_size - SEGMENT_HEADER.size) // RECORD.size
+        self._file.flush()
+        tpool.execute(os.fsync, self._file.fileno())
+        self._close_segment()
+        self._open_segment(now)
+        self._last_fsync = now
+        self._write_meta()
+        logger.info(f"セッションのセグメントを切り替え: {self.session_id} {self.meta['segments'][-1]['file']}")
+
+    def _write_meta(self):
+        """メタデータを一時ファイル経由で保存（io_lock取得済みで呼び出す）"""
+        path = os.path.join(self.session_dir, META_FILE)
+        tmp_path = f"{path}.tmp"
+        with self.lock:
+            meta = dict(self.meta, devices=list(self.meta["devices"]))
+            self._meta_dirty = False
+        meta["segments"] = [dict(segment) for segment in meta["segments"]]
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._meta_dirty = True
+            logger.warning(f"セッションのメタデータを保存できません: {path} - {e}")
+
+    def _flush_loop(self):
+        """一定間隔でバッファをファイルに書き込むタスク"""
+        while True:
+            eventlet.sleep(FLUSH_INTERVAL)
+            with self.io_lock:
+                if not self.recording:
+                    return
+                try:
+                    self._flush()
+                except OSError as e:
+                    logger.error(f"セッションの書き込みに失敗しました: {e}")
+
+    def list_sessions(self):
+        """
+        保存済みのセッションの一覧を取得
+
+        Returns:
+            list: セッションの概要（新しい順）
+        """
+        sessions = []
+        if not os.path.isdir(self.base_dir):
+            return sessions
+        for entry in os.scandir(self.base_dir):
+            if entry.is_dir():
+                summary = self.get_session_meta(entry.name, include_devices=False)
+                if summary is not None:
+                    sessions.append(summary)
+        sessions.sort(key=lambda s: s.get("started_at") or 0, reverse=True)
+        return sessions
+
+    def get_session_meta(self, session_id, include_devices=True):
+        """
+        セッションのメタデータを取得
+
+        セグメントのレコード数はファイルサイズから求めるため、異常終了したセッションも
+        書き込み済みのレコードまで数えられます。
+
+        Args:
+            session_id (str): セッションID
+            include_devices (bool): デバイスIDの一覧を含める
+
+        Returns:
+            dict: メタデータ（セッションがない場合はNone）
+        """
+        session_dir = self.resolve_session(session_id)
+        if session_dir is None:
+            return None
+        meta = read_meta(session_dir)
+        if meta is None:
+            return None
+
+        size = 0
+        records = 0
+        for segment in meta.get("segments", []):
+            try:
+                segment_size = os.path.getsize(os.path.join(session_dir, segment["file"]))
+            except (OSError, KeyError, TypeError):
+                continue
+            segment["records"] = max(0, segment_size - SEGMENT_HEADER.size) // RECORD.size
+            size += segment_size
+            records += segment["records"]
+
+        meta["size"] = size
+        meta["records"] = records
+        meta["device_count"] = len(meta.get("devices", []))
+        meta["recording"] = self.recording and session_id == self.session_id
+        meta["complete"] = meta.get("stopped_at") is not None
+        if not include_devices:
+            meta.pop("devices", None)
+            meta.pop("segments", None)
+        return meta
+
+    def resolve_session(self, session_id):
+        """
+        セッションIDをディレクトリのパスに変換
+
+        Args:
+            session_id (str): セッションID（ディレクトリを含まない名前）
+
+        Returns:
+            str: セッションのディレクトリ、不正なIDや存在しない場合はNone
+        """
+        if not isinstance(session_id, str) or not session_id or os.path.basename(session_id) != session_id \
+                or session_id.startswith("."):
+            return None
+        session_dir = os.path.join(self.base_dir, session_id)
+        return session_dir if os.path.isdir(session_dir) else None
+
+    def get_status(self):
+        """
+        記録状態を取得
+
+        Returns:
+            dict: 記録中のセッション、サンプル数、書き込み量、書き込み時間
+        """
+        with self.lock:
+            buffered = len(self._buffer)
+            devices = len(self.meta["devices"]) if self.meta else 0
+        return {
+            "recording": self.recording,
+            "session_id": self.session_id if self.recording else None,
+            "directory": self.base_dir,
+            "samples": self.samples,
+            "dropped": self.dropped,
+            "devices": devices,
+            "bytes_written": self.bytes_written,
+            "buffered_bytes": buffered,
+            "segments": len(self.meta["segments"]) if self.meta else 0,
+            "segment_bytes": self.segment_bytes,
+            "segment_seconds": self.segment_seconds,
+            "flush_time": self.flush_time.snapshot()
+        }
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+デバイスレジストリモジュール
+
+デバイス情報をコピーオンライトのスナップショットとして保持します。
+書き込みはロックで直列化し、変更のたびに新しいスナップショットを作成して差し替えるため、
+読み取り側はロックなしで一貫した状態を参照できます。
+応答のたびに変わる生存確認用フィールド（last_seen）だけの変更は、デバイス数に比例するコピーを避けるため
+スナップショットの外の生存確認用マップに記録し、公開済みのデバイス情報は変更しません。
+最新の値が必要な読み取り側は current() でデバイス情報に反映します。
+"""
+
+import logging
+from collections import deque
+from threading import Lock
+from types import MappingProxyType
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+LIVENESS_FIELDS = frozenset({"last_seen"})  # 変化してもバージョンを進めず、スナップショットの外に記録するフィールド
+DEFAULT_CHANGE_LOG_SIZE = 1024  # 保持する変更履歴の件数
+
+
+class DeviceRegistry:
+    """バージョン付きのデバイスレジストリ"""
+
+    def __init__(self, change_log_size=DEFAULT_CHANGE_LOG_SIZE):
+        """
+        初期化
+
+        Args:
+            change_log_size (int): 保持する変更履歴の件数
+        """
+        # (バージョン, {device_id: device_info}) を1つの属性として差し替える
+        self._state = (0, MappingProxyType({}))
+        self.change_log = deque(maxlen=change_log_size)  # [{version, device_id, op, fields}]
+        self._record_versions = {}  # {device_id: そのデバイスが最後に変更されたバージョン}
+        # スナップショットより新しい生存確認用フィールド {device_id: {field: value}}（値の辞書ごと差し替える）
+        self._liveness = {}
+        self.write_lock = Lock()  # 書き込みの直列化用（読み取りには不要）
+
+    @property
+    def version(self):
+        """現在のバージョン（デバイスの追加・削除・属性変更のたびに増加）"""
+        return self._state[0]
+
+    def snapshot(self):
+        """
+        現在のスナップショットを取得（ロック不要）
+
+        返されるマッピングとデバイス情報は以後変更されないため、呼び出し側で変更してはいけません。
+        生存確認用フィールドはスナップショット作成時点の値です（最新の値は current() で取得）。
+
+        Returns:
+            MappingProxyType: {device_id: device_info}
+        """
+        return self._state[1]
+
+    def read(self):
+        """
+        バージョンとスナップショットの組を取得
+
+        Returns:
+            tuple: (version, {device_id: device_info})
+        """
+        return self._state
+
+    def get(self, device_id):
+        """
+        デバイス情報を取得
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            dict: デバイス情報、存在しない場合はNone
+        """
+        return self._state[1].get(device_id)
+
+    def record_version(self, device_id):
+        """
+        デバイスごとのバージョンを取得
+
+        そのデバイスの追加・置き換え・属性変更の時点のレジストリバージョンで、
+        他のデバイスの変更では変わりません。デバイスごとのキャッシュの無効化に使用します。
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            int: バージョン（未登録のデバイスは0）
+        """
+        return self._record_versions.get(device_id, 0)
+
+    def current(self, device_info):
+        """
+        デバイス情報に最新の生存確認用フィールドを反映
+
+        Args:
+            device_info (dict): スナップショットのデバイス情報
+
+        Returns:
+            dict: 生存確認用フィールドの更新がある場合は反映したコピー、ない場合は device_info そのもの
+        """
+        live = self._liveness.get(device_info.get("id"))
+        return {**device_info, **live} if live else device_info
+
+    def _changed_fields(self, device_id, previous, fields):
+        """
+        更新で実際に値が変わるフィールド（書き込みロック取得済みで呼び出す）
+
+        生存確認用フィールドだけが変わる場合は生存確認用マップに記録して空の辞書を返します。
+        それ以外の場合は保留中の生存確認用フィールドもスナップショットに反映するため、変更に含めて返します。
+        """
+        live = self._liveness.get(device_id)
+        effective = {**previous, **live} if live else previous
+        changed = {k: v for k, v in fields.items() if effective.get(k) != v}
+        if changed.keys() <= LIVENESS_FIELDS:
+            if changed:
+                self._liveness[device_id] = {**live, **changed} if live else changed
+            return {}
+        pending = self._liveness.pop(device_id, None)
+        return {**pending, **changed} if pending else changed
+
+    def _commit(self, devices, device_id, op, fields, bump):
+        """新しいスナップショットを公開（書き込みロック取得済みで呼び出す）"""
+        version = self._state[0]
+        if bump:
+            version += 1
+            if op == "remove":
+                self._record_versions.pop(device_id, None)
+            else:
+                self._record_versions[device_id] = version
+            self.change_log.append({
+                "version": version,
+                "device_id": device_id,
+                "op": op,
+                "fields": fields
+            })
+        self._state = (version, MappingProxyType(devices))
+
+    def upsert(self, device_id, device_info):
+        """
+        デバイスを登録（既存の場合は置き換え）
+
+        Args:
+            device_id (str): デバイスID
+            device_info (dict): デバイス情報
+
+        Returns:
+            dict: 置き換え前のデバイス情報、新規の場合はNone
+        """
+        record = dict(device_info)
+        with self.write_lock:
+            devices = dict(self._state[1])
+            previous = devices.get(device_id)
+            devices[device_id] = record
+            self._liveness.pop(device_id, None)
+            op = "add" if previous is None else "replace"
+            self._commit(devices, device_id, op, sorted(record.keys()), True)
+        return previous
+
+    def upsert_many(self, records):
+        """
+        複数デバイスをまとめて登録（既存の場合は置き換え）
+
+        スナップショットの作成と公開は1回だけ行います。
+        変更履歴とバージョンは upsert と同じくデバイスごとに記録されます。
+
+        Args:
+            records (iterable): デバイス情報（idを含む）のリスト
+        """
+        with self.write_lock:
+            version, current = self._state
+            devices = dict(current)
+            for device_info in records:
+                record = dict(device_info)
+                device_id = record["id"]
+                op = "add" if device_id not in devices else "replace"
+                devices[device_id] = record
+                self._liveness.pop(device_id, None)
+                version += 1
+                self._record_versions[device_id] = version
+                self.change_log.append({
+                    "version": version,
+                    "device_id": device_id,
+                    "op": op,
+                    "fields": sorted(record.keys())
+                })
+            self._state = (version, MappingProxyType(devices))
+
+    def update(self, device_id, **fields):
+        """
+        デバイスの属性を更新
+
+        last_seen などの生存確認用フィールドだけが変わった場合は、
+        スナップショットを作り直さずに生存確認用マップに記録し、バージョンも進めません。
+
+        Args:
+            device_id (str): デバイスID
+            **fields: 更新するフィールド
+
+        Returns:
+            dict: 更新前のデバイス情報、存在しない場合はNone
+        """
+        with self.write_lock:
+            previous = self._state[1].get(device_id)
+            if previous is None:
+                return None
+
+            changed = self._changed_fields(device_id, previous, fields)
+            if not changed:
+                return previous
+
+            record = dict(previous)
+            record.update(changed)
+            devices = dict(self._state[1])
+            devices[device_id] = record
+            semantic = sorted(k for k in changed if k not in LIVENESS_FIELDS)
+            self._commit(devices, device_id, "update", semantic, bool(semantic))
+        return previous
+
+    def update_many(self, updates):
+        """
+        複数デバイスの属性をまとめて更新
+
+        スナップショットの作成と公開は1回だけ行い、生存確認用フィールドだけの変更は生存確認用マップに記録します。
+        変更履歴とバージョンは update と同じくデバイスごとに記録されます。
+
+        Args:
+            updates (dict): {device_id: {field: value}}
+
+        Returns:
+            dict: {device_id: 更新前のデバイス情報}（存在しないデバイスは含まない）
+        """
+        previous_records = {}
+        with self.write_lock:
+            version, current = self._state
+            devices = None
+            for device_id, fields in updates.items():
+                previous = current.get(device_id)
+                if previous is None:
+                    continue
+                previous_records[device_id] = previous
+
+                changed = self._changed_fields(device_id, previous, fields)
+                if not changed:
+                    continue
+
+                if devices is None:
+                    devices = dict(current)
+                record = dict(previous)
+                record.update(changed)
+                devices[device_id] = record
+
+                semantic = sorted(k for k in changed if k not in LIVENESS_FIELDS)
+                if semantic:
+                    version += 1
+                    self._record_versions[device_id] = version
+                    self.change_log.append({
+                        "version": version,
+                        "device_id": device_id,
+                        "op": "update",
+                        "fields": semantic
+                    })
+
+            if devices is not None:
+                self._state = (version, MappingProxyType(devices))
+        return previous_records
+
+    def remove(self, device_id):
+        """
+        デバイスを削除
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            dict: 削除したデバイス情報、存在しない場合はNone
+        """
+        with self.write_lock:
+            if device_id not in self._state[1]:
+                return None
+            devices = dict(self._state[1])
+            previous = devices.pop(device_id)
+            self._liveness.pop(device_id, None)
+            self._commit(devices, device_id, "remove", [], True)
+        return previous
+
+    def remove_many(self, device_ids):
+        """
+        複数デバイスをまとめて削除
+
+        Args:
+            device_ids (iterable): デバイスIDのリスト
+
+        Returns:
+            list: 削除したデバイスID
+        """
+        removed = []
+        with self.write_lock:
+            version, current = self._state
+            devices = None
+            for device_id in device_ids:
+                if device_id not in (devices if devices is not None else current):
+                    continue
+                if devices is None:
+                    devices = dict(current)
+                del devices[device_id]
+                self._liveness.pop(device_id, None)
+                self._record_versions.pop(device_id, None)
+                removed.append(device_id)
+                version += 1
+                self.change_log.append({
+                    "version": version,
+                    "device_id": device_id,
+                    "op": "remove",
+                    "fields": []
+                })
+            if devices is not None:
+                self._state = (version, MappingProxyType(devices))
+        return removed
+
+    def changes_since(self, version):
+        """
+        指定バージョン以降の変更履歴を取得
+
+        Args:
+            version (int): 基準バージョン
+
+        Returns:
+            list: 変更履歴のリスト。履歴が既に破棄されている場合はNone（全件取得が必要）
+        """
+        log = list(self.change_log)
+        if version >= self._state[0]:
+            return []
+        if not log or log[0]["version"] > version + 1:
+            return None
+        return [entry for entry in log if entry["version"] > version]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+デバイスレジストリ永続化モジュール
+
+既知のデバイス（ID、最後のIPとHTTPポート、名前、通知プロファイル）をローカルのJSONファイルに保存し、
+起動時に読み込んでスキャン完了を待たずにデバイスへ直接問い合わせられるようにします。
+ポーリングしないデバイス（プッシュ型・シリアル接続・ログ再生）とシミュレーションデバイスは保存しません。
+"""
+
+import os
+import json
+import logging
+
+import eventlet
+
+from .discovery import PUSH_SOURCES
+from .replay import DEFAULT_DEVICE_PREFIX as REPLAY_PREFIX
+from .simulation import SIM_PREFIX
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+PERSISTED_FIELDS = ("id", "name", "ip", "http_port", "last_seen", "notification_profile")  # 保存するフィールド
+TRANSIENT_PREFIXES = (SIM_PREFIX, REPLAY_PREFIX)  # 保存しないデバイスIDの接頭辞
+STORE_VERSION = 1  # ファイル形式のバージョン
+LAST_SEEN_SAVE_INTERVAL = 60.0  # last_seen がこの秒数以上進んだデバイスがあれば、バージョンが同じでも保存する
+
+
+class RegistryStore:
+    """デバイスレジストリをJSONファイルに保存・読み込みするクラス"""
+
+    def __init__(self, path):
+        """
+        初期化
+
+        Args:
+            path (str): 保存先ファイルのパス
+        """
+        self.path = path
+        self.saved_version = None  # 最後に保存したレジストリのバージョン
+        self.saved_last_seen = {}  # 最後に保存した時点の last_seen {device_id: timestamp}
+        self._thread = None
+
+    def load(self):
+        """
+        保存済みのデバイス情報を読み込む
+
+        Returns:
+            list: デバイス情報のリスト（ファイルがない・壊れている場合は空）
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"デバイスレジストリの読み込みに失敗: {self.path} - {e}")
+            return []
+
+        devices = data.get("devices", []) if isinstance(data, dict) else []
+        return [d for d in devices if isinstance(d, dict) and d.get("id")]
+
+    def load_into(self, discovery):
+        """
+        保存済みのデバイスをオフライン状態でディスカバリーに登録
+
+        Args:
+            discovery (LeverDiscovery): 登録先のディスカバリーマネージャー
+
+        Returns:
+            int: 登録したデバイス数
+        """
+        count = 0
+        self.saved_last_seen = {}
+        for device in self.load():
+            record = {k: device[k] for k in PERSISTED_FIELDS if k in device}
+            self.saved_last_seen[device["id"]] = record.get("last_seen")
+            record.setdefault("name", device["id"])
+            record["status"] = "offline"  # 応答を確認するまではオフライン扱い
+            discovery.add_device(record)
+            count += 1
+
+        self.saved_version = discovery.version
+        if count:
+            logger.info(f"保存済みデバイスを読み込み: {count}台 ({self.path})")
+        return count
+
+    def save(self, registry):
+        """
+        レジストリの内容をファイルに保存（一時ファイル経由で置き換え）
+
+        Args:
+            registry (DeviceRegistry): 保存するレジストリ
+
+        Returns:
+            bool: 保存に成功した場合True
+        """
+        version, snapshot = registry.read()
+        devices = []
+        for device_id, info in snapshot.items():
+            if info.get("source") in PUSH_SOURCES or device_id.startswith(TRANSIENT_PREFIXES):
+                continue
+            info = registry.current(info)  # last_seen はスナップショットの外で更新されるため最新の値を使う
+            devices.append({k: info[k] for k in PERSISTED_FIELDS if k in info})
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": STORE_VERSION, "devices": devices}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"デバイスレジストリの保存に失敗: {self.path} - {e}")
+            return False
+
+        self.saved_version = version
+        self.saved_last_seen = {device["id"]: device.get("last_seen") for device in devices}
+        logger.debug(f"デバイスレジストリを保存: {len(devices)}台 (バージョン {version})")
+        return True
+
+    def last_seen_advanced(self, registry):
+        """
+        保存済みのデバイスの last_seen が LAST_SEEN_SAVE_INTERVAL 以上進んだかどうか
+
+        last_seen の更新ではレジストリのバージョンが進まないため、バージョンとは別に確認します。
+
+        Args:
+            registry (DeviceRegistry): 確認するレジストリ
+
+        Returns:
+            bool: 進んだデバイスがある場合True
+        """
+        snapshot = registry.snapshot()
+        for device_id, saved in self.saved_last_seen.items():
+            info = snapshot.get(device_id)
+            if info is None:
+                continue
+            last_seen = registry.current(info).get("last_seen")
+            if last_seen is not None and (saved is None or last_seen - saved >= LAST_SEEN_SAVE_INTERVAL):
+                return True
+        return False
+
+    def start_autosave(self, registry, interval=1.0):
+        """
+        レジストリのバージョンが変わった時と last_seen が進んだ時に定期的に保存するタスクを開始
+
+        Args:
+            registry (DeviceRegistry): 保存するレジストリ
+            interval (float): 変更を確認する間隔（秒）
+        """
+        if self._thread is not None:
+            return
+
+        def autosave():
+            while True:
+                eventlet.sleep(interval)
+                if registry.version != self.saved_version or self.last_seen_advanced(registry):
+                    self.save(registry)
+
+        self._thread = eventlet.spawn(autosave)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ログ再生モジュール
+
+positionVisualizer が記録したセッションログ（[{"id", "value", "ts"}, ...]）を読み込み、
+記録時のタイムスタンプどおりにプッシュ型デバイスの値としてライブパイプラインへ流します。
+ログはチャンク単位で逐次解析するため、ファイル全体をメモリに読み込みません。
+列形式に変換したログ（.lvc、api.columnar を参照）もそのまま再生できます。
+"""
+
+import os
+import json
+import time
+import logging
+from threading import Lock
+
+import eventlet
+
+from .metrics import Histogram
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+READ_CHUNK_SIZE = 64 * 1024  # ログを読み込む単位（バイト）
+MAX_RECORD_SIZE = 64 * 1024  # 1レコードの最大サイズ（バイト、これを超える場合は不正なログとみなす）
+DEFAULT_DEVICE_PREFIX = "replay_lever"  # 再生デバイスIDの接頭辞（末尾にログのidを付与）
+MAX_SPEED = 1000.0  # 再生速度の上限（倍）
+DEFAULT_LOOP_GAP = 0.2  # ループ時に末尾と先頭の間に空ける時間（秒、記録間隔が分からない場合）
+LATENESS_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5)
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_SEPARATORS = _WHITESPACE + ","
+
+
+class LogFormatError(ValueError):
+    """ログの形式が不正な場合の例外"""
+
+
+def iter_log_records(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    セッションログのレコードを先頭から1件ずつ読み込む
+
+    レコードの配列（[...]）と {"records": [...]} の両方の形式に対応します。
+    読み込みは chunk_size ごとに行い、解析済みの部分は破棄します。
+
+    Args:
+        path (str): ログファイルのパス
+        chunk_size (int): 読み込み単位（バイト）
+
+    Yields:
+        dict: ログのレコード
+
+    Raises:
+        LogFormatError: ログの形式が不正な場合
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = ""
+        eof = False
+
+        def fill():
+            nonlocal buffer, eof
+            chunk = f.read(chunk_size)
+            if chunk:
+                buffer += chunk
+            else:
+                eof = True
+
+        # 配列の開始位置を探す（{"records": [ の形式ではキーの後ろの [ まで読み飛ばす）
+        while True:
+            stripped = buffer.lstrip(_WHITESPACE)
+            if stripped.startswith("["):
+                buffer = stripped[1:]
+                break
+            if stripped.startswith("{"):
+                key = stripped.find('"records"')
+                bracket = stripped.find("[", key) if key >= 0 else -1
+                if bracket >= 0:
+                    buffer = stripped[bracket + 1:]
+                    break
+            elif stripped:
+                raise LogFormatError("ログはレコードの配列ではありません")
+            if eof or len(buffer) > MAX_RECORD_SIZE:
+                raise LogFormatError("レコードの配列が見つかりません")
+            fill()
+
+        position = 0
+        while True:
+            # 区切り（空白とカンマ）を読み飛ばす
+            while True:
+                while position < len(buffer) and buffer[position] in _SEPARATORS:
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                buffer, position = "", 0
+                fill()
+
+            if position >= len(buffer):
+                raise LogFormatError("ログが途中で終わっています")
+            if buffer[position] == "]":
+                return
+
+            try:
+                record, end = _DECODER.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # レコードがチャンクの境界で切れている場合は続きを読み込む
+                if eof or len(buffer) - position > MAX_RECORD_SIZE:
+                    raise LogFormatError(f"不正なレコードがあります: {buffer[position:position + 80]!r}")
+                buffer, position = buffer[position:], 0
+                fill()
+                continue
+
+            # 解析済みの部分を破棄してバッファを小さく保つ
+            buffer, position = buffer[end:], 0
+            if isinstance(record, dict):
+                yield record
+
+
+def iter_log_frames(path):
+    """
+    同じタイムスタンプのレコードを1フレームにまとめて読み込む
+
+    Args:
+        path (str): ログファイルのパス（JSONログまたは列形式ログ）
+
+    Yields:
+        tuple: (タイムスタンプ（ミリ秒）, {ログのid: 値})
+    """
+    if path.endswith(".lvc"):
+        from .columnar import iter_columnar_records  # columnar が本モジュールを参照するため遅延インポート
+        records = iter_columnar_records(path)
+    else:
+        records = iter_log_records(path)
+
+    frame_ts = None
+    frame = {}
+    for record in records:
+        try:
+            ts = float(record["ts"])
+            value = float(record["value"])
+            log_id = record["id"]
+        except (KeyError, TypeError, ValueError):
+            continue  # 欠損したレコードは読み飛ばす（positionVisualizerの再生と同じ）
+
+        if frame and ts != frame_ts:
+            yield frame_ts, frame
+            frame = {}
+        frame_ts = ts
+        frame[log_id] = max(0.0, min(100.0, value))
+
+    if frame:
+        yield frame_ts, frame
+
+
+class LogReplay:
+    """セッションログを記録時の間隔で再生するクラス"""
+
+    def __init__(self, on_samples):
+        """
+        初期化
+
+        Args:
+            on_samples (callable): on_samples(samples) で1フレーム分のサンプルを受け取る関数
+                （サンプルは {"id", "value", "raw", "calibrated"}）
+        """
+        self.on_samples = on_samples
+        self.lock = Lock()  # 開始・停止の排他用
+        self.thread = None
+        self.path = None
+        self.speed = 1.0
+        self.loop = False
+        self.prefix = DEFAULT_DEVICE_PREFIX
+        self.started_at = None
+        self.loops = 0  # 先頭に戻った回数
+        self.frames = 0  # 送信したフレーム数
+        self.samples = 0  # 送信したサンプル数
+        self.position_ms = 0.0  # 直近に送信したフレームのログ上の時刻
+        self.last_error = None
+        self.lateness = Histogram(LATENESS_BUCKETS)  # 予定時刻からの送信の遅れ
+
+    @property
+    def running(self):
+        """再生中かどうか"""
+        return self.thread is not None
+
+    def start(self, path, speed=1.0, loop=False, prefix=DEFAULT_DEVICE_PREFIX):
+        """
+        再生を開始（再生中の場合は停止してから開始）
+
+        Args:
+            path (str): ログファイルのパス
+            speed (float): 再生速度の倍率
+            loop (bool): 末尾に達したら先頭から繰り返す
+            prefix (str): 再生デバイスIDの接頭辞
+
+        Raises:
+            ValueError: 速度が範囲外の場合
+            OSError: ログファイルを開けない場合
+        """
+        if not 0 < speed <= MAX_SPEED:
+            raise ValueError(f"speed は0より大きく{MAX_SPEED:g}以下で指定してください")
+        with open(path, 'rb'):
+            pass  # 開けることだけ先に確認する
+
+        with self.lock:
+            self._stop_locked()
+            self.path = path
+            self.speed = float(speed)
+            self.loop = bool(loop)
+            self.prefix = prefix
+            self.started_at = time.time()
+            self.loops = 0
+            self.frames = 0
+            self.samples = 0
+            self.position_ms = 0.0
+            self.last_error = None
+            self.lateness.reset()
+            self.thread = eventlet.spawn(self._run)
+        logger.info(f"ログ再生開始: {os.path.basename(path)} ({speed:g}倍速{', ループ' if loop else ''})")
+
+    def stop(self):
+        """
+        再生を停止
+
+        Returns:
+            bool: 再生中だった場合True
+        """
+        with self.lock:
+            return self._stop_locked()
+
+    def _stop_locked(self):
+        if self.thread is None:
+            return False
+        self.thread.kill()
+        self.thread = None
+        logger.info(f"ログ再生停止: {os.path.basename(self.path)}")
+        return True
+
+    def _run(self):
+        """フレームごとに記録時刻まで待機して送信する"""
+        current = eventlet.getcurrent()
+        try:
+            origin = time.perf_counter()  # ログ上の0ミリ秒に対応する時刻
+            while True:
+                first_ts = last_ts = None
+                interval = None
+                for ts, frame in iter_log_frames(self.path):
+                    if first_ts is None:
+                        first_ts = ts
+                    elif ts > last_ts:
+                        interval = ts - last_ts
+                    last_ts = ts if last_ts is None else max(last_ts, ts)
+
+                    # 記録時刻まで待機（時刻が逆転しているレコードは待たずに送る）
+                    deadline = origin + (ts - first_ts) / 1000 / self.speed
+                    remaining = deadline - time.perf_counter()
+                    if remaining > 0:
+                        eventlet.sleep(remaining)
+                    self.lateness.observe(max(0.0, time.perf_counter() - deadline))
+                    self._emit(ts - first_ts, frame)
+
+                if first_ts is None:
+                    self.last_error = "ログにレコードがありません"
+                    break
+                if not self.loop:
+                    break
+
+                # 記録間隔を空けて先頭から繰り返す
+                gap = interval / 1000 if interval else DEFAULT_LOOP_GAP
+                origin += (last_ts - first_ts) / 1000 / self.speed + gap / self.speed
+                self.loops += 1
+        except LogFormatError as e:
+            self.last_error = str(e)
+            logger.error(f"ログ再生エラー: {e}")
+        except OSError as e:
+            self.last_error = str(e)
+            logger.error(f"ログの読み込みに失敗しました: {e}")
+        finally:
+            # 停止（kill）された場合は stop 側がロックを保持しているため、ここではロックを取らない
+            if self.thread is current:
+                self.thread = None
+        logger.info(f"ログ再生終了: {self.frames}フレーム, {self.samples}サンプル")
+
+    def _emit(self, position_ms, frame):
+        """1フレーム分のサンプルを送信"""
+        samples = [{
+            "id": f"{self.prefix}{log_id}",
+            "value": int(round(value)),
+            "raw": int(round(value * 10.23)),
+            "calibrated": True
+        } for log_id, value in frame.items()]
+        self.position_ms = position_ms
+        self.frames += 1
+        self.samples += len(samples)
+        try:
+            self.on_samples(samples)
+        except Exception as e:
+            logger.error(f"再生サンプルの処理でエラー: {e}")
+
+    def get_status(self):
+        """
+        再生状態を取得
+
+        Returns:
+            dict: 再生中のファイル、速度、位置、送信数、送信の遅れ
+        """
+        return {
+            "running": self.running,
+            "file": os.path.basename(self.path) if self.path else None,
+            "speed": self.speed,
+            "loop": self.loop,
+            "prefix": self.prefix,
+            "started_at": self.started_at,
+            "position_ms": self.position_ms,
+            "loops": self.loops,
+            "frames": self.frames,
+            "samples": self.samples,
+            "last_error": self.last_error,
+            "lateness": self.lateness.snapshot()
+        }
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+シリアル接続デバイスソースモジュール
+
+USBシリアルで接続されたレバーをデバイスとして扱います。
+ポートごとに常駐の読み取りスレッドが GET_DATA を途切れなく送り続け、
+応答のJSON行を取り込みのパイプラインに渡します。
+pyserialの読み書きはブロッキングのため、ポートの入出力はeventletのハブとは別のOSスレッドで行い、
+解析したサンプルはキューとパイプでの通知によりハブ上のグリーンスレッドへ渡します。
+
+ファームウェアのシリアルプロトコル:
+    コマンド: "GET_DATA" / "RESET_CALIB" / "SET_ID:xxxx"（改行区切り）
+    応答:     {"device_id": ..., "timestamp": ..., "data": {"raw", "smoothed", "value", "calibrated", ...}}
+    ログ出力などJSON以外の行も混在します。
+"""
+
+import os
+import json
+import time
+import logging
+from collections import deque
+from threading import Lock
+
+import eventlet
+from eventlet import tpool
+from eventlet.hubs import trampoline
+
+from .metrics import Histogram
+
+try:
+    import serial
+except ImportError:  # pyserialがない環境でもAPIサーバー自体は起動できるようにする
+    serial = None
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# モンキーパッチの影響を受けないOSスレッドとファイル記述子の操作（読み取りスレッド用）
+os_threading = eventlet.patcher.original("threading")
+os_module = eventlet.patcher.original("os")
+
+# 設定
+DEFAULT_BAUDRATE = 115200
+DEFAULT_PIPELINE_DEPTH = 2  # 応答を待たずに送っておく GET_DATA の数
+READ_TIMEOUT = 0.2  # 応答を待つ時間（秒、さらに同じ時間待っても届かなければ GET_DATA を送り直す）
+RECONNECT_INTERVAL = 2.0  # ポートを開けない場合の再試行間隔（秒）
+GET_DATA = b"GET_DATA\n"
+SERIAL_LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5)
+
+
+def default_device_id(port):
+    """応答にデバイスIDが含まれない場合のID（ポート名から生成）"""
+    name = os.path.basename(port.rstrip("/")) or port
+    return "serial_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+class SerialLeverReader:
+    """1つのシリアルポートからレバーの値を読み続けるクラス"""
+
+    def __init__(self, port, on_samples, baudrate=DEFAULT_BAUDRATE, pipeline_depth=DEFAULT_PIPELINE_DEPTH):
+        """
+        初期化
+
+        Args:
+            port (str): ポート名またはpyserialのURL（"/dev/ttyUSB0"、"COM3"、"loop://" など）
+            on_samples (callable): 読み取ったサンプルを渡すコールバック on_samples(samples: list, reader)
+            baudrate (int): ボーレート
+            pipeline_depth (int): 応答を待たずに送っておくコマンド数
+        """
+        self.port = port
+        self.on_samples = on_samples
+        self.baudrate = baudrate
+        self.pipeline_depth = max(1, int(pipeline_depth))
+        self.device_id = None  # 最後に受信したデバイスID
+        self.ser = None
+        self.running = False
+        self._thread = None  # ポートの読み書きを行うOSスレッド
+        self._dispatcher = None  # 受信したサンプルをハブ上でコールバックに渡すグリーンスレッド
+        self._stopped = os_threading.Event()
+        self._received = deque()  # 読み取りスレッドから渡す (サンプルのリスト, 応答時間のリスト)
+        self._wakeup = None  # 受信を通知するパイプ (読み取り側, 書き込み側)
+        self._sent_times = deque()  # 応答待ちの GET_DATA の送信時刻
+
+        # 計測値
+        self.latency_histogram = Histogram(SERIAL_LATENCY_BUCKETS)  # GET_DATA 送信から応答までの時間
+        self.samples = 0
+        self.parse_errors = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.started_at = None
+
+    def start(self):
+        """読み取りスレッドを開始"""
+        if serial is None:
+            raise RuntimeError("pyserialがインストールされていません")
+        if self.running:
+            return
+        self.running = True
+        self.started_at = time.time()
+        self._stopped.clear()
+        self._wakeup = os.pipe()
+        os.set_blocking(self._wakeup[0], False)
+        os.set_blocking(self._wakeup[1], False)
+        self._dispatcher = eventlet.spawn(self._dispatch)
+        self._thread = os_threading.Thread(target=self._run, name=f"serial-{self.port}", daemon=True)
+        self._thread.start()
+        logger.info(f"シリアルデバイスの読み取り開始: {self.port} @ {self.baudrate}bps")
+
+    def stop(self):
+        """読み取りスレッドを停止してポートを閉じる"""
+        self.running = False
+        self._stopped.set()
+        if self._thread is not None:
+            # 読み取りのタイムアウトまでかかるため、ハブを止めないようにスレッドプールで終了を待つ
+            tpool.execute(self._thread.join)
+            self._thread = None
+        if self._dispatcher is not None:
+            self._dispatcher.kill()
+            self._dispatcher = None
+        if self._wakeup is not None:
+            for fd in self._wakeup:
+                os.close(fd)
+            self._wakeup = None
+        self._received.clear()
+        logger.info(f"シリアルデバイスの読み取り停止: {self.port}")
+
+    def _open(self):
+        """ポートを開く"""
+        self.ser = serial.serial_for_url(self.port, baudrate=self.baudrate, timeout=READ_TIMEOUT)
+        self.ser.reset_input_buffer()
+        self._sent_times.clear()
+
+    def _close(self):
+        """ポートを閉じる"""
+        ser, self.ser = self.ser, None
+        if ser is not None:
+            try:
+                ser.close()
+            except serial.SerialException:
+                pass
+
+    def _request(self, count):
+        """GET_DATA をまとめて送信"""
+        if count <= 0:
+            return
+        self.ser.write(GET_DATA * count)
+        now = time.perf_counter()
+        self._sent_times.extend([now] * count)
+
+    def _run(self):
+        """読み取りループ（OSスレッドで実行、切断時は再接続）"""
+        while self.running:
+            try:
+                self._open()
+                self._read_loop()
+            except (serial.SerialException, OSError) as e:
+                logger.warning(f"シリアルポートエラー: {self.port} - {e}")
+            self._close()
+            if self.running:
+                self.reconnects += 1
+                self._stopped.wait(RECONNECT_INTERVAL)
+
+    def _hand_off(self, samples, latencies):
+        """読み取りスレッドからハブへサンプルを渡す"""
+        self._received.append((samples, latencies))
+        try:
+            os_module.write(self._wakeup[1], b"\0")
+        except BlockingIOError:
+            pass  # パイプが満杯の場合は通知が既に届いている
+
+    def _dispatch(self):
+        """受信の通知を待ち、届いたサンプルをコールバックに渡す（ハブ上で実行）"""
+        read_fd = self._wakeup[0]
+        while True:
+            trampoline(read_fd, read=True)
+            try:
+                os_module.read(read_fd, 4096)
+            except BlockingIOError:
+                pass
+            while self._received:
+                samples, latencies = self._received.popleft()
+                for latency in latencies:
+                    self.latency_histogram.observe(latency)
+                try:
+                    self.on_samples(samples, self)
+                except Exception as e:
+                    logger.error(f"シリアルデバイスの値の処理でエラー: {e}")
+
+    def _read_loop(self):
+        """
+        応答を受信するたびに次の GET_DATA を送り、パイプラインを常に満たしておく
+
+        応答が READ_TIMEOUT の間届かない場合、まず応答待ちのコマンドを残したままもう一度 READ_TIMEOUT だけ待ちます。
+        GET_DATA にはシーケンス番号がなく遅れた応答と送り直した分の応答を区別できないため、
+        待っている間に届いた応答は通常どおり応答待ちから差し引き、送信中のコマンド数が pipeline_depth を超えないようにします。
+        それでも届かなければ取りこぼし（コマンドの欠落や再起動）とみなし、応答待ちを破棄して送り直します。
+        """
+        ser = self.ser
+        buffer = b""
+        self._request(self.pipeline_depth)
+        deadline = time.perf_counter() + READ_TIMEOUT  # 次の応答を待つ期限
+        draining = False  # 遅れている応答を待っている間True
+
+        while self.running and self.ser is ser:
+            chunk = ser.read(ser.in_waiting or 1)
+            buffer += chunk
+            if b"\n" in buffer:
+                *lines, buffer = buffer.split(b"\n")
+
+                received = time.perf_counter()
+                samples = []
+                latencies = []
+                for line in lines:
+                    sample = self._parse_line(line)
+                    if sample is None:
+                        continue
+                    if self._sent_times:
+                        latencies.append(received - self._sent_times.popleft())
+                    samples.append(sample)
+
+                if samples:
+                    self.samples += len(samples)
+                    self._request(self.pipeline_depth - len(self._sent_times))
+                    self._hand_off(samples, latencies)
+                    deadline = received + READ_TIMEOUT
+                    draining = False
+
+            # ログ出力の行だけが届き続ける場合も応答の途絶として扱うため、受信の有無ではなく期限で判定する
+            now = time.perf_counter()
+            if now < deadline:
+                continue
+            if not draining:
+                draining = True
+                deadline = now + READ_TIMEOUT
+                continue
+            self.timeouts += 1
+            self._sent_times.clear()
+            self._request(self.pipeline_depth)
+            deadline = time.perf_counter() + READ_TIMEOUT
+            draining = False
+
+    def _parse_line(self, line):
+        """
+        応答の1行を解析
+
+        Returns:
+            dict: 値の応答であればサンプル、それ以外（ログ出力やコマンドの応答）はNone
+        """
+        line = line.strip()
+        if not line.startswith(b"{"):
+            return None
+        try:
+            message = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.parse_errors += 1
+            return None
+
+        data = message.get("data") if isinstance(message, dict) else None
+        if not isinstance(data, dict) or "value" not in data:
+            return None
+
+        self.device_id = message.get("device_id") or self.device_id or default_device_id(self.port)
+        return {
+            "id": self.device_id,
+            "seq": None,  # シリアルは順序が保証されるためシーケンス番号は不要
+            "ts": message.get("timestamp", 0),
+            "value": data["value"],
+            "raw": data.get("raw", 0),
+            "calibrated": bool(data.get("calibrated", False))
+        }
+
+    def get_stats(self):
+        """
+        読み取り状況を取得
+
+        Returns:
+            dict: ポート、デバイスID、サンプル数、応答時間のヒストグラムなど
+        """
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        return {
+            "port": self.port,
+            "baudrate": self.baudrate,
+            "device_id": self.device_id,
+            "connected": self.ser is not None,
+            "pipeline_depth": self.pipeline_depth,
+            "samples": self.samples,
+            "sample_rate": self.samples / elapsed if elapsed else 0.0,
+            "parse_errors": self.parse_errors,
+            "timeouts": self.timeouts,
+            "reconnects": self.reconnects,
+            "latency": self.latency_histogram.snapshot()
+        }
+
+
+class SerialSourceManager:
+    """シリアルポートごとの読み取りタスクを管理するクラス"""
+
+    def __init__(self, on_samples):
+        """
+        初期化
+
+        Args:
+            on_samples (callable): 読み取ったサンプルを渡すコールバック on_samples(samples: list, reader)
+        """
+        self.on_samples = on_samples
+        self.readers = {}  # {port: SerialLeverReader}
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+
+    @property
+    def available(self):
+        """pyserialが利用可能かどうか"""
+        return serial is not None
+
+    def add_port(self, port, baudrate=DEFAULT_BAUDRATE, pipeline_depth=DEFAULT_PIPELINE_DEPTH):
+        """
+        ポートの読み取りを開始
+
+        Args:
+            port (str): ポート名またはpyserialのURL
+            baudrate (int): ボーレート
+            pipeline_depth (int): 応答を待たずに送っておくコマンド数
+
+        Returns:
+            SerialLeverReader: 読み取りタスク（既に登録済みの場合は既存のもの）
+        """
+        with self.lock:
+            reader = self.readers.get(port)
+            if reader is not None:
+                return reader
+            reader = SerialLeverReader(port, self.on_samples, baudrate, pipeline_depth)
+            reader.start()
+            self.readers[port] = reader
+            return reader
+
+    def remove_port(self, port):
+        """
+        ポートの読み取りを停止
+
+        Args:
+            port (str): ポート名
+
+        Returns:
+            SerialLeverReader: 停止した読み取りタスク、登録されていない場合はNone
+        """
+        with self.lock:
+            reader = self.readers.pop(port, None)
+        if reader is not None:
+            reader.stop()
+        return reader
+
+    def get_stats(self):
+        """
+        全ポートの読み取り状況を取得
+
+        Returns:
+            dict: pyserialの有無とポートごとの状況
+        """
+        return {
+            "available": self.available,
+            "ports": [reader.get_stats() for reader in list(self.readers.values())]
+        }
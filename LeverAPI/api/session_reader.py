@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+セッション読み取りモジュール
+
+SessionRecorder が記録したセグメントファイルをメモリマップで開き、疎な時刻インデックスを使って
+任意の時刻へ O(log n) でシークします。時間範囲の切り出しはファイルをコピーしないNumPyのビューで返します。
+
+時刻インデックスは INDEX_STRIDE レコードごとに「先頭からそのブロックの末尾までの最大経過ミリ秒」を持ちます。
+レコードは追記順に並び、取り込み経路の違いで数ミリ秒程度の前後があり得るため、単純な二分探索ではなく
+累積最大値で位置を決めます（範囲は追記順で連続した区間になります）。
+"""
+
+import os
+import math
+import bisect
+import logging
+from threading import Lock
+
+import numpy as np
+
+from .recorder import (
+    RECORD_DTYPE, SEGMENT_HEADER, SEGMENT_MAGIC, FORMAT_VERSION, RECORD, read_meta
+)
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+INDEX_STRIDE = 4096  # 時刻インデックスの間隔（レコード数）
+INDEX_SUFFIX = ".idx.npz"  # 保存した時刻インデックスの拡張子
+DEFAULT_CHUNK_RECORDS = 65536  # 範囲の読み出しで一度に返す最大レコード数
+MAX_OFFSET_MS = 0xFFFFFFFF  # 経過ミリ秒（uint32）の最大値
+
+
+class SessionFormatError(ValueError):
+    """セッションファイルの形式が不正な場合の例外"""
+
+
+class Segment:
+    """1つのセグメントファイルのメモリマップと時刻インデックス"""
+
+    def __init__(self, path, index, base_time):
+        """
+        初期化
+
+        Args:
+            path (str): セグメントファイルのパス
+            index (int): セグメント番号
+            base_time (float): 基準時刻（UNIX秒）
+        """
+        self.path = path
+        self.index = index
+        self.base_time = base_time
+        self.size = -1  # マップしたときのファイルサイズ
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self.runmax = np.empty(0, dtype=np.uint32)  # ブロックごとの累積最大経過ミリ秒
+        self._index_loaded = False
+
+    def refresh(self, finished):
+        """
+        ファイルサイズが変わっていればマップし直し、時刻インデックスを伸ばす
+
+        Args:
+            finished (bool): これ以上追記されないセグメントの場合True（インデックスを保存する）
+
+        Raises:
+            SessionFormatError: ヘッダーが不正な場合
+        """
+        size = os.path.getsize(self.path)
+        if size == self.size:
+            return
+        self.size = size
+
+        count = max(0, size - SEGMENT_HEADER.size) // RECORD.size
+        if count == 0:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        else:
+            with open(self.path, "rb") as f:
+                header = f.read(SEGMENT_HEADER.size)
+            magic, version, record_size, _, base_time = SEGMENT_HEADER.unpack(header)
+            if magic != SEGMENT_MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+                raise SessionFormatError(f"セグメントの形式が不正です: {self.path}")
+            self.base_time = base_time
+            # 書き込み途中の末尾のレコードは含めない
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r",
+                                     offset=SEGMENT_HEADER.size, shape=(count,))
+
+        if not self._index_loaded:
+            self._index_loaded = True
+            self._load_index()
+        blocks = len(self.records) // INDEX_STRIDE
+        if blocks > len(self.runmax):
+            self._extend_index(blocks)
+            if finished:
+                self._save_index()
+
+    def _extend_index(self, blocks):
+        """未計算のブロックの累積最大値を求めてインデックスに追加"""
+        done = len(self.runmax)
+        ts = self.records["ts"][done * INDEX_STRIDE:blocks * INDEX_STRIDE]
+        block_max = ts.reshape(-1, INDEX_STRIDE).max(axis=1)
+        if done:
+            block_max[0] = max(block_max[0], self.runmax[-1])
+        self.runmax = np.concatenate([self.runmax, np.maximum.accumulate(block_max).astype(np.uint32)])
+
+    def _load_index(self):
+        """保存済みの時刻インデックスを読み込む（形式が合わない場合は作り直す）"""
+        path = self.path + INDEX_SUFFIX
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                stride = int(data["stride"])
+                runmax = data["runmax"].astype(np.uint32)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"時刻インデックスを読み込めません: {path} - {e}")
+            return
+        if stride == INDEX_STRIDE and len(runmax) <= len(self.records) // INDEX_STRIDE:
+            self.runmax = runmax
+
+    def _save_index(self):
+        """時刻インデックスを保存"""
+        path = self.path + INDEX_SUFFIX
+        try:
+            with open(path, "wb") as f:
+                np.savez(f, stride=INDEX_STRIDE, runmax=self.runmax)
+        except OSError as e:
+            logger.warning(f"時刻インデックスを保存できません: {path} - {e}")
+
+    @property
+    def end_offset(self):
+        """このセグメントの最大経過ミリ秒（レコードがない場合は-1）"""
+        if not len(self.records):
+            return -1
+        tail_start = len(self.runmax) * INDEX_STRIDE
+        tail = self.records["ts"][tail_start:]
+        head = int(self.runmax[-1]) if len(self.runmax) else -1
+        return max(head, int(tail.max())) if len(tail) else head
+
+    def seek(self, offset_ms):
+        """
+        経過ミリ秒が offset_ms 以上になる最初の位置を求める
+
+        Args:
+            offset_ms (int): 基準時刻からの経過ミリ秒
+
+        Returns:
+            int: レコードの位置（該当がなければレコード数）
+        """
+        block = int(np.searchsorted(self.runmax, offset_ms, side="left"))
+        start = block * INDEX_STRIDE
+        ts = self.records["ts"][start:start + INDEX_STRIDE]
+        if not len(ts):
+            return len(self.records)
+        # 直前のブロックまでの最大値は offset_ms 未満なので、ブロック内の累積最大値だけで判定できる
+        return start + int(np.searchsorted(np.maximum.accumulate(ts), offset_ms, side="left"))
+
+
+class SessionReader:
+    """記録したセッションを時刻でランダムアクセスするクラス"""
+
+    def __init__(self, session_dir):
+        """
+        初期化
+
+        Args:
+            session_dir (str): セッションのディレクトリ
+
+        Raises:
+            SessionFormatError: メタデータやセグメントが不正な場合
+        """
+        self.session_dir = session_dir
+        self.lock = Lock()  # マップし直しの排他用
+        self.meta = None
+        self.devices = []
+        self.segments = []
+        self._slot_map = {}
+        self.refresh()
+
+    @property
+    def session_id(self):
+        """セッションID"""
+        return self.meta.get("id")
+
+    @property
+    def started_at(self):
+        """記録を開始した時刻（UNIX秒）"""
+        return float(self.meta.get("started_at") or (self.segments[0].base_time if self.segments else 0.0))
+
+    @property
+    def complete(self):
+        """記録が停止済みかどうか"""
+        return self.meta.get("stopped_at") is not None
+
+    def refresh(self):
+        """
+        メタデータを読み直し、追記されたレコードと新しいセグメントを取り込む（記録中のセッション用）
+
+        Raises:
+            SessionFormatError: メタデータやセグメントが不正な場合
+        """
+        meta = read_meta(self.session_dir)
+        if meta is None or not isinstance(meta.get("segments"), list):
+            raise SessionFormatError(f"セッションのメタデータがありません: {self.session_dir}")
+        if meta.get("record_size") != RECORD.size:
+            raise SessionFormatError(f"未対応のレコード形式です: {meta.get('record_format')}")
+
+        with self.lock:
+            self.meta = meta
+            self.devices = list(meta.get("devices", []))
+            self._slot_map = {device_id: slot for slot, device_id in enumerate(self.devices)}
+            entries = meta["segments"]
+            for position, entry in enumerate(entries):
+                if position >= len(self.segments):
+                    path = os.path.join(self.session_dir, os.path.basename(entry["file"]))
+                    self.segments.append(Segment(path, position, float(entry["base_time"])))
+                finished = self.complete or position < len(entries) - 1
+                try:
+                    self.segments[position].refresh(finished)
+                except FileNotFoundError:
+                    pass  # 作成直後のセグメントはメタデータより先に見えない場合がある
+
+    @property
+    def record_count(self):
+        """全セグメントのレコード数"""
+        return sum(len(segment.records) for segment in self.segments)
+
+    @property
+    def end_time(self):
+        """最後のレコードの時刻（UNIX秒、レコードがない場合は開始時刻）"""
+        end = self.started_at
+        for segment in self.segments:
+            offset = segment.end_offset
+            if offset >= 0:
+                end = max(end, segment.base_time + offset / 1000)
+        return end
+
+    def slots_for(self, device_ids):
+        """
+        デバイスIDをこのセッションのスロット番号に変換
+
+        Args:
+            device_ids (iterable): デバイスID
+
+        Returns:
+            ndarray: スロット番号（セッションにないデバイスは除く）
+        """
+        return np.array(sorted({self._slot_map[d] for d in device_ids if d in self._slot_map}), dtype=np.uint16)
+
+    def _segment_bounds(self, start, end):
+        """[start, end) に含まれ得るセグメントの範囲を求める"""
+        # セグメントの終了時刻の累積最大値は単調なので二分探索できる
+        ends = []
+        latest = -math.inf
+        for segment in self.segments:
+            offset = segment.end_offset
+            if offset >= 0:
+                latest = max(latest, segment.base_time + offset / 1000)
+            ends.append(latest)
+        first = bisect.bisect_left(ends, start) if start is not None else 0
+        bases = [segment.base_time for segment in self.segments]
+        last = bisect.bisect_left(bases, end) if end is not None else len(self.segments)
+        return first, max(first, last)
+
+    @staticmethod
+    def _offset(segment, timestamp):
+        """時刻をセグメントの経過ミリ秒（切り上げ）に変換"""
+        return min(MAX_OFFSET_MS, max(0, math.ceil((timestamp - segment.base_time) * 1000)))
+
+    def slice(self, start=None, end=None):
+        """
+        時刻の範囲 [start, end) のレコードをセグメントごとのビューで取得（コピーしない）
+
+        Args:
+            start (float, optional): 開始時刻（UNIX秒、省略時は先頭から）
+            end (float, optional): 終了時刻（UNIX秒、この時刻を含まない、省略時は末尾まで）
+
+        Returns:
+            list: [(基準時刻, レコードのビュー ndarray[RECORD_DTYPE]), ...]
+        """
+        with self.lock:
+            first, last = self._segment_bounds(start, end)
+            views = []
+            for segment in self.segments[first:last]:
+                lo = segment.seek(self._offset(segment, start)) if start is not None else 0
+                hi = segment.seek(self._offset(segment, end)) if end is not None else len(segment.records)
+                if hi > lo:
+                    views.append((segment.base_time, segment.records[lo:hi]))
+            return views
+
+    def iter_chunks(self, start=None, end=None, devices=None, chunk_records=DEFAULT_CHUNK_RECORDS):
+        """
+        時刻の範囲のレコードを一定数ずつ取得
+
+        デバイスを指定しない場合はメモリマップのビューをそのまま返し、
+        指定した場合は該当デバイスのレコードだけを抜き出した配列を返します。
+
+        Args:
+            start (float, optional): 開始時刻（UNIX秒）
+            end (float, optional): 終了時刻（UNIX秒、この時刻を含まない）
+            devices (iterable, optional): 対象のデバイスID
+            chunk_records (int): 1回に返すレコード数の上限（抜き出し前）
+
+        Yields:
+            tuple: (基準時刻, レコード ndarray[RECORD_DTYPE])
+        """
+        slots = self.slots_for(devices) if devices is not None else None
+        if slots is not None and not len(slots):
+            return
+        for base_time, view in self.slice(start, end):
+            for offset in range(0, len(view), chunk_records):
+                chunk = view[offset:offset + chunk_records]
+                if slots is not None:
+                    chunk = chunk[np.isin(chunk["slot"], slots)]
+                if len(chunk):
+                    yield base_time, chunk
+
+    def get_summary(self):
+        """
+        セッションの範囲を取得
+
+        Returns:
+            dict: セッションID、開始・終了時刻、レコード数、デバイス数
+        """
+        return {
+            "id": self.session_id,
+            "started_at": self.started_at,
+            "end_time": self.end_time,
+            "duration": self.end_time - self.started_at,
+            "records": self.record_count,
+            "devices": len(self.devices),
+            "segments": len(self.segments),
+            "complete": self.complete
+        }
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+セッション再生ストリームモジュール
+
+記録したセッションをクライアントごとに指定した速度で再生します。
+フレームはセッションファイルからジェネレーターで必要な分だけ作成し、イベントループ上で一定間隔で送信します。
+フレームの内容はライブの一括通知と同じ {device_id: {"value", "raw", "timestamp"}} の形式です。
+"""
+
+import math
+import time
+import logging
+from threading import Lock
+
+import eventlet
+import numpy as np
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+FRAME_INTERVAL = 0.1  # フレームを送信する間隔（実時間の秒、監視ループの周期と同じ）
+SEEK_LOOKBACK = 5.0  # シーク時に直前の値を探す範囲（セッション内の秒）
+STATE_INTERVAL = 1.0  # 再生中に再生状態を送信する間隔（実時間の秒）
+MAX_SPEED = 1000.0  # 再生速度の上限（倍）
+
+
+def iter_frames(reader, start, devices=None):
+    """
+    セッションのレコードを再生位置ごとのフレームにまとめるジェネレーター
+
+    send(終了時刻) を呼ぶたびに、前回の終了時刻からその時刻までのレコードを
+    デバイスごとの最新値にまとめたフレームを返します。最初に next() で開始してください。
+
+    Args:
+        reader (SessionReader): セッションの読み取り
+        start (float): 読み始める時刻（UNIX秒）
+        devices (iterable, optional): 対象のデバイスID
+
+    Yields:
+        dict: {device_id: {"value", "raw", "timestamp"}}
+    """
+    names = reader.devices
+    end = yield
+    frame = {}
+    for base_time, chunk in reader.iter_chunks(start, None, devices):
+        # 追記順のレコードの前後を吸収するため、累積最大値で区切る
+        cummax = np.maximum.accumulate(chunk["ts"])
+        position = 0
+        while True:
+            limit = max(0, math.ceil((end - base_time) * 1000))
+            stop = max(position, int(np.searchsorted(cummax, limit, side="left")))
+            if stop > position:
+                _merge_latest(frame, names, base_time, chunk[position:stop])
+                position = stop
+            if position >= len(chunk):
+                break
+            end = yield frame
+            frame = {}
+    if frame:
+        yield frame
+
+
+def _merge_latest(frame, names, base_time, records):
+    """レコードのうちデバイスごとの最新値をフレームに追加"""
+    slots = records["slot"]
+    # 逆順で最初に現れる位置 = 各スロットの最後のレコード
+    _, reversed_index = np.unique(slots[::-1], return_index=True)
+    latest = records[len(slots) - 1 - reversed_index]
+    for slot, ts, value, raw in zip(latest["slot"].tolist(), latest["ts"].tolist(),
+                                    latest["value"].tolist(), latest["raw"].tolist()):
+        frame[names[slot]] = {
+            "value": value,
+            "raw": raw,
+            "timestamp": base_time + ts / 1000
+        }
+
+
+class SessionStream:
+    """1クライアント向けにセッションを再生するクラス"""
+
+    def __init__(self, reader, on_frame, on_state, devices=None, frame_interval=FRAME_INTERVAL):
+        """
+        初期化
+
+        Args:
+            reader (SessionReader): 再生するセッションの読み取り
+            on_frame (callable): on_frame(updates, timestamp) で1フレームを送信する関数
+            on_state (callable): on_state(state) で再生状態を送信する関数
+            devices (list, optional): 再生するデバイスID（省略時は全デバイス）
+            frame_interval (float): フレームを送信する間隔（実時間の秒）
+        """
+        self.reader = reader
+        self.on_frame = on_frame
+        self.on_state = on_state
+        self.devices = devices
+        self.frame_interval = frame_interval
+        self.lock = Lock()  # 再生操作の排他用
+        self.thread = None
+        self.started_at = reader.started_at
+        self.duration = max(0.0, reader.end_time - self.started_at)
+        self.speed = 1.0
+        self.state = "paused"  # paused / playing / ended
+        self.frames = 0  # 送信したフレーム数
+        self._frames = None  # iter_frames のジェネレーター
+        self._origin_position = 0.0  # 再生開始（再開）時の再生位置（セッション開始からの秒）
+        self._origin_clock = 0.0  # 再生開始（再開）時の時計
+
+    @property
+    def position(self):
+        """現在の再生位置（セッション開始からの秒）"""
+        position = self._origin_position
+        if self.state == "playing":
+            position += (time.perf_counter() - self._origin_clock) * self.speed
+        return min(max(0.0, position), self.duration)
+
+    def start(self, position=0.0, speed=1.0):
+        """
+        指定位置から再生を開始
+
+        Args:
+            position (float): 再生位置（セッション開始からの秒）
+            speed (float): 再生速度の倍率
+
+        Raises:
+            ValueError: 速度が範囲外の場合
+        """
+        self._check_speed(speed)
+        with self.lock:
+            self.speed = float(speed)
+            self._kill_locked()
+            self._seek_locked(position)
+            self._play_locked()
+        self._notify_state()
+
+    def pause(self):
+        """再生を一時停止"""
+        with self.lock:
+            if self.state == "playing":
+                self._origin_position = self.position
+                self.state = "paused"
+                self._kill_locked()
+        self._notify_state()
+
+    def resume(self):
+        """一時停止した位置から再生を再開（末尾まで再生済みの場合は先頭から）"""
+        with self.lock:
+            if self.state == "ended":
+                self._seek_locked(0.0)
+            if self.state != "playing":
+                self._play_locked()
+        self._notify_state()
+
+    def seek(self, position):
+        """
+        再生位置を変更（再生中であれば新しい位置から再生を続ける）
+
+        直前の値を含むフレームをすぐに送信するため、シーク直後から全デバイスの値が揃います。
+
+        Args:
+            position (float): 再生位置（セッション開始からの秒）
+        """
+        with self.lock:
+            playing = self.state == "playing"
+            self._kill_locked()
+            self._seek_locked(position)
+            if playing:
+                self._play_locked()
+            else:
+                self._emit_next(self.started_at + self._origin_position)
+        self._notify_state()
+
+    def set_speed(self, speed):
+        """
+        再生速度を変更（再生位置は変えない）
+
+        Args:
+            speed (float): 再生速度の倍率
+
+        Raises:
+            ValueError: 速度が範囲外の場合
+        """
+        self._check_speed(speed)
+        with self.lock:
+            self._origin_position = self.position
+            self._origin_clock = time.perf_counter()
+            self.speed = float(speed)
+        self._notify_state()
+
+    def stop(self):
+        """再生を終了"""
+        with self.lock:
+            self._kill_locked()
+            self._frames = None
+
+    @staticmethod
+    def _check_speed(speed):
+        if isinstance(speed, bool) or not isinstance(speed, (int, float)) or not 0 < speed <= MAX_SPEED:
+            raise ValueError(f"speed は0より大きく{MAX_SPEED:g}以下で指定してください")
+
+    def _seek_locked(self, position):
+        """ジェネレーターを作り直して再生位置を変更（ロック取得済みで呼び出す）"""
+        if isinstance(position, bool) or not isinstance(position, (int, float)) or not math.isfinite(position):
+            raise ValueError("position はセッション開始からの秒数で指定してください")
+        position = min(max(0.0, float(position)), self.duration)
+        # 直前の値を含めるため、少し前から読み始める
+        self._frames = iter_frames(self.reader, self.started_at + position - SEEK_LOOKBACK, self.devices)
+        next(self._frames)
+        self._origin_position = position
+        if self.state == "ended":
+            self.state = "paused"
+
+    def _play_locked(self):
+        """再生タスクを開始（ロック取得済みで呼び出す）"""
+        self._origin_clock = time.perf_counter()
+        self.state = "playing"
+        self.thread = eventlet.spawn(self._run)
+
+    def _kill_locked(self):
+        """再生タスクを停止（ロック取得済みで呼び出す）"""
+        thread, self.thread = self.thread, None
+        if thread is not None and thread is not eventlet.getcurrent():
+            thread.kill()
+
+    def _emit_next(self, end):
+        """
+        再生位置までのフレームを作成して送信
+
+        Returns:
+            bool: セッションの末尾に達した場合True
+        """
+        try:
+            frame = self._frames.send(end)
+        except StopIteration:
+            return True
+        if frame:
+            self.frames += 1
+            try:
+                self.on_frame(frame, end)
+            except Exception as e:
+                logger.error(f"再生フレームの送信でエラー: {e}")
+        return False
+
+    def _run(self):
+        """一定間隔で再生位置までのフレームを送信する"""
+        current = eventlet.getcurrent()
+        deadline = time.perf_counter()
+        last_state = deadline
+        try:
+            while True:
+                position = self.position
+                at_end = position >= self.duration
+                # 末尾では最後のレコードの時刻ちょうどのレコードも含める
+                ended = self._emit_next(self.started_at + position + (0.001 if at_end else 0.0))
+                if ended or at_end:
+                    # 末尾で一時停止した状態にする（シークすれば続けて再生できる）
+                    self._origin_position = self.duration
+                    self.state = "ended"
+                    break
+
+                now = time.perf_counter()
+                if now - last_state >= STATE_INTERVAL:
+                    last_state = now
+                    self._notify_state()
+
+                # 送信にかかった時間を含めて一定間隔を保つ
+                deadline += self.frame_interval
+                eventlet.sleep(max(0.0, deadline - time.perf_counter()))
+        finally:
+            # 停止（kill）された場合は操作側がロックを保持しているため、ここではロックを取らない
+            if self.thread is current:
+                self.thread = None
+        self._notify_state()
+
+    def _notify_state(self):
+        try:
+            self.on_state(self.get_state())
+        except Exception as e:
+            logger.error(f"再生状態の送信でエラー: {e}")
+
+    def get_state(self):
+        """
+        再生状態を取得
+
+        Returns:
+            dict: セッションID、状態、再生位置、長さ、速度、送信したフレーム数
+        """
+        return {
+            "session_id": self.reader.session_id,
+            "state": self.state,
+            "position": self.position,
+            "duration": self.duration,
+            "speed": self.speed,
+            "started_at": self.started_at,
+            "frames": self.frames
+        }
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+シミュレーションエンジンモジュール
+
+実機なしで任意の台数のシミュレーションデバイスの値を生成します。
+全デバイスの値は1回のNumPy演算でまとめて更新され、乱数シードを指定すると
+同じ設定・同じティック数に対して毎回同じ値列を再現できます。
+"""
+
+import logging
+from threading import Lock
+
+import numpy as np
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+SIM_PREFIX = "sim_"  # シミュレーションデバイスIDの接頭辞
+DEFAULT_DEVICE_COUNT = 3  # デフォルトのデバイス数
+MAX_DEVICE_COUNT = 10000  # 設定できる最大デバイス数
+DEFAULT_WAVEFORM = "walk"  # デフォルトの波形
+DEFAULT_TICK = 0.1  # 1ティックで進めるシミュレーション時間（秒、監視ループの周期）
+MAX_TRACE_LENGTH = 1_000_000  # 記録波形の最大サンプル数
+RAW_SCALE = 10.23  # 値（0-100）から生値（0-1023）への変換係数
+
+# 波形ごとのパラメーターとデフォルト値
+WAVEFORM_PARAMS = {
+    "walk": {
+        "change_probability": 0.3,  # 1ティックで値が変わる確率
+        "max_change": 10.0  # 1ティックの最大変化量
+    },
+    "sine": {
+        "period_min": 3.0,  # 周期の下限（秒、デバイスごとに範囲内で決定）
+        "period_max": 8.0,  # 周期の上限（秒）
+        "amplitude": 50.0,  # 振幅（中心は50）
+        "noise": 0.0  # 加えるノイズの標準偏差
+    },
+    "step": {
+        "hold_mean": 2.0,  # 値を保持する平均時間（秒、指数分布）
+        "levels": 5.0  # 0-100を等分した段階数
+    },
+    "trace": {
+        "rate": 5.0,  # 記録波形の再生レート（サンプル/秒）
+        "speed": 1.0  # 再生速度の倍率
+    }
+}
+WAVEFORMS = tuple(WAVEFORM_PARAMS)
+
+
+def parse_trace(trace):
+    """
+    記録波形を再生用の配列に変換
+
+    Args:
+        trace (list): 値のリスト、値のリストのリスト、または
+            ロガーの出力形式 [{"id", "value", "ts"(ミリ秒)}, ...]
+
+    Returns:
+        tuple: (波形配列 shape=(波形数, サンプル数), 記録のサンプルレート（ロガー形式の場合のみ、それ以外はNone）)
+
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    if not isinstance(trace, list) or not trace:
+        raise ValueError("trace は空でないリストで指定してください")
+
+    rate = None
+    if isinstance(trace[0], dict):
+        # ロガー形式: idごとの時系列を等間隔に補間する
+        series = {}
+        try:
+            for record in trace:
+                series.setdefault(record["id"], []).append((float(record["ts"]), float(record["value"])))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("trace のレコードには数値の id, value, ts が必要です")
+
+        intervals = np.concatenate([np.diff(sorted(ts for ts, _ in points)) for points in series.values()])
+        intervals = intervals[intervals > 0]
+        step_ms = float(np.median(intervals)) if intervals.size else 1000.0
+        rate = 1000.0 / step_ms
+        end = max(points[-1][0] for points in series.values())
+        grid = np.arange(0.0, end + step_ms / 2, step_ms)
+        rows = []
+        for _, points in sorted(series.items(), key=lambda item: str(item[0])):
+            points.sort()
+            ts, values = np.array(points).T
+            rows.append(np.interp(grid, ts, values))
+        data = np.vstack(rows)
+    else:
+        try:
+            data = np.array(trace if isinstance(trace[0], list) else [trace], dtype=np.float64)
+        except ValueError:
+            raise ValueError("trace は数値のリスト（または同じ長さのリストのリスト）で指定してください")
+        if data.ndim != 2:
+            raise ValueError("trace は数値のリスト（または同じ長さのリストのリスト）で指定してください")
+
+    if data.shape[1] < 2 or data.size > MAX_TRACE_LENGTH:
+        raise ValueError(f"trace のサンプル数は2以上{MAX_TRACE_LENGTH}以下にしてください")
+    if not np.all(np.isfinite(data)):
+        raise ValueError("trace に数値以外の値が含まれています")
+    return np.clip(data, 0, 100), rate
+
+
+class SimulationEngine:
+    """N台のシミュレーションデバイスの値をまとめて生成するエンジン"""
+
+    def __init__(self, count=DEFAULT_DEVICE_COUNT, waveform=DEFAULT_WAVEFORM, seed=None, tick=DEFAULT_TICK):
+        """
+        初期化
+
+        Args:
+            count (int): デバイス数
+            waveform (str): 波形（WAVEFORMSのいずれか）
+            seed (int, optional): 乱数シード（省略時は毎回異なる値列）
+            tick (float): 1ティックで進めるシミュレーション時間（秒）
+        """
+        self.lock = Lock()  # 設定変更とティックの排他用
+        self.count = 0
+        self.waveform = DEFAULT_WAVEFORM
+        self.seed = None
+        self.tick = tick
+        self.params = {}
+        self.trace = None  # 記録波形 shape=(波形数, サンプル数)
+        self.device_ids = []
+        self.configure(count=count, waveform=waveform, seed=seed)
+
+    def configure(self, count=None, waveform=None, seed=None, params=None, trace=None, reset_seed=False):
+        """
+        デバイス数と波形を設定し、状態を初期化
+
+        省略した項目は現在の設定を引き継ぎます（波形を変えた場合のパラメーターはデフォルトに戻ります）。
+
+        Args:
+            count (int, optional): デバイス数
+            waveform (str, optional): 波形
+            seed (int, optional): 乱数シード
+            params (dict, optional): 波形のパラメーター（WAVEFORM_PARAMSのキー）
+            trace (list, optional): 記録波形（waveformが"trace"の場合に使用、形式は parse_trace を参照）
+            reset_seed (bool): Trueの場合はシードを解除（毎回異なる値列）
+
+        Raises:
+            ValueError: 設定が不正な場合（その場合は現在の設定を変更しない）
+        """
+        count = self.count if count is None else count
+        waveform = self.waveform if waveform is None else waveform
+        seed = None if reset_seed else (self.seed if seed is None else seed)
+
+        if isinstance(count, bool) or not isinstance(count, int) or not 1 <= count <= MAX_DEVICE_COUNT:
+            raise ValueError(f"count は1から{MAX_DEVICE_COUNT}の整数で指定してください")
+        if waveform not in WAVEFORM_PARAMS:
+            raise ValueError(f"waveform は {', '.join(WAVEFORMS)} のいずれかで指定してください")
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+            raise ValueError("seed は0以上の整数で指定してください")
+
+        merged = dict(WAVEFORM_PARAMS[waveform])
+        if waveform == self.waveform:
+            merged.update(self.params)
+        for key, value in (params or {}).items():
+            if key not in merged:
+                raise ValueError(f"{waveform} に不明なパラメーターがあります: {key}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value) or value < 0:
+                raise ValueError(f"{key} は0以上の数値で指定してください")
+            merged[key] = float(value)
+        self._validate_params(waveform, merged)
+
+        trace_data = self.trace
+        if trace is not None:
+            trace_data, recorded_rate = parse_trace(trace)
+            if recorded_rate and "rate" not in (params or {}):
+                merged["rate"] = recorded_rate
+        if waveform == "trace" and trace_data is None:
+            raise ValueError("trace 波形には trace（記録した値）が必要です")
+
+        with self.lock:
+            self.count = count
+            self.waveform = waveform
+            self.seed = seed
+            self.params = merged
+            self.trace = trace_data
+            self.device_ids = [f"{SIM_PREFIX}{i}" for i in range(1, count + 1)]
+            self._reset()
+        logger.info(f"シミュレーション設定: {count}台, 波形 {waveform}, シード {seed}")
+
+    @staticmethod
+    def _validate_params(waveform, params):
+        """パラメーター間の関係を検証"""
+        if waveform == "walk" and params["change_probability"] > 1:
+            raise ValueError("change_probability は0から1で指定してください")
+        if waveform == "sine" and not 0 < params["period_min"] <= params["period_max"]:
+            raise ValueError("period_min は0より大きく period_max 以下で指定してください")
+        if waveform == "step" and (params["hold_mean"] <= 0 or params["levels"] < 2):
+            raise ValueError("hold_mean は0より大きく、levels は2以上で指定してください")
+        if waveform == "trace" and (params["rate"] <= 0 or params["speed"] <= 0):
+            raise ValueError("rate と speed は0より大きい値で指定してください")
+
+    def _reset(self):
+        """乱数と波形の状態を初期化（ロック取得済みで呼び出す）"""
+        n = self.count
+        rng = np.random.default_rng(self.seed)
+        self.rng = rng
+        self.elapsed = 0.0
+        self.ticks = 0
+        self.values = rng.integers(0, 101, n).astype(np.float64)
+        self.previous = self.values.copy()
+        self.notified_at = np.zeros(n)  # 最後に通知した時刻（app側の判定で使用）
+
+        p = self.params
+        if self.waveform == "sine":
+            self.periods = rng.uniform(p["period_min"], p["period_max"], n)
+            self.phases = rng.uniform(0, 2 * np.pi, n)
+            self._step_sine(0.0)
+        elif self.waveform == "step":
+            self.next_change = rng.exponential(p["hold_mean"], n)
+        elif self.waveform == "trace":
+            traces = self.trace.shape[0]
+            # 記録した波形数までのデバイスは先頭から、それ以降は再生位置をずらして再生
+            self.trace_rows = np.arange(n) % traces
+            self.trace_offsets = np.where(np.arange(n) < traces, 0.0, rng.uniform(0, self.trace.shape[1], n))
+            self._step_trace(0.0)
+        self.previous = self.values.copy()
+
+    def step(self, dt=None):
+        """
+        全デバイスの値を1ティック分進める
+
+        Args:
+            dt (float, optional): 進めるシミュレーション時間（秒、省略時は設定のtick）
+
+        Returns:
+            tuple: (値 ndarray[int64], 生値 ndarray[int64], 前回の値 ndarray[int64])
+        """
+        with self.lock:
+            dt = self.tick if dt is None else dt
+            self.previous = self.values.copy()
+            self.elapsed += dt
+            self.ticks += 1
+            getattr(self, f"_step_{self.waveform}")(dt)
+            return self._snapshot()
+
+    def _snapshot(self):
+        """現在の値を整数配列で返す（ロック取得済みで呼び出す）"""
+        values = np.rint(self.values).astype(np.int64)
+        raw = (values * RAW_SCALE).astype(np.int64)
+        return values, raw, np.rint(self.previous).astype(np.int64)
+
+    def _step_walk(self, dt):
+        """一定確率で前回の値から少しだけ変化させる（自然な動き）"""
+        p = self.params
+        n = self.count
+        max_change = int(p["max_change"])
+        moves = self.rng.random(n) < p["change_probability"]
+        deltas = self.rng.integers(-max_change, max_change + 1, n)
+        self.values = np.clip(self.values + np.where(moves, deltas, 0), 0, 100)
+
+    def _step_sine(self, dt):
+        """デバイスごとの周期・位相の正弦波"""
+        p = self.params
+        values = 50 + p["amplitude"] * np.sin(2 * np.pi * self.elapsed / self.periods + self.phases)
+        if p["noise"]:
+            values += self.rng.normal(0, p["noise"], self.count)
+        self.values = np.clip(values, 0, 100)
+
+    def _step_step(self, dt):
+        """ランダムな時間だけ保持してから別の段階へ移る階段状の波形"""
+        p = self.params
+        due = self.next_change <= self.elapsed
+        count = int(np.count_nonzero(due))
+        if count:
+            levels = int(p["levels"])
+            self.values[due] = self.rng.integers(0, levels, count) * (100 / (levels - 1))
+            self.next_change[due] = self.elapsed + self.rng.exponential(p["hold_mean"], count)
+
+    def _step_trace(self, dt):
+        """記録波形を線形補間して再生（末尾に達したら先頭に戻る）"""
+        p = self.params
+        length = self.trace.shape[1]
+        position = (self.elapsed * p["rate"] * p["speed"] + self.trace_offsets) % length
+        index = position.astype(np.int64)
+        frac = position - index
+        current = self.trace[self.trace_rows, index]
+        following = self.trace[self.trace_rows, (index + 1) % length]
+        self.values = current + (following - current) * frac
+
+    def due_for_notification(self, values, previous, now, thresholds):
+        """
+        通知しきい値を満たすデバイスを求め、通知時刻を更新
+
+        Args:
+            values (ndarray): 現在の値
+            previous (ndarray): 前回ティックの値
+            now (float): 判定時刻
+            thresholds (dict): value_change, time_threshold, force_interval
+
+        Returns:
+            ndarray: 通知するデバイスのインデックス
+        """
+        with self.lock:
+            if values.shape[0] != self.count:
+                return np.empty(0, dtype=np.int64)  # ティック中に設定が変わった
+            change = np.abs(values - previous)
+            elapsed = now - self.notified_at
+            due = (
+                (change >= thresholds['value_change'])
+                | ((elapsed >= thresholds['time_threshold']) & (change > 0))
+                | (elapsed >= thresholds['force_interval'])
+            )
+            indices = np.flatnonzero(due)
+            self.notified_at[indices] = now
+            return indices
+
+    def mark_notified(self, now):
+        """全デバイスを通知済みにする（初期値を一括通知した時に使用）"""
+        with self.lock:
+            self.notified_at[:] = now
+
+    def get_values(self, timestamp):
+        """
+        全デバイスの現在値を取得
+
+        Args:
+            timestamp (float): 値に付けるタイムスタンプ
+
+        Returns:
+            dict: {device_id: {"value", "raw", "timestamp"}}
+        """
+        with self.lock:
+            values, raw, _ = self._snapshot()
+            device_ids = self.device_ids
+        return {
+            device_id: {"value": value, "raw": raw_value, "timestamp": timestamp}
+            for device_id, value, raw_value in zip(device_ids, values.tolist(), raw.tolist())
+        }
+
+    def get_config(self):
+        """
+        現在の設定を取得
+
+        Returns:
+            dict: デバイス数、波形、シード、パラメーター、経過ティック数
+        """
+        with self.lock:
+            config = {
+                "count": self.count,
+                "waveform": self.waveform,
+                "waveforms": list(WAVEFORMS),
+                "seed": self.seed,
+                "tick": self.tick,
+                "params": dict(self.params),
+                "ticks": self.ticks
+            }
+            if self.trace is not None:
+                config["trace_shape"] = list(self.trace.shape)
+            return config
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分位点スケッチモジュール
+
+デバイスごとの値やポーリング遅延の分布を、KLLスケッチで一定のメモリに要約します。
+スケッチは一定時間ごとの区間（エポック）に分けて保持し、指定した期間の区間を併合して分位点を求めます。
+KLLスケッチは併合できるため、複数デバイスやグループの分布も元のサンプルを読み直さずに求められます。
+
+シミュレーションデバイスのように同じ時刻に全台の値が揃うデバイス群は、
+列ごとに独立したスケッチを1つの行列として持ち、圧縮（ソートと間引き）を全列まとめて行います。
+"""
+
+import math
+import random
+import logging
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+SKETCH_K = 128  # スケッチの精度パラメータ（大きいほど正確、順位の誤差はおよそ 1.7/k）
+MIN_K = 16  # デバイス群のスケッチで使う精度パラメータの下限
+MIN_CAPACITY = 8  # 各レベルの最小容量
+SKETCH_INTERVAL = 300.0  # 1区間の長さ（秒）
+SKETCH_EPOCHS = 12  # 保持する過去の区間の数（現在の区間と合わせて約1時間）
+GROUP_MEMORY_BUDGET = 64 * 1024 * 1024  # デバイス群のスケッチに使う最大メモリ（バイト、超える場合は精度を下げる）
+METRICS = ("value", "latency")  # 集計する指標（値、ポーリング遅延（秒））
+
+
+class KllSketch:
+    """
+    KLLスケッチ（width 列の独立したスケッチを1つの配列で保持する）
+
+    レベル h の要素は 2**h 個のサンプルを表します。レベルが容量を超えるとソートして1つおきに
+    上のレベルへ移すため、保持する要素数はサンプル数に関わらずおよそ 4k 個以下です
+    （追加した値は k 件ごとにまとめてレベル0に移し、圧縮します）。
+    """
+
+    def __init__(self, k=SKETCH_K, width=1):
+        """
+        初期化
+
+        Args:
+            k (int): 精度パラメータ
+            width (int): 列の数（1台分の場合は1）
+        """
+        self.k = k
+        self.width = width
+        self.levels = []  # レベルごとの要素 ndarray (要素数, width)
+        self._buffer = []  # レベル0に移す前の値（width=1 は数値、それ以外は行の配列）
+        self._buffer_limit = max(MIN_CAPACITY, k)  # バッファに貯める件数（配列演算を k 件ごとにまとめる）
+        self.n = 0
+        self.min = None  # 列ごとの最小値 ndarray (width,)
+        self.max = None
+
+    def update(self, value):
+        """
+        1サンプルを追加（width=1 の場合は数値、それ以外は列ごとの値の配列）
+
+        Args:
+            value: 値
+        """
+        self._buffer.append(value)
+        self.n += 1
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def merge(self, *others):
+        """
+        別のスケッチを併合（others は変更しない）
+
+        レベルごとに全スケッチの要素を連結してから1回だけ圧縮するため、
+        多数のスケッチもまとめて併合できます。
+
+        Args:
+            *others (KllSketch): 同じ列数のスケッチ
+        """
+        parts = [self]
+        for other in others:
+            other._flush()
+            if other.n:
+                parts.append(other)
+        if len(parts) == 1:
+            return
+        self._flush()
+        depth = max(len(part.levels) for part in parts)
+        self.levels = [
+            np.concatenate([part.levels[h] for part in parts if h < len(part.levels)])
+            for h in range(depth)
+        ]
+        self.n = sum(part.n for part in parts)
+        self.min = np.min([part.min for part in parts if part.min is not None], axis=0)
+        self.max = np.max([part.max for part in parts if part.max is not None], axis=0)
+        self._compress()
+
+    def column(self, index):
+        """
+        1列分のスケッチを取り出す
+
+        Args:
+            index (int): 列の位置
+
+        Returns:
+            KllSketch: width=1 のスケッチ（コピー）
+        """
+        self._flush()
+        sketch = KllSketch(self.k)
+        sketch.levels = [items[:, index:index + 1].copy() for items in self.levels]
+        sketch.n = self.n
+        if self.n:
+            sketch.min = self.min[index:index + 1].copy()
+            sketch.max = self.max[index:index + 1].copy()
+        return sketch
+
+    def quantiles(self, qs):
+        """
+        分位点を求める（width=1 のスケッチのみ）
+
+        Args:
+            qs (iterable): 分位（0.0-1.0）
+
+        Returns:
+            list: 分位点、サンプルがない場合はNoneのリスト
+        """
+        qs = list(qs)
+        self._flush()
+        if not self.n:
+            return [None] * len(qs)
+        items = np.concatenate([level[:, 0] for level in self.levels])
+        weights = np.concatenate([np.full(len(level), 1 << h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        ranks = np.asarray(qs, dtype=np.float64) * cumulative[-1]
+        index = np.minimum(np.searchsorted(cumulative, ranks, side="left"), len(items) - 1)
+        result = items[index]
+        # 最小・最大は正確に保持しているため端の分位はそれを使う
+        result = np.clip(result, self.min[0], self.max[0])
+        return [float(self.min[0]) if q <= 0 else float(self.max[0]) if q >= 1 else float(v) for q, v in zip(qs, result)]
+
+    @property
+    def retained(self):
+        """保持している要素数（列あたり）"""
+        return sum(len(level) for level in self.levels) + len(self._buffer)
+
+    def _capacity(self, h):
+        """レベル h の容量（上のレベルほど大きい）"""
+        depth = max(1, len(self.levels)) - 1 - h
+        return max(MIN_CAPACITY, int(math.ceil(self.k * (2 / 3) ** max(0, depth))))
+
+    def _flush(self):
+        """バッファの値をレベル0に移す"""
+        if not self._buffer:
+            return
+        rows = np.asarray(self._buffer, dtype=np.float64).reshape(-1, self.width)
+        self._buffer = []
+        low, high = rows.min(axis=0), rows.max(axis=0)
+        self.min = low if self.min is None else np.minimum(self.min, low)
+        self.max = high if self.max is None else np.maximum(self.max, high)
+        if self.levels:
+            self.levels[0] = np.concatenate((self.levels[0], rows))
+        else:
+            self.levels.append(rows)
+
+    def _compress(self):
+        """容量を超えたレベルを下から順に圧縮"""
+        self._flush()
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) >= self._capacity(h):
+                self._compact(h)
+            h += 1
+
+    def _compact(self, h):
+        """レベル h をソートし、1つおきの要素を上のレベルへ移す（奇数個の場合は最大の要素を残す）"""
+        items = np.sort(self.levels[h], axis=0)
+        even = len(items) - len(items) % 2
+        promoted = items[random.getrandbits(1):even:2]
+        self.levels[h] = items[even:]
+        if h + 1 < len(self.levels):
+            self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+        else:
+            self.levels.append(promoted)
+
+
+class RollingSketch:
+    """一定時間ごとの区間に分けたスケッチ（古い区間から破棄する）"""
+
+    def __init__(self, k=SKETCH_K, width=1, interval=SKETCH_INTERVAL, epochs=SKETCH_EPOCHS):
+        """
+        初期化
+
+        Args:
+            k (int): 精度パラメータ
+            width (int): 列の数
+            interval (float): 1区間の長さ（秒）
+            epochs (int): 保持する過去の区間の数
+        """
+        self.k = k
+        self.width = width
+        self.interval = interval
+        self.epochs = deque(maxlen=epochs + 1)  # [(区間番号, KllSketch)]（古い順）
+        self._epoch = None  # 現在の区間番号
+        self._current = None  # 現在の区間のスケッチ
+
+    def update(self, value, now):
+        """
+        1サンプル（または1行）を追加
+
+        Args:
+            value: 値（width=1 の場合は数値、それ以外は列ごとの値の配列）
+            now (float): 時刻（UNIX秒）
+        """
+        epoch = int(now // self.interval)
+        if epoch != self._epoch:
+            self._epoch = epoch
+            self._current = KllSketch(self.k, self.width)
+            self.epochs.append((epoch, self._current))
+        self._current.update(value)
+
+    def prune(self, now):
+        """
+        保持期間を過ぎた区間を破棄
+
+        Returns:
+            bool: 保持している区間がなくなった場合True
+        """
+        oldest = int(now // self.interval) - (self.epochs.maxlen - 1)
+        while self.epochs and self.epochs[0][0] < oldest:
+            self.epochs.popleft()
+        return not self.epochs
+
+    def merged(self, since=None, column=None):
+        """
+        指定時刻以降の区間を併合したスケッチ
+
+        区間単位で併合するため、since を含む区間の全体が対象になります。
+
+        Args:
+            since (float, optional): この時刻を含む区間以降を対象にする（UNIX秒）
+            column (int, optional): 取り出す列の位置（省略時は全列）
+
+        Returns:
+            KllSketch: 併合したスケッチ（新しいオブジェクト）
+        """
+        first = int(since // self.interval) if since is not None else None
+        result = KllSketch(self.k, 1 if column is not None else self.width)
+        result.merge(*(
+            sketch.column(column) if column is not None else sketch
+            for epoch, sketch in list(self.epochs) if first is None or epoch >= first
+        ))
+        return result
+
+    @property
+    def nbytes(self):
+        return sum(sketch.retained for _, sketch in self.epochs) * self.width * 8
+
+
+class SketchStore:
+    """全デバイスの分位点スケッチを管理するクラス"""
+
+    def __init__(self, k=SKETCH_K, interval=SKETCH_INTERVAL, epochs=SKETCH_EPOCHS):
+        """
+        初期化
+
+        Args:
+            k (int): 精度パラメータ
+            interval (float): 1区間の長さ（秒）
+            epochs (int): 保持する過去の区間の数
+        """
+        self.k = k
+        self.interval = interval
+        self.epochs = epochs
+        self.sketches = {}  # {(device_id, metric): RollingSketch}
+        self.groups = {}  # {グループ名: (device_ids, {device_id: 列の位置}, RollingSketch)}
+        self.lock = Lock()  # スケッチの作成・読み出しの排他用
+
+    def observe(self, device_id, metric, value, now):
+        """
+        1サンプルを追加
+
+        Args:
+            device_id (str): デバイスID
+            metric (str): 指標（METRICS のいずれか）
+            value (float): 値
+            now (float): 時刻（UNIX秒）
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return  # 数値でない値は集計しない
+        if not math.isfinite(value):
+            return
+        with self.lock:
+            sketch = self.sketches.get((device_id, metric))
+            if sketch is None:
+                sketch = self.sketches[(device_id, metric)] = RollingSketch(self.k, 1, self.interval, self.epochs)
+            sketch.update(value, now)
+
+    def observe_group(self, name, device_ids, values, now):
+        """
+        デバイス群の同じ時刻の値をまとめて追加（指標は value）
+
+        デバイスIDのリストが前回と異なる（別のリストオブジェクトの）場合は、その群のスケッチを作り直します。
+
+        Args:
+            name (str): グループ名
+            device_ids (list): デバイスIDのリスト
+            values (ndarray): 値の配列（device_ids の順）
+            now (float): 時刻（UNIX秒）
+        """
+        with self.lock:
+            group = self.groups.get(name)
+            if group is None or group[0] is not device_ids:
+                if not len(device_ids):
+                    self.groups.pop(name, None)
+                    return
+                # 保持する要素数（列あたり約4k個×区間数）がメモリの上限に収まるよう精度を下げる
+                k = int(GROUP_MEMORY_BUDGET // (len(device_ids) * 8 * 4 * (self.epochs + 1)))
+                k = max(MIN_K, min(self.k, k))
+                if k < self.k:
+                    logger.info(f"スケッチの精度をk={k}に制限: {name} ({len(device_ids)}台)")
+                group = self.groups[name] = (
+                    device_ids,
+                    {device_id: i for i, device_id in enumerate(device_ids)},
+                    RollingSketch(k, len(device_ids), self.interval, self.epochs)
+                )
+            group[2].update(np.asarray(values, dtype=np.float64), now)
+
+    def discard_group(self, name):
+        """デバイス群のスケッチを破棄"""
+        with self.lock:
+            self.groups.pop(name, None)
+
+    def list_devices(self, metric):
+        """
+        指定した指標のスケッチがあるデバイスIDの一覧を取得
+
+        Args:
+            metric (str): 指標
+
+        Returns:
+            list: デバイスID
+        """
+        with self.lock:
+            device_ids = [device_id for device_id, m in self.sketches if m == metric]
+            if metric == "value":
+                for group_ids, _, _ in self.groups.values():
+                    device_ids.extend(group_ids)
+        return device_ids
+
+    def get_sketches(self, device_ids, metric, since=None):
+        """
+        複数デバイスの指定時刻以降のスケッチをまとめて取得
+
+        デバイス群に属するデバイスは、群の区間を1回だけ併合してから列を取り出します。
+
+        Args:
+            device_ids (iterable): デバイスID
+            metric (str): 指標
+            since (float, optional): この時刻を含む区間以降を対象にする（UNIX秒）
+
+        Returns:
+            dict: {device_id: KllSketch}（スケッチがないデバイスは含まない）
+        """
+        result = {}
+        group_merged = {}  # {グループ名: 併合したスケッチ}
+        with self.lock:
+            for device_id in device_ids:
+                sketch = self.sketches.get((device_id, metric))
+                if sketch is not None:
+                    result[device_id] = sketch.merged(since)
+                    continue
+                if metric != "value":
+                    continue
+                for name, (_, columns, group_sketch) in self.groups.items():
+                    if device_id in columns:
+                        if name not in group_merged:
+                            group_merged[name] = group_sketch.merged(since)
+                        result[device_id] = group_merged[name].column(columns[device_id])
+                        break
+        return result
+
+    def prune(self, now):
+        """
+        保持期間を過ぎた区間と、区間がなくなったデバイスのスケッチを破棄
+
+        Args:
+            now (float): 現在時刻（UNIX秒）
+        """
+        with self.lock:
+            for key in [key for key, sketch in self.sketches.items() if sketch.prune(now)]:
+                del self.sketches[key]
+            for _, _, group_sketch in self.groups.values():
+                group_sketch.prune(now)
+
+    def get_stats(self):
+        """
+        スケッチの保持状況を取得
+
+        Returns:
+            dict: スケッチ数、使用メモリの目安（バイト）、区間の設定
+        """
+        with self.lock:
+            memory = sum(s.nbytes for s in self.sketches.values())
+            memory += sum(group[2].nbytes for group in self.groups.values())
+            return {
+                "k": self.k,
+                "interval": self.interval,
+                "epochs": self.epochs,
+                "sketches": len(self.sketches),
+                "groups": len(self.groups),
+                "memory_bytes": memory
+            }
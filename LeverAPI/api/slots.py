@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+スロット割り当てモジュール
+
+デバイスに安定したスロット番号を割り当て、値を固定長の配列として保持します。
+コンシューマーはデバイスIDを解析せず、配列の位置だけで値を適用できます。
+"""
+
+import re
+import logging
+from threading import Lock
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+DEFAULT_SLOT_COUNT = 6  # スロット数（positionVisualizerの表示数に合わせる）
+_TRAILING_NUMBER = re.compile(r"(\d+)$")
+
+
+class SlotAllocator:
+    """デバイスIDとスロット番号の対応を管理するクラス"""
+
+    def __init__(self, slot_count=DEFAULT_SLOT_COUNT):
+        """
+        初期化
+
+        Args:
+            slot_count (int): スロット数
+        """
+        self.slot_count = slot_count
+        self.slots = [None] * slot_count  # スロット番号 -> デバイスID
+        self.values = [None] * slot_count  # スロット番号 -> 最新値
+        self.index = {}  # デバイスID -> スロット番号
+        self.online = set()  # 値を保持しているデバイスID
+        self.overflow = set()  # スロットを割り当てられなかったデバイスID（警告は最初の1台だけ出す）
+        self.version = 0  # 割り当てが変わるたびに増加
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+
+    def _preferred_slot(self, device_id):
+        """末尾の番号から希望スロットを求める（lever1 -> 0）"""
+        match = _TRAILING_NUMBER.search(str(device_id))
+        if match:
+            slot = int(match.group(1)) - 1
+            if 0 <= slot < self.slot_count:
+                return slot
+        return None
+
+    def _assign(self, device_id):
+        """
+        デバイスにスロットを割り当てる（ロック取得済みで呼び出す）
+
+        空きスロットがなければ、値を保持していないデバイスのスロットを再利用します。
+
+        Returns:
+            int: スロット番号、割り当てできない場合はNone
+        """
+        preferred = self._preferred_slot(device_id)
+        candidates = []
+        if preferred is not None:
+            candidates.append(preferred)
+        candidates.extend(range(self.slot_count))
+
+        slot = next((s for s in candidates if self.slots[s] is None), None)
+        if slot is None:
+            slot = next((s for s in candidates if self.slots[s] not in self.online), None)
+            if slot is None:
+                if not self.overflow:
+                    logger.warning(f"空きスロットがありません: {device_id}（以降のデバイスはデバッグログに出力）")
+                elif device_id not in self.overflow:
+                    logger.debug(f"空きスロットがありません: {device_id}")
+                self.overflow.add(device_id)
+                return None
+            del self.index[self.slots[slot]]
+
+        self.slots[slot] = device_id
+        self.values[slot] = None
+        self.index[device_id] = slot
+        self.overflow.discard(device_id)
+        self.online.add(device_id)
+        self.version += 1
+        logger.info(f"スロット割り当て: {device_id} -> {slot}")
+        return slot
+
+    def update(self, device_updates):
+        """
+        デバイスの値をスロット配列に反映
+
+        Args:
+            device_updates (dict): デバイスIDをキーとする更新データ辞書
+
+        Returns:
+            bool: スロットの割り当てが変わった場合True
+        """
+        with self.lock:
+            version = self.version
+
+            # 番号付きのデバイスが希望スロットを先に確保できるよう、新規デバイスを先に割り当てる
+            new_devices = sorted(
+                (d for d in device_updates if d not in self.index),
+                key=lambda d: self._preferred_slot(d) is None
+            )
+            for device_id in new_devices:
+                self._assign(device_id)
+
+            for device_id, value_data in device_updates.items():
+                slot = self.index.get(device_id)
+                if slot is None:
+                    continue
+                self.values[slot] = value_data.get("value") if value_data else None
+                self.online.add(device_id)
+            return self.version != version
+
+    def release(self, device_id):
+        """
+        切断されたデバイスの値を消去（割り当ては再接続に備えて保持）
+
+        Args:
+            device_id (str): デバイスID
+
+        Returns:
+            bool: 値を消去した場合True
+        """
+        with self.lock:
+            self.online.discard(device_id)
+            self.overflow.discard(device_id)
+            slot = self.index.get(device_id)
+            if slot is None:
+                return False
+            self.values[slot] = None
+            return True
+
+    def get_map(self):
+        """
+        スロット割り当て表を取得
+
+        Returns:
+            dict: バージョンとスロットごとのデバイスID
+        """
+        with self.lock:
+            return {"version": self.version, "slots": list(self.slots)}
+
+    def get_frame(self, timestamp):
+        """
+        全スロットの値を固定長配列として取得
+
+        Args:
+            timestamp (float): フレーム時刻
+
+        Returns:
+            dict: 割り当て表のバージョン、値の配列、時刻
+        """
+        with self.lock:
+            return {"map_version": self.version, "values": list(self.values), "timestamp": timestamp}
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Socket.IO 送信計測モジュール
+
+python-socketio のクライアントマネージャーとパケットクラスを置き換え、
+送信したイベントごとの送信処理時間とエンコード後のサイズを計測します。
+送信箇所を変更せずに、サーバーからのすべての emit が計測されます。
+"""
+
+import time
+import logging
+
+import socketio
+from socketio import packet as socketio_packet
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+EMIT_LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1
+)  # 送信処理時間のバケット境界（秒）
+EMIT_SIZE_BUCKETS = (
+    64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)  # 送信サイズのバケット境界（バイト）
+
+
+class MeasuredManager(socketio.Manager):
+    """送信処理時間（エンコードと全受信者への送信キューへの追加）をイベントごとに計測するクライアントマネージャー"""
+
+    def __init__(self, latency):
+        """
+        初期化
+
+        Args:
+            latency (MetricFamily): event ラベルを持つヒストグラム
+        """
+        super().__init__()
+        self.latency = latency
+
+    def emit(self, event, data, namespace, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().emit(event, data, namespace, *args, **kwargs)
+        finally:
+            self.latency.labels(event).observe(time.perf_counter() - started)
+
+
+def measured_packet_class(size):
+    """
+    エンコード後のサイズをイベントごとに計測するパケットクラスを作成
+
+    受信者全員に同じパケットを送る場合はエンコードは1回だけのため、サイズも1回だけ記録されます。
+    JSONはASCIIでエンコードされるため、文字数がそのままバイト数になります。
+
+    Args:
+        size (MetricFamily): event ラベルを持つヒストグラム
+
+    Returns:
+        type: SocketIO の serializer に指定するパケットクラス
+    """
+    class MeasuredPacket(socketio_packet.Packet):
+        def encode(self):
+            encoded = super().encode()
+            if self.packet_type in (socketio_packet.EVENT, socketio_packet.BINARY_EVENT) and self.data:
+                length = len(encoded) if isinstance(encoded, str) else sum(len(part) for part in encoded)
+                size.labels(str(self.data[0])).observe(length)
+            return encoded
+
+    return MeasuredPacket
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Server-Sent Events モジュール
+
+通知パイプラインのイベントをSSEストリームとして配信します。
+購読者ごとにデバイス・イベント種別のフィルターを持ち、
+直近のイベントをリングバッファに保持して Last-Event-ID による再開に対応します。
+"""
+
+import json
+import time
+import logging
+from collections import deque
+from itertools import count
+from threading import Lock
+
+from eventlet.queue import LightQueue, Empty, Full
+
+# ロギング設定
+logger = logging.getLogger(__name__)
+
+# 設定
+DEFAULT_HISTORY_SIZE = 1024  # 再開用に保持するイベント数
+DEFAULT_QUEUE_SIZE = 256  # 購読者ごとの未送信イベント上限
+DEFAULT_HEARTBEAT_INTERVAL = 15.0  # ハートビートコメントの送信間隔（秒）
+DEFAULT_RETRY_MS = 2000  # クライアントの再接続待機時間（ミリ秒）
+
+
+def _encode(event_id, event, payload):
+    """SSEのイベント形式にエンコード"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class _Subscriber:
+    """単一のSSE接続の購読状態"""
+
+    __slots__ = ("devices", "events", "queue", "overflowed")
+
+    def __init__(self, devices, events, queue_size):
+        self.devices = devices  # 購読デバイスIDのfrozenset（Noneは全デバイス）
+        self.events = events  # 購読イベント名のfrozenset（Noneは全イベント）
+        self.queue = LightQueue(queue_size)
+        self.overflowed = False  # 送信が追いつかずイベントを取りこぼした場合True
+
+    def render(self, event_id, event, payload, encoded):
+        """
+        フィルターを適用してイベントを文字列化
+
+        Returns:
+            str: 送信するイベント文字列、対象外の場合はNone
+        """
+        if self.events is not None and event not in self.events:
+            return None
+        if self.devices is None:
+            return encoded
+
+        if "updates" in payload:
+            updates = {k: v for k, v in payload["updates"].items() if k in self.devices}
+            if not updates:
+                return None
+            filtered = dict(payload)
+            filtered["updates"] = updates
+            return _encode(event_id, event, filtered)
+
+        if payload.get("device_id") not in self.devices:
+            return None
+        return encoded
+
+
+class StreamHub:
+    """通知イベントを複数のSSE購読者に配信するハブ"""
+
+    def __init__(self, history_size=DEFAULT_HISTORY_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                 heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL):
+        """
+        初期化
+
+        Args:
+            history_size (int): Last-Event-ID 再開用に保持するイベント数
+            queue_size (int): 購読者ごとの未送信イベント上限
+            heartbeat_interval (float): ハートビートコメントの送信間隔（秒）
+        """
+        self.history = deque(maxlen=history_size)  # [(event_id, event, payload, encoded)]
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.subscribers = set()
+        self.ids = count(1)
+        self.lock = Lock()  # スレッドセーフ操作のためのロック
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def publish(self, event, payload):
+        """
+        イベントを全購読者に配信
+
+        Args:
+            event (str): イベント名
+            payload (dict): イベントデータ
+
+        Returns:
+            int: イベントID
+        """
+        with self.lock:
+            event_id = next(self.ids)
+            entry = (event_id, event, payload, _encode(event_id, event, payload))
+            self.history.append(entry)
+            subscribers = list(self.subscribers)
+            self.published += 1
+
+        for subscriber in subscribers:
+            self._deliver(subscriber, entry)
+        return event_id
+
+    def _deliver(self, subscriber, entry):
+        """購読者のキューにイベントを追加（あふれた場合は接続を閉じて再開させる）"""
+        if subscriber.overflowed:
+            return
+        text = subscriber.render(*entry)
+        if text is None:
+            return
+        try:
+            subscriber.queue.put_nowait(text)
+        except Full:
+            subscriber.overflowed = True
+            self.dropped_subscribers += 1
+
+    def subscribe(self, devices=None, events=None, last_event_id=None):
+        """
+        購読者を登録し、必要に応じて取りこぼしたイベントを再送キューに積む
+
+        Args:
+            devices (iterable, optional): 購読するデバイスID
+            events (iterable, optional): 購読するイベント名
+            last_event_id (int, optional): クライアントが最後に受信したイベントID
+
+        Returns:
+            _Subscriber: 購読者
+        """
+        subscriber = _Subscriber(
+            frozenset(devices) if devices else None,
+            frozenset(events) if events else None,
+            self.queue_size
+        )
+        with self.lock:
+            # 再送分を新規イベントより先に積むためロック内で配信する
+            if last_event_id is not None:
+                for entry in self.history:
+                    if entry[0] > last_event_id:
+                        self._deliver(subscriber, entry)
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """購読者の登録を解除"""
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def stream(self, subscriber, retry_ms=DEFAULT_RETRY_MS):
+        """
+        購読者向けのSSEストリームを生成するジェネレータ
+
+        イベントがない間は一定間隔でハートビートコメントを送信します。
+
+        Args:
+            subscriber (_Subscriber): 購読者
+            retry_ms (int): クライアントの再接続待機時間（ミリ秒）
+
+        Yields:
+            str: SSE形式の文字列
+        """
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while not subscriber.overflowed:
+                try:
+                    yield subscriber.queue.get(timeout=self.heartbeat_interval)
+                except Empty:
+                    yield f": heartbeat {time.time():.3f}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+            logger.debug("SSEストリーム終了")
+
+    def get_stats(self):
+        """
+        ハブの統計情報を取得
+
+        Returns:
+            dict: 統計情報
+        """
+        with self.lock:
+            return {
+                "subscribers": len(self.subscribers),
+                "published": self.published,
+                "history_size": len(self.history),
+                "dropped_subscribers": self.dropped_subscribers
+            }
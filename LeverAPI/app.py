@@ -20,16 +20,37 @@ import threading
 import eventlet
 eventlet.monkey_patch()  # 非同期I/Oのパッチ適用（WebSocketのパフォーマンス向上のため）
 
-from flask import Flask, jsonify, request, render_template, send_from_directory
+from flask import Flask, jsonify, request, render_template, send_from_directory, Response, g
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import requests
 from datetime import datetime, timedelta
 
 # 内部モジュールのインポート
-from api.discovery import LeverDiscovery
+from api.discovery import LeverDiscovery, PUSH_SOURCES
 from api.device_manager import DeviceManager
 from api.transformers import transform_device_for_frontend
+from api.delta import DeltaEncoder
+from api.frame_clock import FrameClock
+from api.sse import StreamHub
+from api.slots import SlotAllocator, DEFAULT_SLOT_COUNT
+from api.registry_store import RegistryStore
+from api.ingest import UdpIngestListener, IngestStats, IngestError, decode_batch, INGEST_PORT, MAX_TRACKED_DEVICES
+from api.serial_source import SerialSourceManager, DEFAULT_BAUDRATE, DEFAULT_PIPELINE_DEPTH
+from api.simulation import SimulationEngine, SIM_PREFIX
+from api.replay import LogReplay, DEFAULT_DEVICE_PREFIX as REPLAY_DEVICE_PREFIX
+from api.columnar import COLUMNAR_SUFFIX
+from api.recorder import SessionRecorder
+from api.session_reader import SessionReader, SessionFormatError
+from api.session_stream import SessionStream
+from api.analytics import parse_params as parse_analytics_params, cache_key as analytics_cache_key, \
+    load_device_arrays, analyze as analyze_session
+from api.cache import ValueCache
+from api.metrics import MetricsRegistry
+from api.socket_metrics import MeasuredManager, measured_packet_class, EMIT_LATENCY_BUCKETS, EMIT_SIZE_BUCKETS
+from api.history import HistoryStore, lttb, DEFAULT_HISTORY_LENGTH
+from api.export import EXPORT_FORMATS, iter_session_export, iter_history_export, encode_stream
+from api.sketch import SketchStore, KllSketch, METRICS as SKETCH_METRICS
 
 # ロギング設定
 logging.basicConfig(
@@ -41,7 +62,17 @@ logger = logging.getLogger(__name__)
 # アプリケーション設定
 app = Flask(__name__)
 CORS(app)  # クロスオリジンリクエストを許可
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')  # WebSocket初期化
+
+# メトリクス（/metrics でPrometheusのテキスト形式で公開）
+metrics = MetricsRegistry(prefix='lever_')
+emit_latency = metrics.histogram(
+    'socketio_emit_seconds', 'Time to encode and queue a Socket.IO event for all recipients', ('event',), EMIT_LATENCY_BUCKETS
+)
+emit_size = metrics.histogram('socketio_emit_size_bytes', 'Encoded Socket.IO event size', ('event',), EMIT_SIZE_BUCKETS)
+socketio = SocketIO(
+    app, cors_allowed_origins="*", async_mode='eventlet',
+    client_manager=MeasuredManager(emit_latency), serializer=measured_packet_class(emit_size)
+)  # WebSocket初期化（送信時間とサイズを計測）
 
 # シミュレーションモードフラグ
 SIMULATION_MODE = False
@@ -55,11 +86,115 @@ NOTIFICATION_THRESHOLDS = {
     'force_interval': 2.0,  # 最後の通知から2秒以上経過した場合は変化がなくても通知
 }
 LAST_NOTIFICATION_TIMES = {}  # デバイスごとの最後の通知時間
+PENDING_UPDATES = {}  # 一括通知待ちの更新 {device_id: value_data}（監視ループとプッシュ取り込みで共有）
 LAST_KNOWN_DEVICE_IDS = set()  # 前回のデバイスIDセット（接続/切断検出用）
+PRESENCE_LOCK = threading.Lock()  # 接続/切断検出の直列化用
+TIME_TO_FIRST_VALUE = None  # 起動から最初のデバイス値を取得するまでの秒数
+FRAME_CLOCK_RATE = float(os.environ.get('LEVER_FRAME_RATE', 0))  # 固定周期通知のフレームレート（Hz、0で無効）
+REGISTRY_PATH = os.environ.get('LEVER_REGISTRY_PATH') or os.path.join(
+    os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)),
+    'device_registry.json'
+)  # 既知デバイスの保存先
+SWEEP_CIDRS = [c for c in os.environ.get('LEVER_SWEEP_CIDRS', '').split(',') if c.strip()]  # 定期スイープするCIDR範囲
+SWEEP_RATE = float(os.environ.get('LEVER_SWEEP_RATE', 5000))  # スイープの送信レート（パケット/秒）
+FULL_FRAME_ROOM = 'full_frames'  # 全フィールドを受信するクライアントのルーム
+SLOT_FRAME_ROOM = 'slot_frames'  # スロット配列フレームを受信するクライアントのルーム
+SLOT_COUNT = int(os.environ.get('LEVER_SLOT_COUNT', DEFAULT_SLOT_COUNT))  # スロット配列の長さ
+UDP_INGEST_PORT = int(os.environ.get('LEVER_INGEST_PORT', INGEST_PORT))  # プッシュ型テレメトリの受信ポート（0で無効）
+INGEST_MAX_DEVICES = int(os.environ.get('LEVER_INGEST_MAX_DEVICES', MAX_TRACKED_DEVICES))  # プッシュ型テレメトリで受け付けるデバイス数の上限
+SERIAL_PORTS = [p.strip() for p in os.environ.get('LEVER_SERIAL_PORTS', '').split(',') if p.strip()]  # 起動時に読み取るシリアルポート
+REPLAY_LOG_DIR = os.environ.get('LEVER_REPLAY_DIR') or (
+    os.path.join(os.path.dirname(sys.executable), 'logs') if getattr(sys, 'frozen', False)
+    else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'positionVisualizer', 'logs')
+)  # 再生できるセッションログの保存先
+REPLAY_LOG_SUFFIXES = ('.json', COLUMNAR_SUFFIX)  # 再生できるログの拡張子
+SESSION_DIR = os.environ.get('LEVER_SESSION_DIR') or os.path.join(
+    os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)),
+    'sessions'
+)  # サーバー側で記録したセッションの保存先
+SESSION_READERS = {}  # 開いているセッションの読み取り {session_id: SessionReader}
+SESSION_READER_LIMIT = 8  # 同時に開いておくセッション数（超えた場合は古いものから閉じる）
+SESSION_STREAMS = {}  # セッションを再生中のクライアント {sid: (SessionStream, 受信モード)}
+ANALYTICS_CACHE_TTL = 600.0  # セッション分析結果のキャッシュ有効期間（秒）
+HISTORY_LENGTH = int(os.environ.get('LEVER_HISTORY_LENGTH', DEFAULT_HISTORY_LENGTH))  # デバイスごとに保持する値の履歴のサンプル数
+HISTORY_DEFAULT_WINDOW = 600.0  # 値の履歴の既定の取得範囲（秒）
+HISTORY_DEFAULT_POINTS = 300  # 値の履歴の既定の点数
+HISTORY_MAX_POINTS = 5000  # 値の履歴の最大点数
 
 # ディスカバリーとデバイスマネージャーの初期化
 discovery = LeverDiscovery()
 device_manager = DeviceManager(discovery)
+delta_encoder = DeltaEncoder()  # 差分モードクライアントのフレーム生成
+frame_clock = FrameClock(lambda updates: batch_notify_changes(updates))  # 固定周期の通知（既定では無効）
+stream_hub = StreamHub()  # SSEストリームの配信ハブ
+slot_allocator = SlotAllocator(SLOT_COUNT)  # デバイスごとの安定したスロット番号
+registry_store = RegistryStore(REGISTRY_PATH)  # 既知デバイスの永続化
+ingest_listener = UdpIngestListener(
+    lambda samples, addr: ingest_samples(samples, {"ip": addr[0]}), port=UDP_INGEST_PORT,
+    stats=IngestStats(INGEST_MAX_DEVICES, on_evict=lambda device_ids: forget_ingest_devices(device_ids))
+)  # プッシュ型テレメトリの受信（UDPとHTTP一括取り込みで統計とデバイス数の上限を共有）
+serial_sources = SerialSourceManager(
+    lambda samples, reader: ingest_samples(samples, {"port": reader.port}, source="serial")
+)  # シリアル接続デバイスの読み取り
+simulation = SimulationEngine(tick=UPDATE_INTERVAL)  # シミュレーションデバイスの値の生成
+log_replay = LogReplay(lambda samples: ingest_samples(samples, {}, source="replay"))  # セッションログの再生
+session_recorder = SessionRecorder(SESSION_DIR)  # 取り込んだサンプルのバイナリ記録
+analytics_cache = ValueCache(default_ttl=ANALYTICS_CACHE_TTL)  # セッション分析結果（セッションと設定ごと）
+device_history = HistoryStore(HISTORY_LENGTH)  # デバイスごとの直近の値の履歴
+device_sketches = SketchStore()  # デバイスごとの値とポーリング遅延の分位点スケッチ
+
+# ホットパスのメトリクス
+poll_latency = metrics.histogram('poll_latency_seconds', 'HTTP poll duration per device', ('device',))
+poll_failures = metrics.counter('poll_failures_total', 'HTTP polls that returned no value', ('device',))
+monitor_tick = metrics.histogram('monitor_tick_seconds', 'Duration of one realtime monitor iteration')
+monitor_overruns = metrics.counter('monitor_tick_overruns_total', 'Realtime monitor iterations longer than the update interval')
+request_latency = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request handling time until the response starts', ('method', 'endpoint', 'status')
+)
+
+def collect_cache_stats(field):
+    """メトリクス出力用に各キャッシュの統計値を取得"""
+    caches = {
+        'value': device_manager.value_cache,
+        'stats': device_manager.stats_cache,
+        'summary': device_manager.summary_cache,
+        'analytics': analytics_cache
+    }
+    return {(name,): cache.get_stats()[field] for name, cache in caches.items()}
+
+def collect_connected_clients():
+    """メトリクス出力用に接続中のクライアント数を取得"""
+    return {
+        ('socketio',): len(socketio.server.eio.sockets),
+        ('sse',): stream_hub.get_stats()['subscribers']
+    }
+
+metrics.callback('cache_hits_total', 'Cache hits', 'counter', ('cache',), lambda: collect_cache_stats('hit_count'))
+metrics.callback('cache_misses_total', 'Cache misses', 'counter', ('cache',), lambda: collect_cache_stats('miss_count'))
+metrics.callback('cache_evictions_total', 'Cache entries removed by expiry or invalidation', 'counter', ('cache',),
+                 lambda: collect_cache_stats('eviction_count'))
+metrics.callback('cache_entries', 'Current cache entries', 'gauge', ('cache',), lambda: collect_cache_stats('size'))
+metrics.callback('connected_clients', 'Connected realtime clients', 'gauge', ('transport',), collect_connected_clients)
+metrics.callback('devices', 'Known devices', 'gauge', (), lambda: {(): len(discovery.devices)})
+
+# リクエスト処理時間の計測
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        request_latency.labels(
+            request.method, request.endpoint or 'unmatched', str(response.status_code)
+        ).observe(time.perf_counter() - started)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """メトリクスをPrometheusのテキスト形式で取得"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # APIレスポンスの標準化関数
 
@@ -112,13 +247,30 @@ def create_success_response(data, meta=None):
 @app.route('/api/devices', methods=['GET'])
 def get_devices():
     """検出されたすべてのデバイスのリストを取得"""
-    devices = discovery.get_devices()
+    version, snapshot = discovery.registry.read()
+    devices = [discovery.registry.current(device) for device in snapshot.values()]
     meta = {
         "count": len(devices),
-        "online_count": len([d for d in devices if d["status"] == "online"])
+        "online_count": len([d for d in devices if d["status"] == "online"]),
+        "version": version
     }
     return create_success_response({"devices": devices}, meta)
 
+@app.route('/api/devices/changes', methods=['GET'])
+def get_device_changes():
+    """指定バージョン以降のデバイスレジストリの変更履歴を取得"""
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return create_error_response(400, "Invalid version")
+
+    changes = discovery.registry.changes_since(since)
+    if changes is None:
+        # 履歴が破棄されている場合は全件取得が必要
+        return create_error_response(410, "Change log no longer available", {"version": discovery.version})
+
+    return create_success_response({"changes": changes}, {"version": discovery.version, "since": since})
+
 @app.route('/api/devices/<device_id>/value', methods=['GET'])
 def get_device_value_endpoint(device_id):
     """指定されたデバイスの現在値を取得"""
@@ -136,6 +288,105 @@ def get_device_value_endpoint(device_id):
     # result = value_data.copy()がすでに最適なフォーマットになっている
     return create_success_response(value_data)
 
+@app.route('/api/devices/<device_id>/history', methods=['GET'])
+def get_device_history(device_id):
+    """
+    指定されたデバイスの直近の値の履歴を取得
+
+    クエリパラメータ:
+        window: 取得する範囲（現在から遡る秒数、既定は600）
+        points: 返す点数の上限（既定は300、超える場合はLTTBで間引く）
+    """
+    try:
+        window = float(request.args.get('window', HISTORY_DEFAULT_WINDOW))
+        points = int(request.args.get('points', HISTORY_DEFAULT_POINTS))
+        if not window > 0 or not 3 <= points <= HISTORY_MAX_POINTS:
+            raise ValueError(f"window は正の秒数、points は3から{HISTORY_MAX_POINTS}で指定してください")
+    except ValueError as e:
+        return create_error_response(400, "Invalid history parameters", {"error": str(e)})
+
+    now = time.time()
+    history = device_history.get_history(device_id, since=now - window)
+    if history is None:
+        return create_error_response(404, "No history for device")
+
+    ts, values = history
+    selected = lttb(ts, values, points)
+    return create_success_response({
+        "device_id": device_id,
+        "timestamps": ts[selected].tolist(),
+        "values": values[selected].tolist()
+    }, {
+        "window": window,
+        "samples": int(len(ts)),
+        "points": int(len(selected)),
+        "downsampled": len(selected) < len(ts),
+        "timestamp": now
+    })
+
+def parse_export_options():
+    """
+    エクスポートの共通のクエリパラメータを解析
+
+    Returns:
+        tuple: (出力形式, gzip圧縮するか, 対象のデバイスID（省略時はNone）)
+
+    Raises:
+        ValueError: 出力形式が不正な場合
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format は {', '.join(EXPORT_FORMATS)} のいずれかで指定してください")
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    devices = [d for d in request.args.get('devices', '').split(',') if d] or None
+    return fmt, compress, devices
+
+def create_export_response(parts, fmt, compress, filename):
+    """
+    エクスポートのストリーミングレスポンスを作成
+
+    長さを指定しないため、チャンク転送で生成した分から順に送信されます。
+
+    Args:
+        parts (iterable): 出力する文字列の列
+        fmt (str): 出力形式
+        compress (bool): gzip圧縮する場合True
+        filename (str): ダウンロード時のファイル名（拡張子なし）
+
+    Returns:
+        Response: ストリーミングレスポンス
+    """
+    mimetype, suffix = EXPORT_FORMATS[fmt]
+    response = Response(encode_stream(parts, compress), content_type=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}{suffix}"'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/history/export', methods=['GET'])
+def export_history():
+    """
+    値の履歴をCSVまたはNDJSONでストリーミング
+
+    クエリパラメータ:
+        format: 出力形式（csv / ndjson、既定はcsv）
+        window: 現在から遡る秒数（from を指定しない場合、省略時は保持している全体）
+        from / to: 時間範囲（UNIX秒、to はこの時刻を含まない）
+        devices: 対象のデバイスID（カンマ区切り、省略時は履歴のある全デバイス）
+        gzip: 1 の場合はgzip圧縮して送信
+    """
+    try:
+        fmt, compress, devices = parse_export_options()
+        start = float(request.args['from']) if request.args.get('from') else None
+        end = float(request.args['to']) if request.args.get('to') else None
+        if start is None and request.args.get('window'):
+            start = time.time() - float(request.args['window'])
+    except ValueError as e:
+        return create_error_response(400, "Invalid export parameters", {"error": str(e)})
+
+    filename = f"history-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    return create_export_response(iter_history_export(device_history, fmt, start, end, devices), fmt, compress, filename)
+
 # @app.route('/api/values', methods=['GET'])
 # def get_all_values():
 #     """すべてのデバイスの現在値をまとめて取得"""
@@ -155,19 +406,7 @@ def get_all_values():
     
     # シミュレーションモードが有効な場合、シミュレーションデバイスの値を追加
     if SIMULATION_MODE:
-        sim_device_ids = [f"sim_{i}" for i in range(1, 4)]
-        for sim_id in sim_device_ids:
-            if sim_id in LAST_DEVICE_VALUES:
-                # デバイス情報を取得
-                device_info = discovery.get_device(sim_id)
-                if device_info:
-                    # 変換関数を使用して一貫したフォーマットに変換
-                    from api.transformers import transform_value_for_frontend
-                    values[sim_id] = transform_value_for_frontend(
-                        sim_id,
-                        LAST_DEVICE_VALUES[sim_id],
-                        device_info
-                    )
+        values.update(get_simulation_values())
     
     meta = {
         "count": len(values),
@@ -178,12 +417,58 @@ def get_all_values():
 @app.route('/api/scan', methods=['POST'])
 def scan_devices():
     """ネットワークスキャンを開始"""
+    data = request.get_json(silent=True) or {}
+
+    # サブネットスイープモード（ブロードキャストが届かないネットワーク向け）
+    if data.get('mode') == 'sweep':
+        if not discovery.is_listening:
+            return create_error_response(503, "Discovery listener is not running")
+        try:
+            networks = discovery.parse_networks(data.get('cidrs') or [str(n) for n in discovery.sweep_networks])
+            rate = float(data.get('rate', discovery.sweep_rate))
+        except (TypeError, ValueError) as e:
+            return create_error_response(400, "Invalid sweep parameters", {"error": str(e)})
+        if not networks or rate <= 0:
+            return create_error_response(400, "cidrs and a positive rate are required")
+        if discovery.is_sweeping:
+            return create_error_response(409, "Sweep already in progress")
+
+        eventlet.spawn(discovery.sweep, networks, rate)
+        return create_success_response({
+            "message": "サブネットスイープを開始しました",
+            "networks": [str(n) for n in networks],
+            "hosts": sum(discovery.host_count(n) for n in networks),
+            "rate": rate
+        })
+
+    # 常駐リスナー動作中は即座にディスカバリーを送信（応答は受信次第反映される）
+    if discovery.announce():
+        return create_success_response({
+            "message": "スキャンを開始しました"
+        })
+
     # 非同期でスキャンを実行
     threading.Thread(target=lambda: discovery.discover_devices()).start()
     return create_success_response({
         "message": "スキャンを開始しました"
     })
 
+@app.route('/api/scan/status', methods=['GET'])
+def get_scan_status():
+    """ディスカバリーリスナーとサブネットスイープの状態を取得"""
+    return create_success_response({
+        "listening": discovery.is_listening,
+        "announce_interval": discovery.announce_interval,
+        "responses_received": discovery.responses_received,
+        "sweep": {
+            "networks": [str(n) for n in discovery.sweep_networks],
+            "rate": discovery.sweep_rate,
+            "interval": discovery.sweep_interval,
+            "running": discovery.is_sweeping,
+            "last_result": discovery.last_sweep
+        }
+    })
+
 @app.route('/api/devices/<device_id>/name', methods=['PUT'])
 def update_device_name(device_id):
     """デバイスの表示名を更新"""
@@ -200,6 +485,30 @@ def update_device_name(device_id):
     else:
         return create_error_response(404, "Device not found")
 
+@app.route('/api/devices/<device_id>/notification-profile', methods=['PUT'])
+def update_notification_profile(device_id):
+    """デバイスごとの通知しきい値（通知プロファイル）を更新"""
+    data = request.json
+    if data is None or not isinstance(data, dict):
+        return create_error_response(400, "Notification profile is required")
+
+    unknown = set(data) - set(NOTIFICATION_THRESHOLDS)
+    if unknown:
+        return create_error_response(400, "Unknown notification thresholds", {"fields": sorted(unknown)})
+
+    try:
+        profile = {key: float(value) for key, value in data.items()} or None
+    except (TypeError, ValueError):
+        return create_error_response(400, "Thresholds must be numbers")
+
+    if discovery.update_notification_profile(device_id, profile):
+        return create_success_response({
+            "device_id": device_id,
+            "notification_profile": profile
+        })
+    else:
+        return create_error_response(404, "Device not found")
+
 # 拡張BFFエンドポイント
 
 @app.route('/api/statistics', methods=['GET'])
@@ -212,6 +521,92 @@ def get_statistics():
     }
     return create_success_response({"statistics": stats}, meta)
 
+def summarize_sketch(sketch, percentiles):
+    """
+    スケッチの件数・最小・最大・分位点をまとめる
+
+    Args:
+        sketch (KllSketch): スケッチ
+        percentiles (tuple): 求める分位点（%）
+
+    Returns:
+        dict: count, min, max, p{分位点}
+    """
+    values = sketch.quantiles([p / 100 for p in percentiles])
+    summary = {
+        "count": sketch.n,
+        "min": float(sketch.min[0]) if sketch.n else None,
+        "max": float(sketch.max[0]) if sketch.n else None
+    }
+    summary.update({f"p{p:g}": v for p, v in zip(percentiles, values)})
+    return summary
+
+@app.route('/api/statistics/sketches', methods=['GET'])
+def get_statistics_sketches():
+    """
+    デバイスごとの値またはポーリング遅延の分布（分位点）を取得
+
+    クエリパラメータ:
+        metric: 指標（value / latency、既定はvalue）
+        window: 対象の期間（現在から遡る秒数、省略時は保持している全期間）
+        devices: 対象のデバイスID（カンマ区切り、省略時はスケッチのある全デバイス）
+        percentiles: 求める分位点（%、カンマ区切り、既定は5,50,95）
+        group_by: source を指定すると取得経路ごとに併合した分布も返す
+        groups: 併合するグループ（"名前:ID,ID;名前:ID" の形式）
+
+    グループと全体の分布はデバイスごとのスケッチを併合して求めるため、元のサンプルは読み直しません。
+    """
+    try:
+        metric = request.args.get('metric', 'value')
+        if metric not in SKETCH_METRICS:
+            raise ValueError(f"metric は {', '.join(SKETCH_METRICS)} のいずれかで指定してください")
+        window = float(request.args['window']) if request.args.get('window') else None
+        percentiles = tuple(float(p) for p in request.args.get('percentiles', '5,50,95').split(','))
+        if not all(0 <= p <= 100 for p in percentiles):
+            raise ValueError("percentiles は0から100の範囲で指定してください")
+        group_by = request.args.get('group_by')
+        if group_by not in (None, '', 'source'):
+            raise ValueError("group_by は source のみ指定できます")
+        groups = {}
+        for spec in filter(None, request.args.get('groups', '').split(';')):
+            name, _, members = spec.partition(':')
+            if not name or not members:
+                raise ValueError("groups は \"名前:ID,ID;名前:ID\" の形式で指定してください")
+            groups[name] = [d for d in members.split(',') if d]
+    except ValueError as e:
+        return create_error_response(400, "Invalid sketch parameters", {"error": str(e)})
+
+    now = time.time()
+    device_sketches.prune(now)
+    since = now - window if window is not None else None
+    device_ids = [d for d in request.args.get('devices', '').split(',') if d] or device_sketches.list_devices(metric)
+
+    sketches = device_sketches.get_sketches(
+        dict.fromkeys(device_ids + [d for members in groups.values() for d in members]), metric, since
+    )
+
+    if group_by == 'source':
+        devices = discovery.devices
+        for device_id in device_ids:
+            source = devices.get(device_id, {}).get('source', 'poll')
+            groups.setdefault(source, []).append(device_id)
+
+    def merge(members):
+        merged = KllSketch(device_sketches.k)
+        merged.merge(*(sketches[device_id] for device_id in members if device_id in sketches))
+        return merged
+
+    return create_success_response({
+        "metric": metric,
+        "devices": {d: summarize_sketch(sketches[d], percentiles) for d in device_ids if d in sketches},
+        "groups": {name: summarize_sketch(merge(members), percentiles) for name, members in groups.items()},
+        "all": summarize_sketch(merge(device_ids), percentiles)
+    }, {
+        "window": window,
+        "interval": device_sketches.interval,
+        "timestamp": now
+    })
+
 @app.route('/api/devices/summary', methods=['GET'])
 def get_device_summary():
     """デバイス情報と値をまとめて取得（BFF向けデータ集約）"""
@@ -220,21 +615,7 @@ def get_device_summary():
     
     # シミュレーションモードが有効な場合、シミュレーションデバイスの値を追加
     if SIMULATION_MODE:
-        sim_device_ids = [f"sim_{i}" for i in range(1, 4)]
-        for sim_id in sim_device_ids:
-            if sim_id in LAST_DEVICE_VALUES:
-                # デバイス情報を取得
-                device_info = discovery.get_device(sim_id)
-                if device_info:
-                    # 変換関数を使用して一貫したフォーマットに変換
-                    from api.transformers import transform_value_for_frontend
-                    if "values" not in summary:
-                        summary["values"] = {}
-                    summary["values"][sim_id] = transform_value_for_frontend(
-                        sim_id,
-                        LAST_DEVICE_VALUES[sim_id],
-                        device_info
-                    )
+        summary.setdefault("values", {}).update(get_simulation_values())
     
     meta = {
         "timestamp": datetime.now().timestamp(),
@@ -315,7 +696,7 @@ def process_single_operation(operation):
             device = discovery.get_device(device_id)
             # デバイス情報がある場合は変換関数を使用
             if device:
-                device = transform_device_for_frontend(device)
+                device = transform_device_for_frontend(discovery.registry.current(device))
             return {
                 'type': 'get_device',
                 'result': device
@@ -359,33 +740,7 @@ def process_single_operation(operation):
 @app.route('/api/simulation/toggle', methods=['POST'])
 def toggle_simulation_mode():
     """シミュレーションモードの切り替え"""
-    global SIMULATION_MODE, LAST_DEVICE_VALUES
-    SIMULATION_MODE = not SIMULATION_MODE
-    
-    # シミュレーションモードが有効になった場合、即座にデバイスを作成して通知
-    if SIMULATION_MODE:
-        sim_device_ids = [f"sim_{i}" for i in range(1, 4)]  # 3つのシミュレーションデバイス
-        for sim_id in sim_device_ids:
-            is_new = create_or_update_sim_device(sim_id)
-            if is_new:
-                # 初回作成時は個別通知（接続時の初期表示のため）
-                socketio.emit('device_update', {
-                    'device_id': sim_id,
-                    'data': LAST_DEVICE_VALUES[sim_id]
-                })
-                logger.info(f"シミュレーションデバイス {sim_id} を作成して通知しました")
-    else:
-        # シミュレーションモードが無効になった場合、シミュレーションデバイスを削除
-        sim_device_ids = [f"sim_{i}" for i in range(1, 4)]
-        for sim_id in sim_device_ids:
-            if sim_id in discovery.devices:
-                del discovery.devices[sim_id]
-            if sim_id in LAST_DEVICE_VALUES:
-                del LAST_DEVICE_VALUES[sim_id]
-            # 切断通知を送信
-            socketio.emit('device_disconnected', {'device_id': sim_id})
-            logger.info(f"シミュレーションデバイス {sim_id} を削除しました")
-
+    set_simulation_mode(not SIMULATION_MODE)
     return create_success_response({
         "simulation_mode": SIMULATION_MODE
     })
@@ -397,6 +752,473 @@ def get_simulation_status():
         "simulation_mode": SIMULATION_MODE
     })
 
+@app.route('/api/simulation', methods=['GET'])
+def get_simulation_config():
+    """シミュレーションの設定（デバイス数・波形・シード）を取得"""
+    return create_success_response({
+        "simulation_mode": SIMULATION_MODE,
+        "simulation": simulation.get_config()
+    })
+
+@app.route('/api/simulation', methods=['POST'])
+def configure_simulation():
+    """
+    シミュレーションのデバイス数・波形・シードを設定
+
+    実行中に設定した場合は値の生成を最初からやり直し、増減したデバイスだけを接続/切断します。
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return create_error_response(400, "Invalid request body")
+
+    enabled = data.get('enabled')
+    if enabled is not None and not isinstance(enabled, bool):
+        return create_error_response(400, "enabled must be a boolean")
+    params = data.get('params')
+    if params is not None and not isinstance(params, dict):
+        return create_error_response(400, "params must be an object")
+
+    previous_ids = set(simulation.device_ids)
+    try:
+        simulation.configure(
+            count=data.get('count'),
+            waveform=data.get('waveform'),
+            seed=data.get('seed'),
+            params=params,
+            trace=data.get('trace'),
+            reset_seed='seed' in data and data['seed'] is None
+        )
+    except ValueError as e:
+        return create_error_response(400, "Invalid simulation configuration", {"error": str(e)})
+
+    if enabled is not None and enabled != SIMULATION_MODE:
+        set_simulation_mode(enabled)
+    elif SIMULATION_MODE:
+        # 実行中の場合は台数の差分だけ登録・削除し、全デバイスの新しい値を通知
+        current_ids = set(simulation.device_ids)
+        discovery.remove_devices(previous_ids - current_ids)
+        register_simulation_devices(current_ids - previous_ids)
+        sync_device_presence()
+        publish_simulation_values()
+
+    return create_success_response({
+        "simulation_mode": SIMULATION_MODE,
+        "simulation": simulation.get_config()
+    })
+
+# SSEストリーム関連のエンドポイント
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """
+    通知パイプラインのイベントをServer-Sent Eventsで配信
+
+    クエリパラメータ:
+        devices: 購読するデバイスID（カンマ区切り、省略時は全デバイス）
+        events: 購読するイベント名（カンマ区切り、省略時は全イベント）
+        last_event_id: 再開するイベントID（Last-Event-IDヘッダーが優先）
+    """
+    devices = [d for d in request.args.get('devices', '').split(',') if d]
+    events = [e for e in request.args.get('events', '').split(',') if e]
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return create_error_response(400, "Invalid Last-Event-ID")
+
+    subscriber = stream_hub.subscribe(devices, events, last_event_id)
+    response = Response(stream_hub.stream(subscriber), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # リバースプロキシでのバッファリングを無効化
+    return response
+
+@app.route('/api/stream/status', methods=['GET'])
+def get_stream_status():
+    """SSEストリームの接続数と配信状況を取得"""
+    return create_success_response(stream_hub.get_stats())
+
+# フレームクロック関連のエンドポイント
+@app.route('/api/frame-clock/status', methods=['GET'])
+def get_frame_clock_status():
+    """フレームクロックの状態とジッター・送信時間のヒストグラムを取得"""
+    return create_success_response(frame_clock.get_stats())
+
+@app.route('/api/frame-clock/config', methods=['POST'])
+def configure_frame_clock():
+    """フレームクロックの有効化とフレームレート・ジッター目標の設定"""
+    data = request.json or {}
+
+    try:
+        frame_clock.configure(
+            frame_rate=data.get('frame_rate'),
+            jitter_target=data.get('jitter_target')
+        )
+    except (TypeError, ValueError) as e:
+        return create_error_response(400, "Invalid frame clock configuration", {"error": str(e)})
+
+    if 'enabled' in data:
+        if data['enabled']:
+            frame_clock.start()
+        else:
+            frame_clock.stop()
+
+    return create_success_response(frame_clock.get_stats())
+
+# プッシュ型テレメトリ関連のエンドポイント
+@app.route('/api/ingest', methods=['POST'])
+def ingest_batch():
+    """ゲートウェイから複数デバイスのサンプルを一括で取り込む（JSONまたはバイナリ）"""
+    stats = ingest_listener.stats
+    try:
+        samples = decode_batch(request.get_data(cache=False))
+    except IngestError as e:
+        stats.count_error()
+        return create_error_response(400, "Invalid ingest batch", {"error": str(e)})
+
+    # 重複・順序逆転の判定と適用を、バッチ全体に対して1回ずつ行う
+    stats.count_batch()
+    accepted, rejected = stats.classify_many(samples)
+    applied = ingest_samples(accepted, {"ip": request.remote_addr}) if accepted else 0
+
+    return create_success_response({
+        "received": len(samples),
+        "accepted": len(accepted),
+        "rejected": rejected,
+        "devices_updated": applied
+    })
+
+@app.route('/api/ingest/status', methods=['GET'])
+def get_ingest_status():
+    """UDPテレメトリ受信の状態とデバイスごとのパケットロス統計を取得"""
+    stats = ingest_listener.stats.get_stats()
+    stats.update({
+        "running": ingest_listener.running,
+        "port": ingest_listener.port
+    })
+    return create_success_response(stats)
+
+# シリアル接続デバイス関連のエンドポイント
+@app.route('/api/serial/status', methods=['GET'])
+def get_serial_status():
+    """シリアルポートごとの読み取り状況（サンプルレート、応答時間のヒストグラム）を取得"""
+    return create_success_response(serial_sources.get_stats())
+
+@app.route('/api/serial/ports', methods=['POST'])
+def add_serial_port():
+    """シリアルポートの読み取りを開始"""
+    data = request.get_json(silent=True) or {}
+    port = data.get('port')
+    if not port:
+        return create_error_response(400, "Port is required")
+
+    try:
+        reader = serial_sources.add_port(
+            port,
+            baudrate=int(data.get('baudrate', DEFAULT_BAUDRATE)),
+            pipeline_depth=int(data.get('pipeline_depth', DEFAULT_PIPELINE_DEPTH))
+        )
+    except (TypeError, ValueError) as e:
+        return create_error_response(400, "Invalid serial port configuration", {"error": str(e)})
+    except RuntimeError as e:
+        return create_error_response(503, "Serial support is not available", {"error": str(e)})
+
+    return create_success_response(reader.get_stats())
+
+@app.route('/api/serial/ports', methods=['DELETE'])
+def remove_serial_port():
+    """シリアルポートの読み取りを停止"""
+    data = request.get_json(silent=True) or {}
+    port = data.get('port')
+    reader = serial_sources.remove_port(port) if port else None
+    if reader is None:
+        return create_error_response(404, "Serial port not found")
+
+    return create_success_response({"port": port, "stopped": True})
+
+# セッションログ再生関連のエンドポイント
+def resolve_replay_log(name):
+    """
+    再生するログのファイル名をログ保存先のパスに変換
+
+    Args:
+        name (str): ログのファイル名（ディレクトリを含まない .json または列形式の .lvc）
+
+    Returns:
+        str: ログファイルのパス、不正な名前の場合はNone
+    """
+    if not isinstance(name, str) or os.path.basename(name) != name or not name.endswith(REPLAY_LOG_SUFFIXES):
+        return None
+    return os.path.join(REPLAY_LOG_DIR, name)
+
+@app.route('/api/replay/logs', methods=['GET'])
+def list_replay_logs():
+    """再生できるセッションログの一覧を取得"""
+    logs = []
+    if os.path.isdir(REPLAY_LOG_DIR):
+        for entry in sorted(os.scandir(REPLAY_LOG_DIR), key=lambda e: e.name):
+            if entry.is_file() and entry.name.endswith(REPLAY_LOG_SUFFIXES):
+                stat = entry.stat()
+                logs.append({"file": entry.name, "size": stat.st_size, "modified": stat.st_mtime})
+    return create_success_response({"directory": REPLAY_LOG_DIR, "logs": logs})
+
+@app.route('/api/replay', methods=['GET'])
+def get_replay_status():
+    """セッションログの再生状態を取得"""
+    return create_success_response(log_replay.get_status())
+
+@app.route('/api/replay', methods=['POST'])
+def start_replay():
+    """
+    セッションログの再生を開始（再生中の場合は置き換え）
+
+    ログの各フレームは記録時のタイムスタンプどおりにプッシュ型デバイスの値として取り込まれます。
+    """
+    data = request.get_json(silent=True) or {}
+    path = resolve_replay_log(data.get('file'))
+    if path is None:
+        return create_error_response(400, "Invalid log file name")
+
+    prefix = data.get('prefix', REPLAY_DEVICE_PREFIX)
+    if not isinstance(prefix, str) or not prefix or prefix.startswith(SIM_PREFIX):
+        return create_error_response(400, "Invalid device prefix")
+
+    try:
+        log_replay.start(
+            path,
+            speed=float(data.get('speed', 1.0)),
+            loop=bool(data.get('loop', False)),
+            prefix=prefix
+        )
+    except (TypeError, ValueError) as e:
+        return create_error_response(400, "Invalid replay configuration", {"error": str(e)})
+    except OSError:
+        return create_error_response(404, "Log file not found")
+
+    return create_success_response(log_replay.get_status())
+
+@app.route('/api/replay', methods=['DELETE'])
+def stop_replay():
+    """セッションログの再生を停止（再生デバイスは他のプッシュ型デバイスと同じくタイムアウトでオフラインになる）"""
+    return create_success_response({"stopped": log_replay.stop()})
+
+# セッション記録関連のエンドポイント
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    """記録済みのセッションの一覧を取得"""
+    return create_success_response({
+        "directory": SESSION_DIR,
+        "sessions": session_recorder.list_sessions()
+    })
+
+@app.route('/api/sessions/recording', methods=['GET'])
+def get_recording_status():
+    """セッションの記録状態を取得"""
+    return create_success_response(session_recorder.get_status())
+
+@app.route('/api/sessions/recording', methods=['POST'])
+def start_recording():
+    """
+    セッションの記録を開始
+
+    開始後に取り込んだすべてのサンプル（ポーリング・プッシュ・シリアル・再生・シミュレーション）を記録します。
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        session = session_recorder.start(
+            name=data.get('name'),
+            segment_bytes=data.get('segment_bytes'),
+            segment_seconds=data.get('segment_seconds')
+        )
+    except RuntimeError as e:
+        return create_error_response(409, "Session recording already in progress", {"error": str(e)})
+    except (TypeError, ValueError) as e:
+        return create_error_response(400, "Invalid recording configuration", {"error": str(e)})
+    except OSError as e:
+        return create_error_response(500, "Failed to create session", {"error": str(e)})
+
+    return create_success_response(session)
+
+@app.route('/api/sessions/recording', methods=['DELETE'])
+def stop_recording():
+    """セッションの記録を停止"""
+    session = session_recorder.stop()
+    if session is None:
+        return create_error_response(404, "No session is being recorded")
+
+    return create_success_response(session)
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """記録済みのセッションのメタデータ（デバイスとセグメントの一覧）を取得"""
+    session = session_recorder.get_session_meta(session_id)
+    if session is None:
+        return create_error_response(404, "Session not found")
+
+    return create_success_response(session)
+
+def get_session_reader(session_id):
+    """
+    セッションの読み取りを取得（開いたものは再利用し、記録中のセッションは追記分を取り込む）
+
+    Args:
+        session_id (str): セッションID
+
+    Returns:
+        SessionReader: セッションの読み取り、セッションがない場合はNone
+
+    Raises:
+        SessionFormatError: セッションファイルが不正な場合
+    """
+    session_dir = session_recorder.resolve_session(session_id)
+    if session_dir is None:
+        SESSION_READERS.pop(session_id, None)
+        return None
+
+    reader = SESSION_READERS.pop(session_id, None)
+    if reader is None:
+        reader = SessionReader(session_dir)
+    elif not reader.complete:
+        reader.refresh()
+
+    # 最近使ったものを末尾に置き、上限を超えた古いものを閉じる
+    SESSION_READERS[session_id] = reader
+    while len(SESSION_READERS) > SESSION_READER_LIMIT:
+        SESSION_READERS.pop(next(iter(SESSION_READERS)))
+    return reader
+
+@app.route('/api/sessions/<session_id>/range', methods=['GET'])
+def get_session_range(session_id):
+    """
+    記録済みのセッションの時間範囲のサンプルをJSON配列でストリーミング
+
+    クエリパラメータ:
+        from: 開始位置（セッション開始からの秒数、省略時は先頭から）
+        to: 終了位置（セッション開始からの秒数、この位置を含まない、省略時は末尾まで）
+        devices: 対象のデバイスID（カンマ区切り、省略時は全デバイス）
+
+    レコードは positionVisualizer のログと同じ {"id", "value", "raw", "ts"(UNIXミリ秒)} の形式です。
+    """
+    try:
+        start = float(request.args['from']) if request.args.get('from') else None
+        end = float(request.args['to']) if request.args.get('to') else None
+    except ValueError as e:
+        return create_error_response(400, "Invalid time range", {"error": str(e)})
+    devices = [d for d in request.args.get('devices', '').split(',') if d] or None
+
+    try:
+        reader = get_session_reader(session_id)
+    except SessionFormatError as e:
+        return create_error_response(500, "Failed to read session", {"error": str(e)})
+    if reader is None:
+        return create_error_response(404, "Session not found")
+
+    started_at = reader.started_at
+    chunks = reader.iter_chunks(
+        started_at + start if start is not None else None,
+        started_at + end if end is not None else None,
+        devices
+    )
+    names = [json.dumps(device_id, ensure_ascii=False) for device_id in reader.devices]
+
+    def generate():
+        yield '['
+        separator = ''
+        for base_time, chunk in chunks:
+            # 1チャンク分をまとめて文字列にする（レコードごとにdictを作らない）
+            ts = (chunk['ts'].astype('int64') + round(base_time * 1000)).tolist()
+            body = ','.join(
+                f'{{"id":{names[slot]},"value":{value},"raw":{raw},"ts":{t}}}'
+                for slot, value, raw, t in zip(chunk['slot'].tolist(), chunk['value'].tolist(), chunk['raw'].tolist(), ts)
+            )
+            yield separator + body
+            separator = ','
+        yield ']'
+
+    response = Response(generate(), mimetype='application/json')
+    response.headers['X-Session-Start'] = str(started_at)
+    return response
+
+@app.route('/api/sessions/<session_id>/export', methods=['GET'])
+def export_session(session_id):
+    """
+    記録済みのセッションをCSVまたはNDJSONでストリーミング
+
+    クエリパラメータ:
+        format: 出力形式（csv / ndjson、既定はcsv）
+        from / to: 時間範囲（セッション開始からの秒数、to はこの位置を含まない）
+        devices: 対象のデバイスID（カンマ区切り、省略時は全デバイス）
+        gzip: 1 の場合はgzip圧縮して送信
+    """
+    try:
+        fmt, compress, devices = parse_export_options()
+        start = float(request.args['from']) if request.args.get('from') else None
+        end = float(request.args['to']) if request.args.get('to') else None
+    except ValueError as e:
+        return create_error_response(400, "Invalid export parameters", {"error": str(e)})
+
+    try:
+        reader = get_session_reader(session_id)
+    except SessionFormatError as e:
+        return create_error_response(500, "Failed to read session", {"error": str(e)})
+    if reader is None:
+        return create_error_response(404, "Session not found")
+
+    started_at = reader.started_at
+    parts = iter_session_export(
+        reader, fmt,
+        started_at + start if start is not None else None,
+        started_at + end if end is not None else None,
+        devices
+    )
+    response = create_export_response(parts, fmt, compress, f"session-{reader.session_id}")
+    response.headers['X-Session-Start'] = str(started_at)
+    return response
+
+@app.route('/api/sessions/<session_id>/analytics', methods=['GET'])
+def get_session_analytics(session_id):
+    """
+    記録済みのセッションの分析結果を取得
+
+    クエリパラメータ:
+        from / to: 分析する範囲（セッション開始からの秒数、省略時は全体）
+        devices: 対象のデバイスID（カンマ区切り、省略時は全デバイス）
+        percentiles, bands, move_threshold, deadband, max_gap, reaction_window, resample:
+            分析の設定（api.analytics.DEFAULT_PARAMS を参照）
+
+    結果はセッションと設定の組ごとにキャッシュされ、記録中のセッションはレコードが増えると再計算されます。
+    """
+    try:
+        start = float(request.args['from']) if request.args.get('from') else None
+        end = float(request.args['to']) if request.args.get('to') else None
+        params = parse_analytics_params(request.args)
+    except ValueError as e:
+        return create_error_response(400, "Invalid analytics parameters", {"error": str(e)})
+    devices = [d for d in request.args.get('devices', '').split(',') if d] or None
+
+    try:
+        reader = get_session_reader(session_id)
+    except SessionFormatError as e:
+        return create_error_response(500, "Failed to read session", {"error": str(e)})
+    if reader is None:
+        return create_error_response(404, "Session not found")
+
+    key = analytics_cache_key(session_id, params, start, end, devices)
+    result = analytics_cache.get(key, version=reader.record_count)
+    cached = result is not None
+    if not cached:
+        started_at = reader.started_at
+        arrays = load_device_arrays(
+            reader,
+            started_at + start if start is not None else None,
+            started_at + end if end is not None else None,
+            devices
+        )
+        result = analyze_session(arrays, params)
+        analytics_cache.cleanup()
+        analytics_cache.set(key, result, version=reader.record_count)
+        logger.info(f"セッション分析: {session_id} ({result['records']}レコード, {result['elapsed'] * 1000:.0f}ms)")
+
+    return create_success_response(result, {"cached": cached, "session_id": session_id})
 
 # 値変更検出と通知の共通関数
 def check_and_notify_value_change(device_id):
@@ -423,10 +1245,7 @@ def check_and_notify_value_change(device_id):
         LAST_NOTIFICATION_TIMES[device_id] = current_time
 
         # WebSocketで通知
-        socketio.emit('device_update', {
-            'device_id': device_id,
-            'data': value_data
-        })
+        notify_device_update(device_id, value_data)
 
         logger.debug(f"デバイス {device_id} の初期値を通知: {value_data['value']}")
         return True
@@ -468,10 +1287,7 @@ def check_and_notify_value_change(device_id):
 
         # クライアントが接続されている場合のみ通知
         if client_count > 0:
-            socketio.emit('device_update', {
-                'device_id': device_id,
-                'data': value_data
-            })
+            notify_device_update(device_id, value_data)
 
             logger.debug(f"デバイス {device_id} の値変更を {client_count} クライアントに通知: {value_data['value']}")
             return True
@@ -482,130 +1298,116 @@ def check_and_notify_value_change(device_id):
     LAST_DEVICE_VALUES[device_id] = value_data.copy()
     return False
 
-def create_or_update_sim_device(sim_id):
+def set_simulation_mode(enabled):
     """
-    シミュレーションデバイスの作成または更新を行う
+    シミュレーションモードを切り替え、シミュレーションデバイスを登録または削除する
 
     Args:
-        sim_id (str): シミュレーションデバイスのID
-
-    Returns:
-        bool: デバイスが新規作成された場合はTrue、それ以外はFalse
-    """
-    global LAST_DEVICE_VALUES
-    import random
-
-    # デバイスが存在しなければ作成
-    if sim_id not in LAST_DEVICE_VALUES:
-        # シミュレーションデバイスを登録
-        if sim_id not in discovery.devices:
-            sim_device = {
-                "id": sim_id,
-                "name": f"シミュレーション {sim_id[-1]}",
-                "ip": f"127.0.0.{sim_id[-1]}",
-                "status": "online",
-                "last_seen": datetime.now().timestamp()
-            }
-            discovery.devices[sim_id] = sim_device
-
-        # 初期値を設定
-        LAST_DEVICE_VALUES[sim_id] = {
-            "value": random.randint(0, 100),
-            "raw": random.randint(0, 1023),
-            "timestamp": datetime.now().timestamp()
-        }
-        return True
-
-    return False
-
-def update_sim_device_value(sim_id, change_probability=0.3, max_change=10):
+        enabled (bool): 有効にする場合True
+    """
+    global SIMULATION_MODE
+    if enabled == SIMULATION_MODE:
+        return
+    SIMULATION_MODE = enabled
+
+    if enabled:
+        # 値の生成を最初からやり直し、全デバイスを登録して初期値を一括通知
+        simulation.configure()
+        register_simulation_devices(simulation.device_ids)
+        sync_device_presence()
+        publish_simulation_values()
+        logger.info(f"シミュレーションデバイスを{len(simulation.device_ids)}台作成しました")
+    else:
+        # 切断通知と通知状態の破棄は sync_device_presence で行う
+        removed = discovery.remove_devices(
+            device_id for device_id in discovery.devices if device_id.startswith(SIM_PREFIX)
+        )
+        sync_device_presence()
+        device_history.discard_group(SIM_PREFIX)
+        device_sketches.discard_group(SIM_PREFIX)
+        logger.info(f"シミュレーションデバイスを{len(removed)}台削除しました")
+
+def register_simulation_devices(device_ids):
     """
-    シミュレーションデバイスの値を変更し、アダプティブ通知戦略に基づいて必要に応じて通知する
+    シミュレーションデバイスをまとめてレジストリに登録
 
     Args:
-        sim_id (str): シミュレーションデバイスのID
-        change_probability (float): 値変更の確率（0.0-1.0）
-        max_change (int): 最大変化量
+        device_ids (iterable): シミュレーションデバイスのID
+    """
+    now = datetime.now().timestamp()
+    discovery.add_devices({
+        "id": sim_id,
+        "name": f"シミュレーション {sim_id[len(SIM_PREFIX):]}",
+        "ip": "127.0.0.1",
+        "status": "online",
+        "last_seen": now,
+        "source": "simulation"
+    } for sim_id in sorted(device_ids, key=lambda device_id: int(device_id[len(SIM_PREFIX):])))
+
+def get_simulation_values():
+    """
+    シミュレーションデバイスの現在値をフロントエンド用の形式で取得
 
     Returns:
-        bool: 値が変更され通知が送信された場合はTrue、それ以外はFalse
+        dict: {device_id: value_data}
     """
-    import random
-    global LAST_DEVICE_VALUES, LAST_NOTIFICATION_TIMES
-
-    current_time = datetime.now().timestamp()
-
-    # 前回の値と通知時間を取得
-    prev_value = LAST_DEVICE_VALUES[sim_id]["value"]
-    prev_notification_time = LAST_NOTIFICATION_TIMES.get(sim_id, 0)
-    time_since_last_notification = current_time - prev_notification_time
-
-    # シミュレーション値の変更
-    if random.random() < change_probability:  # 指定された確率で変更
-        # 前回の値から少しだけ変化させる（自然な動き）
-        new_value = max(0, min(100, prev_value + random.randint(-max_change, max_change)))
-    else:
-        # 変更しない場合は前回の値をそのまま使用
-        new_value = prev_value
-
-    # 生の値を計算
-    new_raw = int(new_value * 10.23)  # 0-100を0-1023に変換
-
-    # シミュレーションデータを作成
-    sim_data = {
-        "value": new_value,
-        "raw": new_raw,
-        "timestamp": current_time
+    from api.transformers import transform_value_for_frontend
+    devices = discovery.devices
+    return {
+        sim_id: transform_value_for_frontend(sim_id, value_data, devices[sim_id])
+        for sim_id, value_data in simulation.get_values(datetime.now().timestamp()).items()
+        if sim_id in devices
     }
 
-    # 値の変化量を計算
-    value_change = abs(new_value - prev_value)
-
-    # 通知条件の評価
-    should_notify = False
-
-    # 条件1: 大きな値の変化
-    if value_change >= NOTIFICATION_THRESHOLDS['value_change']:
-        should_notify = True
-        logger.debug(f"通知理由: 値の変化が大きい ({value_change})")
+def publish_simulation_values():
+    """全シミュレーションデバイスの現在値を一括通知（開始時・設定変更時の初期表示用）"""
+    current_time = time.time()
+    values = simulation.get_values(current_time)
+    for sim_id, value_data in values.items():
+        LAST_DEVICE_VALUES[sim_id] = value_data
+        LAST_NOTIFICATION_TIMES[sim_id] = current_time
+    simulation.mark_notified(current_time)
+    if frame_clock.running:
+        frame_clock.submit_many(values)
+    else:
+        batch_notify_changes(values)
 
-    # 条件2: 適度な時間経過かつ値の変化
-    elif time_since_last_notification >= NOTIFICATION_THRESHOLDS['time_threshold'] and value_change > 0:
-        should_notify = True
-        logger.debug(f"通知理由: 時間経過 ({time_since_last_notification:.1f}秒) と値の変化あり")
+def simulation_tick(current_time):
+    """
+    シミュレーションを1ティック進め、通知しきい値を満たしたデバイスを一括通知バッファに追加
 
-    # 条件3: 一定時間以上経過（変化がなくてもハートビートとして通知）
-    elif time_since_last_notification >= NOTIFICATION_THRESHOLDS['force_interval']:
-        should_notify = True
-        logger.debug(f"通知理由: 定期通知 ({time_since_last_notification:.1f}秒)")
+    値の生成と通知判定は全デバイス分をまとめて配列演算で行い、
+    値データ（dict）は通知するデバイスの分だけ作成します。
 
-    # 通知が必要な場合
-    if should_notify:
-        # 値と通知時間を更新
+    Args:
+        current_time (float): 判定時刻
+    """
+    device_ids = simulation.device_ids
+    values, raw, previous = simulation.step()
+    session_recorder.record_many(device_ids, values, raw, current_time)
+    device_history.append_group(SIM_PREFIX, device_ids, values, current_time)
+    device_sketches.observe_group(SIM_PREFIX, device_ids, values, current_time)
+    due = simulation.due_for_notification(values, previous, current_time, NOTIFICATION_THRESHOLDS)
+    if not due.size:
+        return
+
+    updates = {}
+    for index, value, raw_value in zip(due.tolist(), values[due].tolist(), raw[due].tolist()):
+        sim_id = device_ids[index]
+        sim_data = {
+            "value": value,
+            "raw": raw_value,
+            "timestamp": current_time
+        }
+        LAST_DEVICE_VALUES[sim_id] = sim_data
         LAST_NOTIFICATION_TIMES[sim_id] = current_time
+        updates[sim_id] = sim_data
 
-        # WebSocketで通知（バッテリー最適化のためにクライアント数を確認）
-        client_count = len(socketio.server.eio.sockets)
-
-        # クライアントが接続されている場合のみ通知
-        if client_count > 0:
-            socketio.emit('device_update', {
-                'device_id': sim_id,
-                'data': sim_data
-            })
-
-            logger.debug(f"シミュレーションデバイス {sim_id} の値変更を {client_count} クライアントに通知: {new_value}")
-            result = True
-        else:
-            logger.debug(f"クライアント接続なし - 通知スキップ: {sim_id}")
-            result = False
+    # フレームクロック有効時は次のフレームに直接登録
+    if frame_clock.running:
+        frame_clock.submit_many(updates)
     else:
-        result = False
-
-    # 値は常に更新（次回の変化検出のため）
-    LAST_DEVICE_VALUES[sim_id] = sim_data.copy()
-
-    return result
+        PENDING_UPDATES.update(updates)
 
 # ステータスエンドポイント
 @app.route('/api/status', methods=['GET'])
@@ -615,12 +1417,17 @@ def get_status():
         "api_status": "online",
         "version": "1.0.0",
         "simulation_mode": SIMULATION_MODE,
-        "device_count": len(discovery.devices)
+        "device_count": len(discovery.devices),
+        "discovery_listener": discovery.is_listening,
+        "udp_ingest": ingest_listener.running,
+        "history": device_history.get_stats(),
+        "sketches": device_sketches.get_stats()
     }
 
     meta = {
         "timestamp": datetime.now().timestamp(),
-        "uptime": time.time() - app.start_time if hasattr(app, 'start_time') else 0
+        "uptime": time.time() - app.start_time if hasattr(app, 'start_time') else 0,
+        "time_to_first_value": TIME_TO_FIRST_VALUE
     }
 
     return create_success_response(status_data, meta)
@@ -631,12 +1438,45 @@ def initialize_app():
     # アプリケーション起動時間を記録
     app.start_time = time.time()
 
-    # 別スレッドで初期スキャンを実行
-    threading.Thread(target=lambda: discovery.discover_devices()).start()
+    # 前回までに検出したデバイスを読み込む（応答があるまではオフライン）
+    registry_store.load_into(discovery)
+    registry_store.start_autosave(discovery.registry)
+
+    # ブロードキャストが届かないネットワーク向けのサブネットスイープを設定
+    if SWEEP_CIDRS:
+        discovery.configure_sweep(SWEEP_CIDRS, rate=SWEEP_RATE)
+
+    # 常駐ディスカバリーリスナーを開始（応答が届いた時点で接続を通知）
+    discovery.start_listener(on_device_online=lambda device_id: sync_device_presence())
+
+    # 既知のデバイスへ直接問い合わせ、スキャンを待たずに監視を再開する
+    discovery.probe_known_devices()
+
+    # デバイスの生存監視を開始（タイムアウトした時点で切断を通知）
+    discovery.start_reaper(on_device_offline=lambda device_ids: sync_device_presence())
+
+    # プッシュ型テレメトリの受信を開始（ポーリングと同じ変化検出・通知に合流）
+    if UDP_INGEST_PORT > 0:
+        try:
+            ingest_listener.start()
+        except OSError as e:
+            logger.error(f"UDPテレメトリ受信ポートを開けません: {UDP_INGEST_PORT} - {e}")
+
+    # シリアル接続デバイスの読み取りを開始
+    for port in SERIAL_PORTS:
+        try:
+            serial_sources.add_port(port)
+        except RuntimeError as e:
+            logger.error(f"シリアルポートを開始できません: {port} - {e}")
 
     # リアルタイム監視タスクをバックグラウンドで開始
     eventlet.spawn(realtime_monitor)
 
+    # フレームクロックが設定されていれば固定周期の通知を開始
+    if FRAME_CLOCK_RATE > 0:
+        frame_clock.configure(frame_rate=FRAME_CLOCK_RATE)
+        frame_clock.start()
+
 # エラーハンドラ
 @app.errorhandler(404)
 def not_found(error):
@@ -658,6 +1498,8 @@ def server_error(error):
 def handle_connect():
     """クライアント接続時の処理"""
     logger.info("WebSocketクライアント接続: %s", request.sid)
+    # 差分モードを要求するまでは全フィールドを受信する
+    join_room(FULL_FRAME_ROOM)
     # 接続時に最新の全デバイス値を送信
     all_values = device_manager.get_all_values()
     emit('all_values', all_values)
@@ -666,6 +1508,8 @@ def handle_connect():
 def handle_disconnect():
     """クライアント切断時の処理"""
     logger.info("WebSocketクライアント切断: %s", request.sid)
+    stop_session_stream(request.sid, restore=False)
+    delta_encoder.unregister(request.sid)
 
 @socketio.on('subscribe')
 def handle_subscribe(data):
@@ -678,6 +1522,354 @@ def handle_subscribe(data):
         if value_data:
             emit('device_update', {'device_id': device_id, 'data': value_data})
 
+@socketio.on('delta_mode')
+def handle_delta_mode(data):
+    """
+    差分フレームモードの切り替え
+
+    有効にすると、device_update / devices_update は前回確認応答したフレームから
+    変化したフィールドのみを含む差分フレームとして送信されます。
+    """
+    data = data or {}
+    enabled = bool(data.get('enabled', True))
+
+    if enabled:
+        delta_encoder.register(request.sid, data.get('keyframe_interval'))
+        leave_room(FULL_FRAME_ROOM)
+    else:
+        delta_encoder.unregister(request.sid)
+        join_room(FULL_FRAME_ROOM)
+
+    logger.info("クライアント %s の差分モード: %s", request.sid, enabled)
+    emit('delta_mode', {'enabled': enabled})
+
+@socketio.on('slot_mode')
+def handle_slot_mode(data):
+    """
+    スロット配列フレームモードの切り替え
+
+    有効にすると、デバイスごとの通知の代わりに割り当て表（slot_map）と
+    全スロットの値を固定長配列にした slot_frame を受信します。
+    """
+    enabled = bool((data or {}).get('enabled', True))
+
+    if enabled:
+        leave_room(FULL_FRAME_ROOM)
+        join_room(SLOT_FRAME_ROOM)
+        # 現在の割り当て表と値を即座に送信
+        emit('slot_map', slot_allocator.get_map())
+        emit('slot_frame', slot_allocator.get_frame(datetime.now().timestamp()))
+    else:
+        leave_room(SLOT_FRAME_ROOM)
+        join_room(FULL_FRAME_ROOM)
+
+    logger.info("クライアント %s のスロットモード: %s", request.sid, enabled)
+
+@socketio.on('delta_ack')
+def handle_delta_ack(data):
+    """差分フレームの確認応答（Socket.IOのackを使えないクライアント向け）"""
+    seq = (data or {}).get('seq')
+    if isinstance(seq, int):
+        delta_encoder.acknowledge(request.sid, seq)
+
+@socketio.on('request_keyframe')
+def handle_request_keyframe(data=None):
+    """次回の差分フレームをキーフレームにする"""
+    delta_encoder.request_keyframe(request.sid)
+
+# セッション再生（クライアントごと）
+def create_replay_emitter(sid, mode):
+    """
+    再生フレームをクライアントの受信モードと同じ形式で送信する関数を作成
+
+    Args:
+        sid (str): クライアントのセッションID
+        mode (str): 受信モード（"full" / "delta" / "slot"）
+
+    Returns:
+        callable: emit(updates, timestamp)
+    """
+    if mode == 'delta':
+        return lambda updates, timestamp: emit_delta_frame(sid, 'devices_update', updates, timestamp)
+
+    if mode == 'slot':
+        # ライブの割り当てを変えないよう、再生専用のスロット割り当てを使う
+        allocator = SlotAllocator(SLOT_COUNT)
+
+        def emit_slots(updates, timestamp):
+            if allocator.update(updates):
+                socketio.emit('slot_map', allocator.get_map(), to=sid)
+            socketio.emit('slot_frame', allocator.get_frame(timestamp), to=sid)
+        return emit_slots
+
+    return lambda updates, timestamp: socketio.emit(
+        'devices_update', {'updates': updates, 'timestamp': timestamp}, to=sid
+    )
+
+def stop_session_stream(sid, restore=True):
+    """
+    クライアントのセッション再生を終了し、ライブの通知に戻す
+
+    Args:
+        sid (str): クライアントのセッションID
+        restore (bool): ライブの通知を受信するルームに戻す（切断時はFalse）
+
+    Returns:
+        bool: 再生中だった場合True
+    """
+    entry = SESSION_STREAMS.pop(sid, None)
+    if entry is None:
+        return False
+    stream, mode = entry
+    stream.stop()
+
+    if restore:
+        if mode == 'slot':
+            socketio.server.enter_room(sid, SLOT_FRAME_ROOM, namespace='/')
+            socketio.emit('slot_map', slot_allocator.get_map(), to=sid)
+            socketio.emit('slot_frame', slot_allocator.get_frame(datetime.now().timestamp()), to=sid)
+        elif mode == 'delta':
+            delta_encoder.request_keyframe(sid)
+        else:
+            socketio.server.enter_room(sid, FULL_FRAME_ROOM, namespace='/')
+        socketio.emit('replay_state', dict(stream.get_state(), state='stopped'), to=sid)
+    logger.info("クライアント %s のセッション再生を終了", sid)
+    return True
+
+def get_session_stream(sid):
+    """再生中のクライアントのSessionStreamを取得（再生していない場合はエラーを通知してNone）"""
+    entry = SESSION_STREAMS.get(sid)
+    if entry is None:
+        emit('replay_error', {'message': 'No session replay in progress'})
+        return None
+    return entry[0]
+
+@socketio.on('replay_start')
+def handle_replay_start(data):
+    """
+    記録済みのセッションをこのクライアントに再生
+
+    再生中はライブの通知の代わりに、現在の受信モード（全フィールド・差分・スロット配列）と
+    同じ形式の再生フレームを受信します。replay_stop でライブの通知に戻ります。
+    """
+    data = data or {}
+    sid = request.sid
+    devices = data.get('devices')
+    if devices is not None and (not isinstance(devices, list) or not all(isinstance(d, str) for d in devices)):
+        emit('replay_error', {'message': 'Invalid devices'})
+        return
+
+    try:
+        reader = get_session_reader(data.get('session_id'))
+    except SessionFormatError as e:
+        emit('replay_error', {'message': 'Failed to read session', 'error': str(e)})
+        return
+    if reader is None:
+        emit('replay_error', {'message': 'Session not found'})
+        return
+
+    stop_session_stream(sid)
+
+    # 現在の受信モードを判定し、ライブの通知を止める
+    if delta_encoder.is_registered(sid):
+        mode = 'delta'
+        delta_encoder.request_keyframe(sid)
+    elif SLOT_FRAME_ROOM in socketio.server.rooms(sid, namespace='/'):
+        mode = 'slot'
+        socketio.server.leave_room(sid, SLOT_FRAME_ROOM, namespace='/')
+    else:
+        mode = 'full'
+        socketio.server.leave_room(sid, FULL_FRAME_ROOM, namespace='/')
+
+    stream = SessionStream(
+        reader,
+        create_replay_emitter(sid, mode),
+        lambda state: socketio.emit('replay_state', state, to=sid),
+        devices=devices
+    )
+    SESSION_STREAMS[sid] = (stream, mode)
+    try:
+        stream.start(position=data.get('position', 0.0), speed=data.get('speed', 1.0))
+    except ValueError as e:
+        stop_session_stream(sid)
+        emit('replay_error', {'message': 'Invalid replay configuration', 'error': str(e)})
+        return
+    logger.info("クライアント %s がセッション %s を再生 (%s)", sid, reader.session_id, mode)
+
+@socketio.on('replay_pause')
+def handle_replay_pause(data=None):
+    """セッション再生を一時停止"""
+    stream = get_session_stream(request.sid)
+    if stream:
+        stream.pause()
+
+@socketio.on('replay_resume')
+def handle_replay_resume(data=None):
+    """セッション再生を再開"""
+    stream = get_session_stream(request.sid)
+    if stream:
+        stream.resume()
+
+@socketio.on('replay_seek')
+def handle_replay_seek(data):
+    """セッション再生の再生位置を変更（{ position: セッション開始からの秒 }）"""
+    stream = get_session_stream(request.sid)
+    if stream:
+        try:
+            stream.seek((data or {}).get('position'))
+        except ValueError as e:
+            emit('replay_error', {'message': 'Invalid position', 'error': str(e)})
+
+@socketio.on('replay_speed')
+def handle_replay_speed(data):
+    """セッション再生の速度を変更（{ speed: 倍率 }）"""
+    stream = get_session_stream(request.sid)
+    if stream:
+        try:
+            stream.set_speed((data or {}).get('speed'))
+        except ValueError as e:
+            emit('replay_error', {'message': 'Invalid speed', 'error': str(e)})
+
+@socketio.on('replay_stop')
+def handle_replay_stop(data=None):
+    """セッション再生を終了してライブの通知に戻る"""
+    if not stop_session_stream(request.sid):
+        emit('replay_error', {'message': 'No session replay in progress'})
+
+def emit_delta_frames(event, device_updates, timestamp):
+    """
+    差分モードの各クライアントに差分フレームを送信
+
+    Args:
+        event (str): 送信するイベント名
+        device_updates (dict): デバイスIDをキーとする更新データ辞書
+        timestamp (float): フレーム時刻
+
+    Returns:
+        int: フレームを送信したクライアント数
+    """
+    sent = 0
+    for sid in delta_encoder.client_ids():
+        # セッションを再生中のクライアントには再生のフレームだけを送る
+        if sid in SESSION_STREAMS:
+            continue
+        if emit_delta_frame(sid, event, device_updates, timestamp):
+            sent += 1
+    return sent
+
+def emit_delta_frame(sid, event, device_updates, timestamp):
+    """
+    差分モードの1クライアントに差分フレームを送信
+
+    Args:
+        sid (str): クライアントのセッションID
+        event (str): 送信するイベント名
+        device_updates (dict): デバイスIDをキーとする更新データ辞書
+        timestamp (float): フレーム時刻
+
+    Returns:
+        bool: フレームを送信した場合True
+    """
+    frame = delta_encoder.encode(sid, device_updates, timestamp)
+    if frame is None:
+        return False
+
+    # 確認応答を受け取ったら差分の基準を進める
+    def on_ack(*args, seq=frame['seq']):
+        delta_encoder.acknowledge(sid, seq)
+
+    if event == 'device_update' and not frame['keyframe']:
+        # 個別通知は単一デバイスのフレームとして送信（変化がないハートビートは data を省略）
+        device_id, data = next(iter(frame.pop('updates').items()))
+        frame['device_id'] = device_id
+        if data:
+            frame['data'] = data
+        if 'removed' in frame:
+            frame['removed'] = frame['removed'][device_id]
+        socketio.emit('device_update', frame, to=sid, callback=on_ack)
+    else:
+        # キーフレームは全デバイスを含むため一括通知として送信
+        socketio.emit('devices_update', frame, to=sid, callback=on_ack)
+    return True
+
+def slot_room_has_members():
+    """
+    スロットモードのクライアントが1つ以上接続しているか
+
+    ルームが空になるとpython-socketioはルーム自体を削除するため、存在と件数の両方を確認します。
+
+    Returns:
+        bool: ルームにクライアントがいる場合True
+    """
+    return bool(socketio.server.manager.rooms.get('/', {}).get(SLOT_FRAME_ROOM))
+
+def emit_slot_frame(device_updates, timestamp):
+    """
+    スロット配列を更新し、スロットモードのクライアントに送信
+
+    割り当てが変わった場合は先に割り当て表（slot_map）を送信します。
+    受信するクライアントがいない場合もスロット配列は更新し（参加時に最新の状態を送るため）、送信だけを省略します。
+
+    Args:
+        device_updates (dict): デバイスIDをキーとする更新データ辞書
+        timestamp (float): フレーム時刻
+    """
+    map_changed = slot_allocator.update(device_updates)
+    if not slot_room_has_members():
+        return
+    if map_changed:
+        socketio.emit('slot_map', slot_allocator.get_map(), to=SLOT_FRAME_ROOM)
+    socketio.emit('slot_frame', slot_allocator.get_frame(timestamp), to=SLOT_FRAME_ROOM)
+
+def forget_notification_state(device_id):
+    """
+    切断されたデバイスの通知用の状態を破棄
+
+    Args:
+        device_id (str): デバイスID
+    """
+    delta_encoder.forget_device(device_id)
+    frame_clock.discard(device_id)
+    if slot_allocator.release(device_id) and slot_room_has_members():
+        socketio.emit('slot_frame', slot_allocator.get_frame(datetime.now().timestamp()), to=SLOT_FRAME_ROOM)
+
+def broadcast_event(event, payload):
+    """
+    接続・切断などの通知をSocket.IOとSSEの全クライアントに送信
+
+    Args:
+        event (str): イベント名
+        payload (dict): イベントデータ
+    """
+    stream_hub.publish(event, payload)
+    socketio.emit(event, payload)
+
+def notify_device_update(device_id, value_data):
+    """
+    単一デバイスの更新を通知
+
+    全フィールドモードのクライアントにはレコード全体を、
+    差分モードのクライアントには変化したフィールドのみを送信します。
+
+    Args:
+        device_id (str): デバイスID
+        value_data (dict): 更新データ
+    """
+    # フレームクロック有効時は次のフレームにまとめて送信
+    if frame_clock.running:
+        frame_clock.submit(device_id, value_data)
+        return
+
+    payload = {
+        'device_id': device_id,
+        'data': value_data
+    }
+    stream_hub.publish('device_update', payload)
+    socketio.emit('device_update', payload, to=FULL_FRAME_ROOM)
+    timestamp = datetime.now().timestamp()
+    emit_delta_frames('device_update', {device_id: value_data}, timestamp)
+    emit_slot_frame({device_id: value_data}, timestamp)
+
 # 一括通知のための変更検知とバッファリング
 def batch_notify_changes(device_updates):
     """
@@ -692,21 +1884,241 @@ def batch_notify_changes(device_updates):
     if not device_updates:
         return 0
 
+    timestamp = datetime.now().timestamp()
+    payload = {
+        'updates': device_updates,
+        'timestamp': timestamp
+    }
+
+    # SSEストリームへ配信（Socket.IOクライアントの有無に関わらず）
+    stream_hub.publish('devices_update', payload)
+
+    # スロット割り当てはクライアントの有無に関わらず更新して安定させる
+    emit_slot_frame(device_updates, timestamp)
+
     # クライアント数を確認
     client_count = len(socketio.server.eio.sockets)
     if client_count == 0:
         logger.debug(f"クライアント接続なし - 一括通知スキップ ({len(device_updates)}デバイス)")
         return 0
 
-    # WebSocketで一括通知
-    socketio.emit('devices_update', {
-        'updates': device_updates,
-        'timestamp': datetime.now().timestamp()
-    })
+    # WebSocketで一括通知（全フィールドモード）
+    socketio.emit('devices_update', payload, to=FULL_FRAME_ROOM)
+
+    # 差分モードのクライアントには変化したフィールドのみを送信
+    emit_delta_frames('devices_update', device_updates, timestamp)
 
     logger.debug(f"一括通知: {len(device_updates)}デバイスの更新を{client_count}クライアントに送信")
     return len(device_updates)
 
+def get_notification_thresholds(device_id):
+    """
+    デバイスの通知プロファイルを反映した通知しきい値を取得
+
+    Args:
+        device_id (str): デバイスID
+
+    Returns:
+        dict: 通知しきい値
+    """
+    device_info = discovery.get_device(device_id)
+    profile = device_info.get('notification_profile') if device_info else None
+    if not profile:
+        return NOTIFICATION_THRESHOLDS
+    return {**NOTIFICATION_THRESHOLDS, **profile}
+
+def record_first_value():
+    """起動から最初のデバイス値を取得するまでの時間を記録（初回のみ）"""
+    global TIME_TO_FIRST_VALUE
+    if TIME_TO_FIRST_VALUE is None and hasattr(app, 'start_time'):
+        TIME_TO_FIRST_VALUE = time.time() - app.start_time
+        logger.info(f"起動から最初の値の取得まで: {TIME_TO_FIRST_VALUE * 1000:.0f}ms")
+
+# デバイス接続/切断の検出
+def sync_device_presence():
+    """
+    オンラインデバイスの集合を前回と比較し、接続/切断を通知する
+
+    監視ループと常駐ディスカバリーリスナーの両方から呼び出されるため、
+    ロックで直列化して同じ変化を二重に通知しないようにします。
+
+    Returns:
+        list: オンラインデバイスIDのリスト
+    """
+    global LAST_KNOWN_DEVICE_IDS
+
+    with PRESENCE_LOCK:
+        online_devices = [d['id'] for d in discovery.devices.values() if d['status'] == 'online']
+        current_device_ids = set(online_devices)
+
+        # デバイス接続/切断の検出
+        connected_devices = current_device_ids - LAST_KNOWN_DEVICE_IDS
+        disconnected_devices = LAST_KNOWN_DEVICE_IDS - current_device_ids
+
+        # デバイスIDセットを先に更新（通知中に再入しても重複しないように）
+        LAST_KNOWN_DEVICE_IDS = current_device_ids
+
+    # 新規接続デバイスの通知
+    for device_id in connected_devices:
+        device_info = discovery.get_device(device_id)
+        if device_info:
+            broadcast_event('device_connected', {
+                'device_id': device_id,
+                'device_info': discovery.registry.current(device_info)
+            })
+            logger.info(f"デバイス接続を通知: {device_id}")
+
+    # 切断デバイスの通知
+    for device_id in disconnected_devices:
+        broadcast_event('device_disconnected', {
+            'device_id': device_id
+        })
+        logger.info(f"デバイス切断を通知: {device_id}")
+        forget_notification_state(device_id)
+        # 切断されたデバイスの値をクリア
+        LAST_DEVICE_VALUES.pop(device_id, None)
+        LAST_NOTIFICATION_TIMES.pop(device_id, None)
+
+    return online_devices
+
+# サンプルの記録（ポーリングとプッシュ取り込みで共通）
+def record_device_sample(device_id, value, raw, current_time):
+    """
+    通知の有無に関わらず、取得したサンプルをセッション記録・値の履歴・分布の集計に追加する
+
+    Args:
+        device_id (str): デバイスID
+        value (float): 値
+        raw (int): 生値（ない場合はNone）
+        current_time (float): 取得時刻
+    """
+    session_recorder.record(device_id, value, raw, current_time)
+    device_history.append(device_id, current_time, value)
+    device_sketches.observe(device_id, 'value', value, current_time)
+
+# 値の変化検出（ポーリングとプッシュ取り込みで共通）
+def process_device_value(device_id, value_data, current_time):
+    """
+    デバイスの新しい値を前回通知した値と比較し、必要であれば通知する
+
+    初回の値は即時に個別通知し、それ以降は通知しきい値を満たした場合に
+    一括通知用のバッファ（PENDING_UPDATES）に追加します。
+
+    Args:
+        device_id (str): デバイスID
+        value_data (dict): フロントエンド用に変換済みの値データ
+        current_time (float): 判定時刻
+    """
+    # 起動から最初の値を取得するまでの時間を記録
+    record_first_value()
+
+    # 初回または値の変化がある場合
+    if device_id not in LAST_DEVICE_VALUES:
+        # 初回の場合は即時通知（接続時の初期表示のため）
+        LAST_DEVICE_VALUES[device_id] = value_data.copy()
+        LAST_NOTIFICATION_TIMES[device_id] = current_time
+        # 接続時の初期表示は重要なので個別通知
+        notify_device_update(device_id, value_data)
+        logger.debug(f"デバイス {device_id} の初期値を通知: {value_data['value']}")
+        return
+
+    # 前回の値と時間を取得
+    prev_value = LAST_DEVICE_VALUES[device_id]['value']
+    prev_notification_time = LAST_NOTIFICATION_TIMES.get(device_id, 0)
+    time_since_last_notification = current_time - prev_notification_time
+
+    # 値の変化量を計算
+    value_change = abs(value_data['value'] - prev_value)
+
+    # デバイスごとの通知プロファイルを反映したしきい値
+    thresholds = get_notification_thresholds(device_id)
+
+    # 通知条件の評価
+    should_notify = False
+
+    # 条件1: 大きな値の変化
+    if value_change >= thresholds['value_change']:
+        should_notify = True
+
+    # 条件2: 適度な時間経過かつ値の変化
+    elif time_since_last_notification >= thresholds['time_threshold'] and value_change > 0:
+        should_notify = True
+
+    # 条件3: 一定時間以上経過（変化がなくてもハートビートとして通知）
+    elif time_since_last_notification >= thresholds['force_interval']:
+        should_notify = True
+
+    # 値は常に更新（次回の変化検出のため）
+    LAST_DEVICE_VALUES[device_id] = value_data.copy()
+
+    # 通知が必要な場合は次のフレーム（フレームクロック無効時は更新バッファ）に追加
+    if should_notify:
+        LAST_NOTIFICATION_TIMES[device_id] = current_time
+        if frame_clock.running:
+            frame_clock.submit(device_id, value_data)
+        else:
+            PENDING_UPDATES[device_id] = value_data
+
+# 休止中のプッシュ型デバイスの破棄
+def forget_ingest_devices(device_ids):
+    """
+    取り込みの追跡をやめた休止中のプッシュ型デバイスを登録から削除し、デバイスごとの状態を破棄
+
+    Args:
+        device_ids (list): デバイスID
+    """
+    devices = discovery.devices
+    removable = [
+        device_id for device_id in device_ids
+        if devices.get(device_id, {}).get('source') == 'push' and devices[device_id]['status'] != 'online'
+    ]
+    for device_id in discovery.remove_devices(removable):
+        device_manager.forget_device(device_id)
+        device_history.discard(device_id)
+        forget_notification_state(device_id)
+    if removable:
+        logger.info(f"休止中のプッシュ型デバイスを削除: {len(removable)}台")
+
+# プッシュ型テレメトリの取り込み
+def ingest_samples(samples, fields, source="push"):
+    """
+    デバイスからプッシュされたサンプルを変化検出・通知のパイプラインに渡す
+
+    Args:
+        samples (list): 重複を除いたサンプルのリスト（api.ingest.decode_samples の形式）
+        fields (dict): デバイス情報に記録する接続先（{"ip": ...} や {"port": ...}）
+        source (str): 値の取得経路（"push" または "serial"）
+
+    Returns:
+        int: 値を更新したデバイス数
+    """
+    current_time = time.time()
+
+    # 記録・履歴・分布には重複を除いたすべてのサンプルを追加し、
+    # 通知には同じデバイスのサンプルのうち最後に届いた最新値だけを適用する
+    # （順序が逆転して届いたサンプルは最新値を上書きしない）
+    latest = {}
+    for sample in samples:
+        record_device_sample(sample['id'], sample['value'], sample['raw'], current_time)
+        if sample.get('order') != 'reordered':
+            latest[sample['id']] = sample
+
+    came_online = discovery.record_push(dict.fromkeys(latest, fields), current_time, source)
+
+    for device_id, sample in latest.items():
+        # タイムスタンプはポーリングと同じくサーバー側の受信時刻を使用
+        value_data = device_manager.ingest_value(device_id, {
+            "value": sample['value'],
+            "raw": sample['raw'],
+            "calibrated": sample['calibrated'],
+            "timestamp": current_time
+        })
+        process_device_value(device_id, value_data, current_time)
+
+    if came_online:
+        sync_device_presence()
+    return len(latest)
+
 # リアルタイムデータ監視タスク
 def realtime_monitor():
     """
@@ -714,177 +2126,63 @@ def realtime_monitor():
     アダプティブ通知戦略とバッチ処理で最適化
     短い間隔（100ms）で実行され、値の変化を即座に検出する
     """
-    global LAST_KNOWN_DEVICE_IDS, LAST_DEVICE_VALUES, LAST_NOTIFICATION_TIMES
+    global LAST_DEVICE_VALUES, LAST_NOTIFICATION_TIMES, PENDING_UPDATES
     
     logger.info("リアルタイム監視タスク開始")
 
     # 一括通知用の変数
     batch_interval = 0.5  # 一括通知間隔（秒）
     last_batch_time = time.time()
-    pending_updates = {}  # 通知待ちの更新 {device_id: value_data}
 
     while True:
         try:
+            tick_started = time.perf_counter()
             current_time = time.time()
 
-            # オンラインデバイスの現在の値を取得
-            devices = discovery.get_devices()
-            online_devices = [d['id'] for d in devices if d['status'] == 'online']
-            current_device_ids = set(online_devices)
-            
-            # デバイス接続/切断の検出
-            connected_devices = current_device_ids - LAST_KNOWN_DEVICE_IDS
-            disconnected_devices = LAST_KNOWN_DEVICE_IDS - current_device_ids
-            
-            # 新規接続デバイスの通知
-            for device_id in connected_devices:
-                device_info = discovery.get_device(device_id)
-                if device_info:
-                    socketio.emit('device_connected', {
-                        'device_id': device_id,
-                        'device_info': device_info
-                    })
-                    logger.info(f"デバイス接続を通知: {device_id}")
-            
-            # 切断デバイスの通知
-            for device_id in disconnected_devices:
-                socketio.emit('device_disconnected', {
-                    'device_id': device_id
-                })
-                logger.info(f"デバイス切断を通知: {device_id}")
-                # 切断されたデバイスの値をクリア
-                if device_id in LAST_DEVICE_VALUES:
-                    del LAST_DEVICE_VALUES[device_id]
-                if device_id in LAST_NOTIFICATION_TIMES:
-                    del LAST_NOTIFICATION_TIMES[device_id]
-            
-            # デバイスIDセットを更新
-            LAST_KNOWN_DEVICE_IDS = current_device_ids.copy()
+            # オンラインデバイスの取得と接続/切断の通知
+            online_devices = sync_device_presence()
 
             # それぞれのデバイスの値をチェック（共通関数を使用）
             for device_id in online_devices:
-                # 値を取得して変更を確認
+                # シミュレーションデバイスは後でまとめて生成する
+                if device_id.startswith(SIM_PREFIX):
+                    continue
+
+                # プッシュ型のデバイスは受信時に変化検出済みのためポーリングしない
+                device_info = discovery.get_device(device_id)
+                if device_info and device_info.get('source') in PUSH_SOURCES:
+                    continue
+
+                # 値を取得して変更を確認（ポーリングにかかった時間も集計）
+                poll_started = time.perf_counter()
                 value_data = device_manager.get_device_value(device_id, use_cache=False)
+                poll_elapsed = time.perf_counter() - poll_started
+                poll_latency.labels(device_id).observe(poll_elapsed)
                 if not value_data:
+                    poll_failures.labels(device_id).inc()
                     continue
+                device_sketches.observe(device_id, 'latency', poll_elapsed, current_time)
 
-                # 初回または値の変化がある場合
-                if device_id not in LAST_DEVICE_VALUES:
-                    # 初回の場合は即時通知（接続時の初期表示のため）
-                    LAST_DEVICE_VALUES[device_id] = value_data.copy()
-                    LAST_NOTIFICATION_TIMES[device_id] = current_time
-                    # 接続時の初期表示は重要なので個別通知
-                    socketio.emit('device_update', {
-                        'device_id': device_id,
-                        'data': value_data
-                    })
-                    logger.debug(f"デバイス {device_id} の初期値を通知: {value_data['value']}")
-                    continue
+                record_device_sample(device_id, value_data['value'], value_data.get('raw'), current_time)
+                process_device_value(device_id, value_data, current_time)
 
-                # 前回の値と時間を取得
-                prev_value = LAST_DEVICE_VALUES[device_id]['value']
-                prev_notification_time = LAST_NOTIFICATION_TIMES.get(device_id, 0)
-                time_since_last_notification = current_time - prev_notification_time
-
-                # 値の変化量を計算
-                value_change = abs(value_data['value'] - prev_value)
-
-                # 通知条件の評価
-                should_notify = False
-
-                # 条件1: 大きな値の変化
-                if value_change >= NOTIFICATION_THRESHOLDS['value_change']:
-                    should_notify = True
-
-                # 条件2: 適度な時間経過かつ値の変化
-                elif time_since_last_notification >= NOTIFICATION_THRESHOLDS['time_threshold'] and value_change > 0:
-                    should_notify = True
-
-                # 条件3: 一定時間以上経過（変化がなくてもハートビートとして通知）
-                elif time_since_last_notification >= NOTIFICATION_THRESHOLDS['force_interval']:
-                    should_notify = True
-
-                # 通知が必要な場合は更新バッファに追加
-                if should_notify:
-                    # 通知時間と値を更新
-                    LAST_DEVICE_VALUES[device_id] = value_data.copy()
-                    LAST_NOTIFICATION_TIMES[device_id] = current_time
-                    # バッチ通知用にバッファに追加
-                    pending_updates[device_id] = value_data
-                else:
-                    # 値は常に更新（次回の変化検出のため）
-                    LAST_DEVICE_VALUES[device_id] = value_data.copy()
-
-            # シミュレーションモードの場合も処理
+            # シミュレーションモードの場合は全デバイスの値をまとめて生成
             if SIMULATION_MODE:
-                # シミュレーション用デバイスを確保（存在しなければ作成）
-                sim_device_ids = [f"sim_{i}" for i in range(1, 4)]  # 3つのシミュレーションデバイス
-
-                for sim_id in sim_device_ids:
-                    # デバイスが存在しなければ作成
-                    is_new = create_or_update_sim_device(sim_id)
-                    if is_new:
-                        # 初回作成時は個別通知（接続時の初期表示のため）
-                        socketio.emit('device_update', {
-                            'device_id': sim_id,
-                            'data': LAST_DEVICE_VALUES[sim_id]
-                        })
-                        continue
-
-                    # シミュレーション値を更新
-                    current_time = time.time()
-                    prev_value = LAST_DEVICE_VALUES[sim_id]["value"]
-                    prev_notification_time = LAST_NOTIFICATION_TIMES.get(sim_id, 0)
-                    time_since_last_notification = current_time - prev_notification_time
-
-                    # シミュレーション値の計算
-                    import random
-                    if random.random() < 0.3:  # 30%の確率で値が変わる
-                        new_value = max(0, min(100, prev_value + random.randint(-10, 10)))
-                    else:
-                        new_value = prev_value
-
-                    new_raw = int(new_value * 10.23)  # 0-100を0-1023に変換
-
-                    # シミュレーションデータを作成
-                    sim_data = {
-                        "value": new_value,
-                        "raw": new_raw,
-                        "timestamp": current_time
-                    }
-
-                    # 値の変化量を計算
-                    value_change = abs(new_value - prev_value)
-
-                    # 通知条件の評価
-                    should_notify = False
-
-                    # 条件1: 大きな値の変化
-                    if value_change >= NOTIFICATION_THRESHOLDS['value_change']:
-                        should_notify = True
-
-                    # 条件2: 適度な時間経過かつ値の変化
-                    elif time_since_last_notification >= NOTIFICATION_THRESHOLDS['time_threshold'] and value_change > 0:
-                        should_notify = True
-
-                    # 条件3: 一定時間以上経過（変化がなくてもハートビートとして通知）
-                    elif time_since_last_notification >= NOTIFICATION_THRESHOLDS['force_interval']:
-                        should_notify = True
-
-                    # 値は常に更新（次回の変化検出のため）
-                    LAST_DEVICE_VALUES[sim_id] = sim_data.copy()
-
-                    # 通知が必要な場合はバッファに追加
-                    if should_notify:
-                        LAST_NOTIFICATION_TIMES[sim_id] = current_time
-                        pending_updates[sim_id] = sim_data
+                simulation_tick(current_time)
 
             # 一定間隔で一括通知（バッファに貯まっている更新を送信）
-            if (current_time - last_batch_time >= batch_interval) and pending_updates:
+            # フレームクロック有効時の更新は検出時にフレームクロックへ直接登録される
+            if (current_time - last_batch_time >= batch_interval) and PENDING_UPDATES:
+                pending_updates, PENDING_UPDATES = PENDING_UPDATES, {}  # バッファを差し替えてから送信
                 batch_notify_changes(pending_updates)
-                pending_updates = {}  # バッファをクリア
                 last_batch_time = current_time
 
+            # 1周期の処理時間を記録（監視間隔を超えた場合は超過として数える）
+            tick_elapsed = time.perf_counter() - tick_started
+            monitor_tick.observe(tick_elapsed)
+            if tick_elapsed > UPDATE_INTERVAL:
+                monitor_overruns.inc()
+
             # 短い間隔で監視（100ms）
             eventlet.sleep(UPDATE_INTERVAL)
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一括取り込み ベンチマーク
+
+LeverAPIを別プロセスで起動し、POST /api/ingest に複数デバイスのサンプルを
+一括送信し続けて、サーバー1コアあたりの取り込みスループットを計測します。
+
+使用例:
+    python tools/bench_ingest.py --devices 100 --batch 1000 --format binary
+    python tools/bench_ingest.py --format json --duration 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import http.client
+
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PARENT_DIR)
+from api.ingest import encode_samples, MAX_RECORDS_PER_PACKET  # noqa: E402
+
+
+def read_cpu_seconds(pid):
+    """プロセスが消費したCPU時間（ユーザー+システム、秒）を取得"""
+    try:
+        import psutil
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except ImportError:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def serve(port):
+    """ベンチマーク用のAPIサーバーを起動（ディスカバリーや監視タスクは起動しない）"""
+    import logging
+    import app as lever_app  # eventlet.monkey_patch() が適用される
+    import eventlet
+    import eventlet.wsgi
+
+    logging.getLogger().setLevel(logging.WARNING)
+    listener = eventlet.listen(("127.0.0.1", port))
+    eventlet.wsgi.server(listener, lever_app.app, log_output=False)
+
+
+def wait_for_server(port, timeout=30.0):
+    """サーバーが応答するまで待機"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1.0)
+            conn.request("GET", "/api/status")
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def build_body(device_ids, seqs, batch, fmt, tick):
+    """デバイスを順番に回してbatch件のサンプルを含むリクエストボディを作成"""
+    samples = []
+    for i in range(batch):
+        device_id = device_ids[i % len(device_ids)]
+        seqs[device_id] += 1
+        value = (tick + i) % 101
+        samples.append({
+            "id": device_id,
+            "seq": seqs[device_id],
+            "ts": tick,
+            "value": value,
+            "raw": value * 10,
+            "calibrated": True
+        })
+
+    if fmt == "json":
+        return json.dumps({"samples": samples}).encode(), "application/json"
+    body = b"".join(
+        encode_samples(samples[i:i + MAX_RECORDS_PER_PACKET])
+        for i in range(0, len(samples), MAX_RECORDS_PER_PACKET)
+    )
+    return body, "application/octet-stream"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LeverAPI 一括取り込みベンチマーク")
+    parser.add_argument("--devices", type=int, default=100, help="デバイス数")
+    parser.add_argument("--batch", type=int, default=1000, help="1リクエストあたりのサンプル数")
+    parser.add_argument("--format", choices=("binary", "json"), default="binary", help="リクエストボディの形式")
+    parser.add_argument("--duration", type=float, default=10.0, help="計測時間（秒）")
+    parser.add_argument("--port", type=int, default=5098, help="サーバーポート")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port)],
+        cwd=PARENT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_server(args.port):
+            print("エラー: ベンチマーク用サーバーが起動しません")
+            sys.exit(1)
+
+        device_ids = [f"gw_lever{i + 1}" for i in range(args.devices)]
+        seqs = dict.fromkeys(device_ids, 0)
+        conn = http.client.HTTPConnection("127.0.0.1", args.port)
+
+        # 初回のデバイス登録と初期値通知は計測から除外する
+        body, content_type = build_body(device_ids, seqs, args.devices, args.format, 0)
+        conn.request("POST", "/api/ingest", body=body, headers={"Content-Type": content_type})
+        conn.getresponse().read()
+
+        requests_sent = samples_sent = accepted = body_bytes = 0
+        cpu_start = read_cpu_seconds(server.pid)
+        started = time.time()
+        tick = 1
+        while time.time() - started < args.duration:
+            body, content_type = build_body(device_ids, seqs, args.batch, args.format, tick)
+            conn.request("POST", "/api/ingest", body=body, headers={"Content-Type": content_type})
+            response = conn.getresponse()
+            result = json.loads(response.read())
+            if response.status != 200:
+                print(f"エラー: {result}")
+                sys.exit(1)
+            requests_sent += 1
+            samples_sent += args.batch
+            accepted += result["data"]["accepted"]
+            body_bytes += len(body)
+            tick += 1
+        elapsed = time.time() - started
+        cpu_used = read_cpu_seconds(server.pid) - cpu_start
+        conn.close()
+
+        print("==== 一括取り込みベンチマーク結果 ====")
+        print(f"形式:                   {args.format}")
+        print(f"デバイス数:             {args.devices}")
+        print(f"1リクエストのサンプル数: {args.batch}")
+        print(f"リクエスト数:           {requests_sent} ({requests_sent / elapsed:.0f}件/秒)")
+        print(f"送信サンプル数:         {samples_sent} (受理 {accepted})")
+        print(f"送信バイト数:           {body_bytes / 1024 / 1024:.1f}MiB ({body_bytes / max(1, samples_sent):.1f}バイト/サンプル)")
+        print(f"スループット:           {samples_sent / elapsed:.0f}サンプル/秒")
+        print(f"サーバーCPU時間:        {cpu_used:.2f}秒 ({cpu_used / elapsed * 100:.0f}%)")
+        print(f"1コアあたり:            {samples_sent / max(cpu_used, 1e-9):.0f}サンプル/CPU秒")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
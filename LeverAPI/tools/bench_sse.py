@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSEストリーム ベンチマーク
+
+LeverAPIを別プロセスで起動し、多数の /api/stream 接続を同時に張って
+接続あたりのメモリ使用量とイベント配信数を計測します。
+
+使用例:
+    python tools/bench_sse.py --connections 500 --duration 10
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import selectors
+import subprocess
+
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_rss(pid):
+    """プロセスの常駐メモリ量（バイト）を取得"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    return 0
+
+
+def serve(port, devices, rate, max_connections):
+    """ベンチマーク用のAPIサーバーを起動し、合成データを一定周期で通知する"""
+    sys.path.insert(0, PARENT_DIR)
+    import logging
+    import app as lever_app  # eventlet.monkey_patch() が適用される
+    import eventlet
+    import eventlet.wsgi
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def publisher():
+        value = 0
+        while True:
+            value = (value + 1) % 101
+            now = time.time()
+            lever_app.batch_notify_changes({
+                f"bench_{i}": {"device_id": f"bench_{i}", "value": value, "raw": value * 10, "timestamp": now}
+                for i in range(devices)
+            })
+            eventlet.sleep(1.0 / rate)
+
+    eventlet.spawn(publisher)
+    listener = eventlet.listen(("127.0.0.1", port), backlog=max_connections)
+    eventlet.wsgi.server(listener, lever_app.app, log_output=False, max_size=max_connections + 64)
+
+
+def wait_for_server(port, timeout=30.0):
+    """サーバーが接続を受け付けるまで待機"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def open_streams(port, count, query):
+    """SSE接続を開く"""
+    request = (f"GET /api/stream{query} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+               "Accept: text/event-stream\r\n\r\n").encode()
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(request)
+        sock.setblocking(False)
+        sockets.append(sock)
+    return sockets
+
+
+def drain(sockets, duration):
+    """指定時間SSEストリームを読み続け、受信イベント数とバイト数を返す"""
+    selector = selectors.DefaultSelector()
+    for sock in sockets:
+        selector.register(sock, selectors.EVENT_READ)
+
+    events = 0
+    received = 0
+    end = time.time() + duration
+    while time.time() < end:
+        for key, _ in selector.select(timeout=0.1):
+            try:
+                chunk = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            received += len(chunk)
+            events += chunk.count(b"\nevent: ")
+    selector.close()
+    return events, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LeverAPI SSEストリーム ベンチマーク")
+    parser.add_argument("--connections", type=int, default=500, help="同時接続数")
+    parser.add_argument("--duration", type=float, default=10.0, help="計測時間（秒）")
+    parser.add_argument("--devices", type=int, default=6, help="合成デバイス数")
+    parser.add_argument("--rate", type=float, default=10.0, help="通知周期（Hz）")
+    parser.add_argument("--port", type=int, default=5099, help="サーバーポート")
+    parser.add_argument("--query", default="", help="ストリームのクエリ文字列（例: ?devices=bench_0）")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.devices, args.rate, args.connections)
+        return
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve",
+         "--port", str(args.port), "--devices", str(args.devices),
+         "--rate", str(args.rate), "--connections", str(args.connections)],
+        cwd=PARENT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_server(args.port):
+            print("エラー: ベンチマーク用サーバーが起動しません")
+            sys.exit(1)
+
+        time.sleep(1.0)
+        baseline = read_rss(server.pid)
+        sockets = open_streams(args.port, args.connections, args.query)
+        events, received = drain(sockets, args.duration)
+        loaded = read_rss(server.pid)
+
+        for sock in sockets:
+            sock.close()
+
+        per_connection = (loaded - baseline) / max(1, args.connections)
+        print("==== SSEベンチマーク結果 ====")
+        print(f"同時接続数:           {args.connections}")
+        print(f"計測時間:             {args.duration:.1f}秒")
+        print(f"受信イベント数:       {events} ({events / args.duration:.0f}件/秒)")
+        print(f"接続あたり受信:       {events / max(1, args.connections):.1f}件")
+        print(f"受信バイト数:         {received / 1024:.1f}KiB")
+        print(f"サーバーRSS(接続前):  {baseline / 1024 / 1024:.1f}MiB")
+        print(f"サーバーRSS(接続中):  {loaded / 1024 / 1024:.1f}MiB")
+        print(f"接続あたりメモリ:     {per_connection / 1024:.1f}KiB")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
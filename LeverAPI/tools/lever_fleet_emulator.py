@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+レバー フリート エミュレーター
+
+1つのasyncioプロセスで多数（1000台以上）のレバーデバイスを起動し、
+LeverAPIの実際のポーリング経路とディスカバリー経路の負荷試験に使用します。
+
+各レバーはファームウェアと同じ形式で以下に応答します:
+    GET /api                    センサーデータ
+    GET /api/resetCalib         キャリブレーションリセット
+    GET /api/setLedMode?mode=N  LED表示モード設定
+    UDP DISCOVER_LEVER          ディスカバリー応答
+
+全デバイスが同じホストを共有するため、HTTPはデバイスごとに別のポートで待ち受け、
+ディスカバリー応答に "http_port" を含めます（LeverAPIは応答の送信元IPとこのポートでポーリングします）。
+ブロードキャストはループバック以外のインターフェース経由で届くことがあるため、
+既定では全アドレスで待ち受けます。
+
+使用例:
+    python tools/lever_fleet_emulator.py --devices 1000 --latency 5 --jitter 20 --loss 0.01
+    # LeverAPI側: LEVER_SWEEP_CIDRS=127.0.0.1/32 python app.py
+    #   （ブロードキャストがループバックに届かない環境ではユニキャストスイープで検出）
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+# 設定
+DISCOVERY_PORT = 4210  # LeverAPI の UDP_PORT と同じ
+DISCOVERY_TOKEN = b"DISCOVER_LEVER"
+BASE_HTTP_PORT = 18000  # 1台目のHTTPポート（以降連番）
+MAX_REQUEST_HEADER = 8192  # リクエストヘッダーの最大サイズ（バイト）
+REPORT_INTERVAL = 5.0  # 統計表示の間隔（秒）
+MOTIONS = ("sine", "walk", "step", "sweep", "noise", "still")
+
+
+class FleetLever:
+    """1台分のレバーの状態と値の動き"""
+
+    def __init__(self, device_id, http_port, motion, rng, period):
+        """
+        初期化
+
+        Args:
+            device_id (str): デバイスID
+            http_port (int): HTTPの待ち受けポート
+            motion (str): 値の動き（MOTIONSのいずれか）
+            rng (random.Random): このデバイス用の乱数生成器
+            period (float): 値の動きの周期（秒）
+        """
+        self.device_id = device_id
+        self.http_port = http_port
+        self.motion = motion
+        self.rng = rng
+        self.period = period
+        self.phase = rng.random()
+        self.started = time.monotonic()
+        self.calib_min = 0
+        self.calib_max = 1023
+        self.calibrated = True
+        self.led_mode = 0
+        self.value = rng.uniform(0, 100)  # walk/step/noise の現在値
+        self.last_update = self.started
+        self.next_step = self.started
+
+    def current_value(self, now):
+        """
+        現在のレバー値（0-100）を計算
+
+        Args:
+            now (float): time.monotonic() の値
+
+        Returns:
+            float: レバー値
+        """
+        t = (now - self.started) / self.period + self.phase
+        if self.motion == "sine":
+            return 50 + 50 * math.sin(2 * math.pi * t)
+        if self.motion == "sweep":
+            return 100 * abs(2 * (t % 1.0) - 1)  # 0→100→0 の三角波
+        if self.motion == "walk":
+            # 経過時間に比例した分散でランダムウォーク（ポーリング間隔に依存しない）
+            elapsed = now - self.last_update
+            self.last_update = now
+            self.value += self.rng.gauss(0, 15 * math.sqrt(elapsed / self.period))
+        elif self.motion == "step":
+            if now >= self.next_step:
+                self.value = self.rng.choice((0, 25, 50, 75, 100))
+                self.next_step = now + self.rng.expovariate(1 / self.period)
+        elif self.motion == "noise":
+            return min(100.0, max(0.0, self.value + self.rng.gauss(0, 2)))
+        self.value = min(100.0, max(0.0, self.value))
+        return self.value
+
+    def api_response(self, now):
+        """ApiController::handleApiRoot と同じ形式のセンサーデータ"""
+        value = int(round(self.current_value(now)))
+        raw = int(self.calib_min + (self.calib_max - self.calib_min) * value / 100)
+        return {
+            "device_id": self.device_id,
+            "timestamp": int(now - self.started),  # millis() / 1000 相当
+            "data": {
+                "raw": raw,
+                "value": value,
+                "calibrated": self.calibrated,
+                "calib_min": self.calib_min,
+                "calib_max": self.calib_max
+            },
+            "status": {"error_code": 0}
+        }
+
+    def discovery_response(self, host):
+        """RealWiFiManager::createDiscoveryResponse にHTTPポートを加えた応答（LeverAPIはipより送信元IPを優先）"""
+        return json.dumps({
+            "type": "lever",
+            "id": self.device_id,
+            "ip": host,
+            "http_port": self.http_port
+        }, separators=(",", ":")).encode()
+
+
+class Fleet:
+    """全レバーのHTTPサーバーとディスカバリー応答を管理するクラス"""
+
+    def __init__(self, levers, host, latency=0.0, jitter=0.0, loss=0.0, hang=3.0, seed=None):
+        """
+        初期化
+
+        Args:
+            levers (list): FleetLever のリスト
+            host (str): 待ち受けアドレス
+            latency (float): 応答までの基本遅延（秒）
+            jitter (float): 遅延に加えるゆらぎの最大値（秒）
+            loss (float): 応答しない確率（HTTPは接続を保持したまま応答せず、UDPは破棄）
+            hang (float): HTTPで応答しない場合に接続を保持する時間（秒、LeverAPIの読み取りタイムアウトより長く）
+            seed (int, optional): 遅延・ロス用の乱数シード
+        """
+        self.levers = levers
+        self.host = host
+        self.advertised_ip = "127.0.0.1" if host in ("", "0.0.0.0") else host
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.hang = hang
+        self.rng = random.Random(seed)
+        self.servers = []
+        self.transport = None
+        self.stats = {
+            "http_requests": 0,
+            "http_dropped": 0,
+            "http_errors": 0,
+            "discovery_requests": 0,
+            "discovery_replies": 0,
+            "discovery_dropped": 0
+        }
+
+    def response_delay(self):
+        """遅延プロファイルに従った応答遅延（秒）"""
+        return self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def is_lost(self):
+        """この応答を失うかどうか"""
+        return self.loss > 0 and self.rng.random() < self.loss
+
+    async def start(self, discovery_port):
+        """全デバイスのHTTPサーバーとディスカバリー応答を開始"""
+        loop = asyncio.get_running_loop()
+        for lever in self.levers:
+            server = await asyncio.start_server(
+                lambda reader, writer, lever=lever: self.handle_http(lever, reader, writer),
+                self.host, lever.http_port, reuse_address=True
+            )
+            self.servers.append(server)
+
+        if discovery_port:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            sock.bind(("", discovery_port))  # ブロードキャストを受信するため全アドレスで待ち受け
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: DiscoveryProtocol(self), sock=sock
+            )
+
+    def close(self):
+        """全サーバーを停止"""
+        for server in self.servers:
+            server.close()
+        if self.transport:
+            self.transport.close()
+
+    def on_discovery(self, addr):
+        """DISCOVER_LEVER を受信した時に全デバイス分の応答を遅延付きで送信"""
+        self.stats["discovery_requests"] += 1
+        loop = asyncio.get_running_loop()
+        for lever in self.levers:
+            if self.is_lost():
+                self.stats["discovery_dropped"] += 1
+                continue
+            loop.call_later(self.response_delay(), self._send_discovery, lever.discovery_response(self.advertised_ip), addr)
+
+    def _send_discovery(self, payload, addr):
+        if self.transport is None or self.transport.is_closing():
+            return
+        self.transport.sendto(payload, addr)
+        self.stats["discovery_replies"] += 1
+
+    async def handle_http(self, lever, reader, writer):
+        """1接続分のHTTPリクエストを処理（Keep-Alive対応）"""
+        try:
+            while True:
+                try:
+                    header = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    self.stats["http_errors"] += 1
+                    break
+                if len(header) > MAX_REQUEST_HEADER:
+                    self.stats["http_errors"] += 1
+                    break
+
+                lines = header.decode("latin-1").split("\r\n")
+                parts = lines[0].split()
+                if len(parts) < 2:
+                    self.stats["http_errors"] += 1
+                    break
+                keep_alive = not any(
+                    line.lower().startswith("connection:") and "close" in line.lower() for line in lines[1:]
+                ) and parts[-1] != "HTTP/1.0"
+
+                self.stats["http_requests"] += 1
+                if self.is_lost():
+                    # 無線区間で応答が失われた状態を再現（クライアントのタイムアウトまで待たせる）
+                    self.stats["http_dropped"] += 1
+                    await asyncio.sleep(self.hang)
+                    break
+
+                delay = self.response_delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                status, content_type, body = self.route(lever, parts[0], parts[1])
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError):
+            self.stats["http_errors"] += 1
+        finally:
+            writer.close()
+
+    def route(self, lever, method, target):
+        """
+        リクエストをファームウェアのエンドポイントに振り分け
+
+        Returns:
+            tuple: (ステータス行, Content-Type, 本文)
+        """
+        url = urlsplit(target)
+        path = url.path
+        if method != "GET":
+            return "405 Method Not Allowed", "text/plain", b"Method Not Allowed"
+        if path == "/":
+            return "200 OK", "text/plain", b"Pedantic Lever Controller"
+
+        if path in ("/api", "/api/"):
+            result = lever.api_response(time.monotonic())
+        elif path in ("/api/resetCalib", "/api/reset"):
+            lever.calib_min, lever.calib_max, lever.calibrated = 0, 1023, False
+            result = {"status": "success", "message": "Calibration reset"}
+        elif path == "/api/setLedMode" and "mode" in parse_qs(url.query):
+            try:
+                mode = int(parse_qs(url.query)["mode"][0])
+            except ValueError:
+                mode = 0  # String::toInt() と同じく数値でなければ0
+            if 0 <= mode <= 6:
+                lever.led_mode = mode
+            result = {"status": "success", "message": f"LED mode set to {mode}"}
+        elif path.startswith("/api"):
+            result = {"status": "error", "message": "Unknown API endpoint"}
+        else:
+            return "404 Not Found", "text/plain", b"Not Found"
+        return "200 OK", "application/json", json.dumps(result, separators=(",", ":")).encode()
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """UDPディスカバリー要求の受信"""
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+
+    def datagram_received(self, data, addr):
+        if data.strip() == DISCOVERY_TOKEN:
+            self.fleet.on_discovery(addr)
+
+
+def build_levers(args):
+    """引数に従ってレバーを生成"""
+    rng = random.Random(args.seed)
+    motions = args.motion.split(",")
+    levers = []
+    for i in range(args.devices):
+        levers.append(FleetLever(
+            f"{args.prefix}{i + 1}",
+            args.base_port + i,
+            motions[i % len(motions)],
+            random.Random(rng.random()),
+            period=rng.uniform(args.period * 0.5, args.period * 1.5)
+        ))
+    return levers
+
+
+async def report_loop(fleet, interval):
+    """一定間隔でリクエスト数を表示"""
+    previous = dict(fleet.stats)
+    while True:
+        await asyncio.sleep(interval)
+        current = dict(fleet.stats)
+        rate = (current["http_requests"] - previous["http_requests"]) / interval
+        print(f"HTTP {rate:.0f}件/秒 (累計 {current['http_requests']}, 応答なし {current['http_dropped']}, "
+              f"エラー {current['http_errors']})  ディスカバリー 要求 {current['discovery_requests']} "
+              f"応答 {current['discovery_replies']} 破棄 {current['discovery_dropped']}")
+        previous = current
+
+
+async def run(args):
+    levers = build_levers(args)
+    fleet = Fleet(levers, args.host, args.latency / 1000, args.jitter / 1000, args.loss, args.hang, args.seed)
+    try:
+        await fleet.start(args.discovery_port)
+    except OSError as e:
+        print(f"エラー: 待ち受けを開始できません: {e}")
+        fleet.close()
+        return 1
+
+    print(f"{len(levers)}台のレバーを起動: http://{fleet.advertised_ip}:{args.base_port}-{args.base_port + len(levers) - 1}/api, "
+          f"ディスカバリー UDP {args.discovery_port or '無効'} (Ctrl+Cで停止)")
+    reporter = asyncio.create_task(report_loop(fleet, args.report)) if args.report > 0 else None
+    try:
+        if args.duration:
+            await asyncio.sleep(args.duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        if reporter:
+            reporter.cancel()
+        fleet.close()
+        print(f"統計: {json.dumps(fleet.stats, ensure_ascii=False)}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レバー フリート エミュレーター（負荷試験用）")
+    parser.add_argument("--devices", type=int, default=100, help="エミュレートするデバイス数")
+    parser.add_argument("--prefix", default="fleet_lever", help="デバイスIDの接頭辞（末尾に番号を付与）")
+    parser.add_argument("--host", default="0.0.0.0", help="HTTPの待ち受けアドレス")
+    parser.add_argument("--base-port", type=int, default=BASE_HTTP_PORT, help="1台目のHTTPポート（以降連番）")
+    parser.add_argument("--discovery-port", type=int, default=DISCOVERY_PORT, help="ディスカバリーの待ち受けポート（0で無効）")
+    parser.add_argument("--latency", type=float, default=0.0, help="応答までの基本遅延（ミリ秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延に加えるゆらぎの最大値（ミリ秒）")
+    parser.add_argument("--loss", type=float, default=0.0, help="応答しない確率（HTTP・ディスカバリー共通）")
+    parser.add_argument("--hang", type=float, default=3.0, help="HTTPで応答しない場合に接続を保持する時間（秒）")
+    parser.add_argument("--motion", default="sine", help=f"値の動き（{'/'.join(MOTIONS)}、カンマ区切りで順に割り当て）")
+    parser.add_argument("--period", type=float, default=6.0, help="値の動きの平均周期（秒）")
+    parser.add_argument("--duration", type=float, default=0, help="実行時間（秒、0で無制限）")
+    parser.add_argument("--report", type=float, default=REPORT_INTERVAL, help="統計表示の間隔（秒、0で表示しない）")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    args = parser.parse_args()
+
+    unknown = [motion for motion in args.motion.split(",") if motion not in MOTIONS]
+    if unknown:
+        parser.error(f"不明な動き: {', '.join(unknown)}（{'/'.join(MOTIONS)}）")
+    if args.base_port + args.devices - 1 > 65535:
+        parser.error("HTTPポートが65535を超えます（--base-port または --devices を小さくしてください）")
+
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+セッションログ 列形式変換ツール
+
+positionVisualizer のJSONログ（[{"id", "value", "ts"}, ...]）と列形式ログ（.lvc）を相互に変換します。
+JSONログは逐次解析するため、長時間のログでもメモリ使用量は一定です。
+
+使用例:
+    python tools/log_columnar.py to-columnar ../positionVisualizer/logs/meter-log-simulated-30s.json --compress
+    python tools/log_columnar.py to-json session.lvc session.json
+    python tools/log_columnar.py info session.lvc
+"""
+
+import os
+import sys
+import time
+import argparse
+
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PARENT_DIR)
+from api.columnar import (  # noqa: E402
+    COLUMNAR_SUFFIX, convert_log, load_columnar, read_columnar_meta, write_legacy_json
+)
+from api.replay import LogFormatError  # noqa: E402
+
+
+def replace_suffix(path, suffix):
+    """拡張子を置き換えた出力先のパス"""
+    return os.path.splitext(path)[0] + suffix
+
+
+def to_columnar(args):
+    """JSONログを列形式に変換"""
+    dst = args.output or replace_suffix(args.input, COLUMNAR_SUFFIX)
+    started = time.perf_counter()
+    result = convert_log(args.input, dst, compress=args.compress)
+    elapsed = time.perf_counter() - started
+
+    ratio = result["size"] / result["source_size"] if result["source_size"] else 0
+    print(f"変換完了: {dst}")
+    print(f"  レコード数: {result['records']} （{result['devices']}デバイス、読み飛ばし {result['skipped']}件）")
+    print(f"  サイズ: {result['source_size']:,} -> {result['size']:,} バイト ({ratio:.1%})")
+    print(f"  変換時間: {elapsed:.2f}秒")
+
+
+def to_json(args):
+    """列形式ログをJSONログに戻す"""
+    dst = args.output or replace_suffix(args.input, ".json")
+    started = time.perf_counter()
+    count = write_legacy_json(args.input, dst, indent=args.indent)
+    print(f"変換完了: {dst} （{count}レコード, {time.perf_counter() - started:.2f}秒）")
+
+
+def info(args):
+    """列形式ログの内容を表示"""
+    meta = read_columnar_meta(args.input)
+    started = time.perf_counter()
+    columns = load_columnar(args.input)
+    elapsed = time.perf_counter() - started
+
+    print(f"ファイル: {args.input} ({os.path.getsize(args.input):,} バイト)")
+    print(f"  変換元: {meta.get('source')}")
+    print(f"  レコード数: {meta['records']}")
+    print(f"  読み込み時間: {elapsed * 1000:.1f}ミリ秒")
+    for log_id, (ts, values) in columns.items():
+        if len(ts):
+            print(f"  id={log_id}: {len(ts)}件, ts {ts.min()}-{ts.max()} ms, "
+                  f"値 {values.min()}-{values.max()} (平均 {values.mean():.1f}), 型 {ts.dtype}/{values.dtype}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="セッションログ 列形式変換ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("to-columnar", help="JSONログを列形式（.lvc）に変換")
+    p.add_argument("input", help="変換元のJSONログ")
+    p.add_argument("output", nargs="?", help="出力先（省略時は拡張子を .lvc に変更）")
+    p.add_argument("--compress", action="store_true", help="Deflateで圧縮する")
+    p.set_defaults(func=to_columnar)
+
+    p = subparsers.add_parser("to-json", help="列形式ログをJSONログに戻す")
+    p.add_argument("input", help="変換元の列形式ログ")
+    p.add_argument("output", nargs="?", help="出力先（省略時は拡張子を .json に変更）")
+    p.add_argument("--indent", type=int, default=2, help="インデント幅（0で改行なし、既定はgenerate-log.jsと同じ2）")
+    p.set_defaults(func=to_json)
+
+    p = subparsers.add_parser("info", help="列形式ログの内容を表示")
+    p.add_argument("input", help="列形式ログ")
+    p.set_defaults(func=info)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except (LogFormatError, OSError) as e:
+        print(f"エラー: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+シリアル接続レバー エミュレーター
+
+疑似端末（pty）上でファームウェアのシリアルプロトコルを応答し、
+実機なしでシリアル接続デバイスソースやファームウェアのテストハーネスを試せるようにします（Linux/macOS）。
+応答の形式（タイムスタンプは起動からの秒数）とコマンドの応答文は Communication.cpp に合わせています。
+
+使用例:
+    python tools/serial_lever_emulator.py --device-id serial_lever1
+    # 表示されたポート（/dev/pts/N など）を LEVER_SERIAL_PORTS または POST /api/serial/ports に指定
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import tty
+import random
+import argparse
+import threading
+
+# ファームウェアが起動時に出力するログ行（LeverFirmware.ino / Communication.cpp と同じ内容、JSON以外の行が混在することの再現）
+BOOT_LINES = [
+    "",
+    "=== Pedantic Lever Controller ===",
+    "Firmware version 1.0.0",
+    "Mode: SIMULATION",
+    "通信機能初期化",
+    "利用可能なコマンド:",
+    "  GET_DATA - センサーデータ取得",
+    "  RESET_CALIB - キャリブレーションリセット",
+    "  SET_ID:xxxx - デバイスID設定",
+]
+
+
+class FakeSerialLever:
+    """ptyの親側でファームウェアのシリアルコマンドに応答するエミュレーター"""
+
+    def __init__(self, device_id="serial_lever1", baudrate=115200, period=5.0, response_delay=0.0,
+                 jitter=0.0, noise=0.0, log_interval=0.0):
+        """
+        初期化
+
+        Args:
+            device_id (str): 応答に含めるデバイスID
+            baudrate (int): 伝送時間を再現するボーレート（0で無制限）
+            period (float): 値が一往復する周期（秒）
+            response_delay (float): コマンド処理の遅延（秒）
+            jitter (float): コマンド処理時間のゆらぎの最大値（秒、loop()の周期のばらつきを再現）
+            noise (float): 生値に加えるノイズの最大値
+            log_interval (float): JSON以外のログ行を出力する間隔（秒、0で出力しない）
+        """
+        self.device_id = device_id
+        self.baudrate = baudrate
+        self.period = period
+        self.response_delay = response_delay
+        self.jitter = jitter
+        self.noise = noise
+        self.log_interval = log_interval
+        self.calib_min = 0
+        self.calib_max = 1023
+        self.calibrated = True
+        self.commands = 0
+        self.started = time.time()
+        self.write_lock = threading.Lock()  # 応答とログ行の書き込みの直列化用
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """応答スレッドを開始"""
+        self._running = True
+        self._write_lines(BOOT_LINES)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if self.log_interval > 0:
+            threading.Thread(target=self._log_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        """応答スレッドを停止"""
+        self._running = False
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _write_lines(self, lines):
+        """改行付きで書き込み、ボーレートに応じた伝送時間だけ待つ"""
+        data = "".join(line + "\r\n" for line in lines).encode("utf-8")
+        with self.write_lock:
+            os.write(self.master, data)
+            if self.baudrate:
+                time.sleep(len(data) * 10 / self.baudrate)  # 8N1: 1バイト10ビット
+
+    def _sensor_raw(self):
+        """センサーの生値（周期的に往復する波形にノイズを加えたもの）"""
+        t = time.time() - self.started
+        raw = 511.5 + 511.5 * math.sin(2 * math.pi * t / self.period)
+        if self.noise:
+            raw += random.uniform(-self.noise, self.noise)
+        return max(0, min(1023, int(round(raw))))
+
+    def _data_response(self):
+        """Communication::sendData と同じ形式のデータ応答"""
+        raw = self._sensor_raw()
+        span = max(1, self.calib_max - self.calib_min)
+        value = max(0, min(100, int(100 * (raw - self.calib_min) / span)))
+        return json.dumps({
+            "device_id": self.device_id,
+            "timestamp": int(time.time() - self.started),  # getTimestamp() と同じく起動からの秒数
+            "data": {
+                "raw": raw,
+                "smoothed": raw,
+                "value": value,
+                "calibrated": self.calibrated,
+                "calib_min": self.calib_min,
+                "calib_max": self.calib_max
+            },
+            "status": {"error_code": 0}
+        }, ensure_ascii=False, separators=(",", ":"))
+
+    def handle_command(self, command):
+        """
+        1コマンド分の応答行を返す
+
+        Args:
+            command (str): 受信したコマンド
+
+        Returns:
+            str: 応答行
+        """
+        self.commands += 1
+        if command == "GET_DATA":
+            return self._data_response()
+        if command == "RESET_CALIB":
+            self.calib_min, self.calib_max = 0, 1023
+            return '{"status":"OK","message":"Calibration reset"}'
+        if command.startswith("SET_ID:"):
+            self.device_id = command[7:]
+            return '{"status":"OK","message":"ID set to ' + self.device_id + '"}'
+        return '{"status":"ERROR","message":"Unknown command: ' + command + '"}'
+
+    def _run(self):
+        """コマンドを1行ずつ処理するループ"""
+        buffer = b""
+        while self._running:
+            try:
+                chunk = os.read(self.master, 1024)
+            except OSError:
+                break
+            if not chunk:
+                break
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.decode("utf-8", errors="replace").strip()
+                if not command:
+                    continue
+                delay = self.response_delay + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+                try:
+                    self._write_lines([self.handle_command(command)])
+                except OSError:
+                    return
+
+    def _log_loop(self):
+        """LED表示などのログ行を定期的に出力"""
+        while self._running:
+            time.sleep(self.log_interval)
+            try:
+                self._write_lines([f"LED表示 [*****-----] 値: {self._sensor_raw() * 100 // 1023}"])
+            except OSError:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シリアル接続レバー エミュレーター（pty）")
+    parser.add_argument("--device-id", default="serial_lever1", help="応答に含めるデバイスID")
+    parser.add_argument("--baud", type=int, default=115200, help="伝送時間を再現するボーレート（0で無制限）")
+    parser.add_argument("--period", type=float, default=5.0, help="値が一往復する周期（秒）")
+    parser.add_argument("--delay", type=float, default=0.0, help="コマンド処理の遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="コマンド処理時間のゆらぎ（秒）")
+    parser.add_argument("--noise", type=float, default=0.0, help="生値に加えるノイズの最大値")
+    parser.add_argument("--log-interval", type=float, default=0.0, help="ログ行を出力する間隔（秒）")
+    args = parser.parse_args()
+
+    if sys.platform.startswith("win"):
+        print("エラー: このエミュレーターはLinux/macOSのptyが必要です")
+        sys.exit(1)
+
+    lever = FakeSerialLever(args.device_id, args.baud, args.period, args.delay,
+                            args.jitter, args.noise, args.log_interval).start()
+    print(f"エミュレーター起動: {lever.port} (デバイスID: {args.device_id})")
+    print("Ctrl+Cで停止")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lever.stop()
+        print(f"処理したコマンド数: {lever.commands}")
+
+
+if __name__ == "__main__":
+    main()
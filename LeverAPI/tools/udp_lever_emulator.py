@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UDPプッシュ型レバー エミュレーター
+
+実機なしでUDPテレメトリ受信を試すため、複数のレバーデバイスとして
+シーケンス番号・タイムスタンプ付きの値パケットをLeverAPIへ送信します。
+パケットロス・重複・順序逆転を意図的に発生させることもできます。
+
+使用例:
+    python tools/udp_lever_emulator.py --devices 6 --rate 50
+    python tools/udp_lever_emulator.py --devices 100 --gateway --loss 0.05 --reorder 0.02
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import socket
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.ingest import encode_samples, INGEST_PORT, MAX_RECORDS_PER_PACKET, SEQ_MODULO  # noqa: E402
+
+
+class EmulatedLever:
+    """1台分のレバーの状態"""
+
+    def __init__(self, device_id, period):
+        self.device_id = device_id
+        self.seq = random.randrange(SEQ_MODULO)  # 実機の再起動直後を想定して任意の値から開始
+        self.period = period
+        self.phase = random.random() * 2 * math.pi
+        self.started = time.time()
+
+    def sample(self, now):
+        """現在の値を1サンプル生成"""
+        value = int(round(50 + 50 * math.sin(2 * math.pi * now / self.period + self.phase)))
+        self.seq = (self.seq + 1) % SEQ_MODULO
+        return {
+            "id": self.device_id,
+            "seq": self.seq,
+            "ts": int((now - self.started) * 1000),  # 起動からのミリ秒（実機のmillis()相当）
+            "value": value,
+            "raw": int(value * 10.23),
+            "calibrated": True
+        }
+
+
+def build_packets(samples, gateway):
+    """サンプルを送信パケットにまとめる"""
+    if not gateway:
+        return [encode_samples([sample]) for sample in samples]
+    return [
+        encode_samples(samples[i:i + MAX_RECORDS_PER_PACKET])
+        for i in range(0, len(samples), MAX_RECORDS_PER_PACKET)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UDPプッシュ型レバー エミュレーター")
+    parser.add_argument("--host", default="127.0.0.1", help="LeverAPIのホスト")
+    parser.add_argument("--port", type=int, default=INGEST_PORT, help="UDPテレメトリの受信ポート")
+    parser.add_argument("--devices", type=int, default=6, help="エミュレートするデバイス数")
+    parser.add_argument("--prefix", default="udp_lever", help="デバイスIDの接頭辞（末尾に番号を付与）")
+    parser.add_argument("--rate", type=float, default=20.0, help="デバイスあたりの送信周期（Hz）")
+    parser.add_argument("--duration", type=float, default=0, help="送信時間（秒、0で無制限）")
+    parser.add_argument("--gateway", action="store_true", help="全デバイスのサンプルを1パケットにまとめて送信")
+    parser.add_argument("--loss", type=float, default=0.0, help="パケットを送信しない確率")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="パケットを重複送信する確率")
+    parser.add_argument("--reorder", type=float, default=0.0, help="パケットを次の周期まで遅らせる確率")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    levers = [EmulatedLever(f"{args.prefix}{i + 1}", period=random.uniform(3.0, 8.0)) for i in range(args.devices)]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = (args.host, args.port)
+
+    interval = 1.0 / args.rate
+    started = time.time()
+    next_tick = started
+    delayed = []
+    sent = dropped = duplicated = reordered = 0
+
+    print(f"{len(levers)}台のレバーとして {args.host}:{args.port} へ {args.rate:.0f}Hz で送信中 (Ctrl+Cで停止)")
+    try:
+        while not args.duration or time.time() - started < args.duration:
+            now = time.time()
+            packets = build_packets([lever.sample(now) for lever in levers], args.gateway)
+
+            # 前の周期で遅らせたパケットを、新しいパケットより後に送る
+            outgoing, late, delayed = [], delayed, []
+            for packet in packets:
+                roll = random.random()
+                if roll < args.loss:
+                    dropped += 1
+                elif roll < args.loss + args.reorder:
+                    delayed.append(packet)
+                    reordered += 1
+                else:
+                    outgoing.append(packet)
+                    if random.random() < args.duplicate:
+                        outgoing.append(packet)
+                        duplicated += 1
+            outgoing.extend(late)
+
+            for packet in outgoing:
+                sock.sendto(packet, target)
+            sent += len(outgoing)
+
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.time()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+    elapsed = time.time() - started
+    print(f"送信パケット数: {sent} ({sent / max(elapsed, 1e-9):.0f}件/秒)")
+    print(f"破棄: {dropped}  重複: {duplicated}  順序逆転: {reordered}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,10 @@
 
 レバー制御ファームウェアのシリアル通信テスト用ツール。
 コマンド送信と応答確認、自動テストを実行できます。
+
+受信はバックグラウンドのスレッドで行い、JSON行を解析して送信済みのコマンドと
+対応付けます。応答を待たずに複数のコマンドを送信（パイプライン化）できるため、
+応答時間の計測や高頻度のデータ取得でもリンクの速度を使い切れます。
 """
 
 import serial
@@ -15,44 +19,282 @@ import os
 import sys
 import datetime
 import csv
+import queue
+import struct
+import bisect
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+DEFAULT_TIMEOUT = 1.0  # 応答待ちのタイムアウト（秒）
+STALE_AFTER = 5.0  # タイムアウト後も遅れた応答を受け止めるために待つ時間（秒）
+
+# キャプチャのバイナリ形式（リトルエンディアン）:
+#   受信時刻(double), 応答時間(float, 秒), デバイス時刻(uint32, ms), 生値(uint16), 平滑化値(uint16), 値(int16), キャリブレーション済み(uint8)
+CAPTURE_MAGIC = b"LVCAP1\n"
+CAPTURE_RECORD = struct.Struct("<dfIHHhB")
+CAPTURE_FIELDS = ['host_time', 'latency_ms', 'device_id', 'device_time', 'raw', 'smoothed', 'value', 'calibrated']
+
+# 応答時間ヒストグラムのバケット上限（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+class LatencyStats:
+    """応答時間を記録してパーセンタイルとヒストグラムを求めるクラス"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.samples = []  # 計測値（秒、集計時にまとめてソート）
+        self._sorted = True
+
+    @classmethod
+    def combine(cls, stats_list):
+        """
+        複数の計測結果をまとめた集計用のインスタンスを作成
+
+        Args:
+            stats_list (list): LatencyStats のリスト
+
+        Returns:
+            LatencyStats: すべての計測値を含むインスタンス
+        """
+        combined = cls(stats_list[0].buckets if stats_list else LATENCY_BUCKETS)
+        for stats in stats_list:
+            combined.samples.extend(stats.samples)
+        combined._sorted = not combined.samples
+        return combined
+
+    def observe(self, seconds):
+        """計測値を追加（長時間のキャプチャでも1件あたり定数時間）"""
+        self.samples.append(seconds)
+        self._sorted = False
+
+    def _ordered(self):
+        """ソート済みの計測値"""
+        if not self._sorted:
+            self.samples.sort()
+            self._sorted = True
+        return self.samples
+
+    def percentile(self, p):
+        """
+        パーセンタイルを取得（最近傍法）
+
+        Args:
+            p (float): 0-100
+
+        Returns:
+            float: 計測値、計測がない場合はNone
+        """
+        samples = self._ordered()
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples) + 0.5)) - 1))
+        return samples[index]
+
+    def summary(self):
+        """
+        集計結果を取得
+
+        Returns:
+            dict: 件数、最小・最大、p50/p95/p99（ミリ秒）
+        """
+        samples = self._ordered()
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': len(samples),
+            'min_ms': round(samples[0] * 1000, 3),
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3)
+        }
+
+    def format_histogram(self, width=40):
+        """
+        ヒストグラムを文字列で表示
+
+        Returns:
+            str: バケットごとの件数と棒グラフ
+        """
+        counts = [0] * (len(self.buckets) + 1)
+        for value in self.samples:
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+        peak = max(counts) or 1
+        lines = []
+        for i, count in enumerate(counts):
+            if not count:
+                continue
+            label = f"<= {self.buckets[i] * 1000:g}ms" if i < len(self.buckets) else f" > {self.buckets[-1] * 1000:g}ms"
+            bar = "#" * max(1, count * width // peak)
+            lines.append(f"  {label:>10} {count:>7} {bar}")
+        return "\n".join(lines)
+
+
+class PendingCommand:
+    """応答待ちのコマンド"""
+
+    __slots__ = ('command', 'kind', 'sent_at', 'future')
+
+    def __init__(self, command, kind):
+        self.command = command
+        self.kind = kind  # "data"（GET_DATA）または "status"（その他のコマンド）
+        self.sent_at = None
+        self.future = Future()
+
+
+class SerialLink:
+    """シリアルポートの受信スレッドとコマンド・応答の対応付けを行うクラス"""
+
+    def __init__(self, ser, on_line=None):
+        """
+        初期化
+
+        Args:
+            ser (serial.Serial): 開いたシリアルポート
+            on_line (callable, optional): JSON以外の行（ログ出力）を受け取るコールバック
+        """
+        self.ser = ser
+        self.on_line = on_line
+        self.pending = {'data': deque(), 'status': deque()}  # 種類ごとの応答待ちコマンド（送信順）
+        self.lock = threading.Lock()  # 送信と応答待ちキューの操作を直列化
+        self.unsolicited = queue.Queue()  # 対応するコマンドがない応答
+        self.late_responses = 0  # タイムアウト後に届いた応答数
+        self._running = True
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """受信スレッドを停止"""
+        self._running = False
+        self._thread.join(timeout=1.0)
+
+    def submit(self, command):
+        """
+        コマンドを送信し、応答を受け取るFutureを返す（応答は待たない）
+
+        Args:
+            command (str): コマンド
+
+        Returns:
+            PendingCommand: 応答待ちのコマンド（future.result() で応答を取得）
+        """
+        pending = PendingCommand(command, 'data' if command == 'GET_DATA' else 'status')
+        with self.lock:
+            self.pending[pending.kind].append(pending)
+            pending.sent_at = time.perf_counter()
+            self.ser.write((command + '\n').encode())
+        return pending
+
+    def _read_loop(self):
+        """1行ずつ受信して応答待ちのコマンドに対応付けるループ"""
+        buffer = b""
+        while self._running:
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError):
+                break
+            if not chunk:
+                continue
+            received = time.perf_counter()
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                self._dispatch(line, received)
+
+    def _dispatch(self, line, received):
+        """受信した1行を解析して対応するコマンドに渡す"""
+        text = line.decode('utf-8', errors='replace').strip()
+        if not text:
+            return
+        try:
+            message = json.loads(text) if text.startswith('{') else None
+        except json.JSONDecodeError:
+            message = None
+        if not isinstance(message, dict):
+            if self.on_line:
+                self.on_line(text)
+            return
+
+        # データ応答は "data" を、コマンド応答は文字列の "status" を持つ
+        kind = 'data' if isinstance(message.get('data'), dict) else 'status'
+        with self.lock:
+            waiting = self.pending[kind]
+            # タイムアウトしてから十分時間が経った応答待ちは破棄（応答自体が失われた場合）
+            while waiting and waiting[0].future.done() and received - waiting[0].sent_at > STALE_AFTER:
+                waiting.popleft()
+            pending = waiting.popleft() if waiting else None
+
+        if pending is None:
+            self.unsolicited.put((received, message))
+        elif pending.future.done():
+            self.late_responses += 1
+        else:
+            pending.future.set_result((message, received - pending.sent_at))
+
+    def request(self, command, timeout=DEFAULT_TIMEOUT):
+        """
+        コマンドを送信して応答を待つ
+
+        Returns:
+            tuple: (応答, 応答時間（秒）)、タイムアウトした場合は (None, None)
+        """
+        pending = self.submit(command)
+        try:
+            return pending.future.result(timeout)
+        except FutureTimeout:
+            pending.future.cancel()
+            return None, None
+
 
 class LeverTestHarness:
     """レバー制御テストハーネスクラス"""
 
-    def __init__(self, port, baud=115200):
+    def __init__(self, port, baud=115200, settle=2.0, verbose=True):
         """初期化"""
         try:
-            self.ser = serial.Serial(port, baud, timeout=1)
-            time.sleep(2)  # 接続安定化待ち
+            self.ser = serial.serial_for_url(port, baudrate=baud, timeout=0.1)
+            time.sleep(settle)  # 接続安定化待ち（ESP8266はポートを開くとリセットされる）
+            self.ser.reset_input_buffer()
             print(f"接続成功: {port} @ {baud}bps")
-            self.data_log = []
-            self.test_results = []
         except serial.SerialException as e:
             print(f"エラー: シリアルポートに接続できません: {e}")
             sys.exit(1)
 
-    def send_command(self, command):
-        """JSONコマンドを送信"""
-        print(f"送信: {command}")
-        self.ser.write((command + '\n').encode())
-        time.sleep(0.1)
-        return self.get_response()
-
-    def get_response(self):
-        """レスポンスを受信してJSONとして解析"""
-        try:
-            response = self.ser.readline().decode().strip()
-            if response:
-                print(f"受信: {response}")
-                return json.loads(response)
-            return None
-        except json.JSONDecodeError:
-            print(f"JSON解析エラー: {response}")
-            return None
-        except UnicodeDecodeError:
-            print("デコードエラー: バイナリデータを受信")
+        self.verbose = verbose
+        self.link = SerialLink(self.ser, on_line=self._on_log_line)
+        self.data_log = []
+        self.test_results = []
+        self.latency = LatencyStats()  # 1件ずつ送信したコマンドの応答時間
+        self.latency_runs = [self.latency]  # 計測結果（連続送信ごとに追加、計測値は重複して保持しない）
+        self.timeouts = 0
+
+    def close(self):
+        """接続を閉じる"""
+        self.link.close()
+        self.ser.close()
+
+    def _on_log_line(self, line):
+        """ファームウェアのログ出力を表示"""
+        if self.verbose:
+            print(f"ログ: {line}")
+
+    def send_command(self, command, timeout=DEFAULT_TIMEOUT):
+        """コマンドを送信して応答を待つ（固定の待ち時間は入れない）"""
+        if self.verbose:
+            print(f"送信: {command}")
+        response, elapsed = self.link.request(command, timeout)
+        if response is None:
+            self.timeouts += 1
+            print(f"タイムアウト: {command} ({timeout}秒)")
             return None
 
+        self.latency.observe(elapsed)
+        if self.verbose:
+            print(f"受信 ({elapsed * 1000:.2f}ms): {json.dumps(response, ensure_ascii=False)}")
+        return response
+
     def get_data(self):
         """データ取得コマンド"""
         result = self.send_command("GET_DATA")
@@ -71,6 +313,120 @@ class LeverTestHarness:
         """デバイスID設定"""
         return self.send_command(f"SET_ID:{device_id}")
 
+    def pipelined(self, command, count, window=4, timeout=DEFAULT_TIMEOUT, on_response=None):
+        """
+        応答を待たずに最大window件のコマンドを送り続ける
+
+        Args:
+            command (str): 送信するコマンド
+            count (int): 送信回数（Noneの場合はon_responseがFalseを返すまで）
+            window (int): 同時に応答待ちにするコマンド数
+            timeout (float): 1件あたりの応答待ちのタイムアウト（秒）
+            on_response (callable, optional): on_response(response, latency, received_at) を応答ごとに呼び出す
+
+        Returns:
+            LatencyStats: 応答時間の統計
+        """
+        stats = LatencyStats()
+        self.latency_runs.append(stats)
+        in_flight = deque()
+        sent = 0
+        keep_going = True
+
+        while keep_going or in_flight:
+            while keep_going and len(in_flight) < window and (count is None or sent < count):
+                in_flight.append(self.link.submit(command))
+                sent += 1
+            if count is not None and sent >= count:
+                keep_going = False
+            if not in_flight:
+                break
+
+            pending = in_flight.popleft()
+            try:
+                response, latency = pending.future.result(timeout)
+            except FutureTimeout:
+                pending.future.cancel()
+                self.timeouts += 1
+                continue
+
+            stats.observe(latency)
+            if on_response and on_response(response, latency, time.time()) is False:
+                keep_going = False
+        return stats
+
+    def capture(self, filename, duration, fmt='csv', window=4):
+        """
+        GET_DATA をリンクの最大速度で送り続け、応答をファイルに書き出す
+
+        Args:
+            filename (str): 出力ファイル名
+            duration (float): キャプチャ時間（秒）
+            fmt (str): "csv" または "bin"
+            window (int): 同時に応答待ちにするコマンド数
+
+        Returns:
+            tuple: (書き出した件数, LatencyStats)
+        """
+        end = time.time() + duration
+        written = 0
+
+        if fmt == 'bin':
+            f = open(filename, 'wb')
+            f.write(CAPTURE_MAGIC)
+
+            def write(response, latency, received_at):
+                data = response['data']
+                f.write(CAPTURE_RECORD.pack(
+                    received_at, latency, int(response.get('timestamp', 0)) & 0xFFFFFFFF,
+                    data.get('raw', 0), data.get('smoothed', 0), data.get('value', 0),
+                    1 if data.get('calibrated') else 0
+                ))
+        else:
+            f = open(filename, 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(CAPTURE_FIELDS)
+
+            def write(response, latency, received_at):
+                data = response['data']
+                writer.writerow([
+                    f"{received_at:.6f}", f"{latency * 1000:.3f}", response.get('device_id', ''),
+                    response.get('timestamp', 0), data.get('raw', 0), data.get('smoothed', 0),
+                    data.get('value', 0), int(bool(data.get('calibrated')))
+                ])
+
+        def on_response(response, latency, received_at):
+            nonlocal written
+            write(response, latency, received_at)
+            written += 1
+            return time.time() < end
+
+        try:
+            stats = self.pipelined("GET_DATA", None, window=window, on_response=on_response)
+        finally:
+            f.close()
+        return written, stats
+
+    def response_time_test(self, iterations=100, window=1):
+        """
+        応答時間を計測
+
+        Args:
+            iterations (int): 計測回数
+            window (int): 同時に応答待ちにするコマンド数（1で1件ずつ）
+
+        Returns:
+            dict: 応答時間の集計とスループット
+        """
+        start = time.perf_counter()
+        stats = self.pipelined("GET_DATA", iterations, window=window)
+        elapsed = time.perf_counter() - start
+        summary = stats.summary()
+        summary['throughput'] = round(summary['count'] / elapsed, 1) if elapsed else 0.0
+        summary['window'] = window
+        summary['histogram'] = stats.format_histogram()
+        return summary
+
     def run_test_case(self, name, command_func, validation_func=None, args=None):
         """テストケース実行"""
         print(f"\nテストケース: {name}")
@@ -119,7 +475,7 @@ class LeverTestHarness:
         self.run_test_case(
             "デバイスID設定",
             self.set_device_id,
-            lambda resp: (resp and resp.get("status") == "OK", "ステータスOKを受信"),
+            lambda resp: (bool(resp) and resp.get("status") == "OK", "ステータスOKを受信"),
             ["test_lever"]
         )
 
@@ -127,7 +483,7 @@ class LeverTestHarness:
         self.run_test_case(
             "キャリブレーションリセット",
             self.reset_calibration,
-            lambda resp: (resp and resp.get("status") == "OK", "ステータスOKを受信")
+            lambda resp: (bool(resp) and resp.get("status") == "OK", "ステータスOKを受信")
         )
 
         # 3. データ取得テスト
@@ -143,33 +499,45 @@ class LeverTestHarness:
             validate_data
         )
 
-        # 4. 応答時間テスト
-        def run_response_time_test():
-            iterations = 10
-            total_time = 0
-
-            for i in range(iterations):
-                start = time.time()
-                self.get_data()
-                elapsed = time.time() - start
-                total_time += elapsed
+        # 4. 応答時間テスト（1件ずつ送信して純粋な往復時間を計測）
+        def validate_response_time(summary):
+            if not summary.get('count'):
+                return (False, "応答がありません")
+            message = (f"p50: {summary['p50_ms']:.2f}ms, p95: {summary['p95_ms']:.2f}ms, "
+                       f"p99: {summary['p99_ms']:.2f}ms ({summary['count']}回)")
+            return (summary['p99_ms'] < 100, message + ("" if summary['p99_ms'] < 100 else " (p99が100ms以上)"))
 
-            return total_time / iterations
+        self.run_test_case(
+            "応答時間テスト (100回)",
+            lambda: self.response_time_test(100, window=1),
+            validate_response_time
+        )
 
-        def validate_response_time(avg_time):
-            if avg_time < 0.1:
-                return (True, f"平均応答時間: {avg_time:.4f}秒")
-            else:
-                return (False, f"平均応答時間: {avg_time:.4f}秒 (0.1秒以上)")
+        # 5. スループットテスト（パイプライン化して送信）
+        def validate_throughput(summary):
+            if not summary.get('count'):
+                return (False, "応答がありません")
+            return (summary['count'] == 200, f"{summary['throughput']:.1f}件/秒, p99: {summary['p99_ms']:.2f}ms")
 
         self.run_test_case(
-            "応答時間テスト (10回)",
-            run_response_time_test,
-            validate_response_time
+            "スループットテスト (200回, 4件先行)",
+            lambda: self.response_time_test(200, window=4),
+            validate_throughput
         )
 
         print(f"\n===== テスト完了 {sum(1 for r in self.test_results if r['result']=='PASS')}/{len(self.test_results)} =====")
 
+    def print_latency_summary(self, stats=None):
+        """応答時間の集計を表示（省略時はこれまでのすべての計測）"""
+        stats = stats or LatencyStats.combine(self.latency_runs)
+        summary = stats.summary()
+        if not summary['count']:
+            print("応答時間の計測データがありません")
+            return
+        print(f"応答時間 ({summary['count']}回): min {summary['min_ms']:.2f}ms / p50 {summary['p50_ms']:.2f}ms / "
+              f"p95 {summary['p95_ms']:.2f}ms / p99 {summary['p99_ms']:.2f}ms / max {summary['max_ms']:.2f}ms")
+        print(stats.format_histogram())
+
     def save_log(self, filename="test_log.json"):
         """テストログを保存"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -195,22 +563,57 @@ class LeverTestHarness:
 def main():
     """メイン関数"""
     parser = argparse.ArgumentParser(description="レバー制御テストハーネス")
-    parser.add_argument("--port", required=True, help="シリアルポート名")
+    parser.add_argument("--port", help="シリアルポート名（pyserialのURLも可）")
     parser.add_argument("--baud", type=int, default=115200, help="ボーレート")
+    parser.add_argument("--emulate", action="store_true", help="ptyのファームウェアエミュレーターに接続（Linux/macOS）")
+    parser.add_argument("--settle", type=float, default=None, help="接続後の待ち時間（秒、既定は実機2秒・エミュレーター0秒）")
     parser.add_argument("--auto", action="store_true", help="自動テスト実行")
+    parser.add_argument("--capture", help="GET_DATAを連続取得してファイルに保存（.csv または .bin）")
+    parser.add_argument("--duration", type=float, default=10.0, help="キャプチャ時間（秒）")
+    parser.add_argument("--window", type=int, default=4, help="キャプチャ時に同時に応答待ちにするコマンド数")
     parser.add_argument("--log", default="test_log.json", help="データログ保存ファイル名")
     parser.add_argument("--results", default="test_results.csv", help="テスト結果保存ファイル名")
     args = parser.parse_args()
 
-    tester = LeverTestHarness(args.port, args.baud)
+    emulator = None
+    if args.emulate:
+        # エミュレーターはLeverAPIのシリアル接続デバイスソースと共通のものを使用
+        repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        sys.path.insert(0, os.path.join(repo_root, "LeverAPI", "tools"))
+        from serial_lever_emulator import FakeSerialLever
+        emulator = FakeSerialLever("lever_emulator", baudrate=args.baud, period=6.0, noise=4.0).start()
+        args.port = emulator.port
+        print(f"ファームウェアエミュレーター起動: {emulator.port}")
+    elif not args.port:
+        parser.error("--port または --emulate を指定してください")
+
+    settle = args.settle if args.settle is not None else (0.0 if emulator else 2.0)
+    tester = LeverTestHarness(args.port, args.baud, settle=settle, verbose=not (args.auto or args.capture))
+
+    try:
+        if args.capture:
+            fmt = 'bin' if args.capture.endswith('.bin') else 'csv'
+            print(f"{args.duration:.0f}秒間キャプチャ中: {args.capture} ({fmt}, {args.window}件先行)")
+            written, stats = tester.capture(args.capture, args.duration, fmt, args.window)
+            print(f"{written}件を保存しました ({written / args.duration:.1f}件/秒)")
+            tester.print_latency_summary(stats)
+            return
+
+        if args.auto:
+            tester.run_automated_test()
+            tester.print_latency_summary()
+            tester.save_log(args.log)
+            tester.save_test_results(args.results)
+            return
 
-    if args.auto:
-        tester.run_automated_test()
-        tester.save_log(args.log)
-        tester.save_test_results(args.results)
-        return
+        interactive(tester)
+    finally:
+        tester.close()
+        if emulator:
+            emulator.stop()
 
-    # 対話モード
+def interactive(tester):
+    """対話モード"""
     print("レバー制御テストハーネス")
     print("1. データ取得")
     print("2. キャリブレーションリセット")
@@ -220,6 +623,7 @@ def main():
     print("6. 自動テスト実行")
     print("7. ログ保存")
     print("8. テスト結果保存")
+    print("9. キャプチャ（CSV/バイナリ）")
     print("0. 終了")
 
     try:
@@ -235,6 +639,7 @@ def main():
                 print(json.dumps(tester.set_device_id(device_id), indent=2, ensure_ascii=False))
             elif choice == "4":
                 print("60秒間データをモニター（Ctrl+Cで中断）...")
+                tester.verbose = False
                 try:
                     for i in range(60):
                         data = tester.get_data()
@@ -245,24 +650,34 @@ def main():
                         time.sleep(1)
                 except KeyboardInterrupt:
                     print("モニター中断")
+                finally:
+                    tester.verbose = True
             elif choice == "5":
-                iterations = int(input("測定回数 (デフォルト: 10): ") or 10)
-                total_time = 0
-                for i in range(iterations):
-                    start = time.time()
-                    tester.get_data()
-                    elapsed = time.time() - start
-                    total_time += elapsed
-                avg_time = total_time / iterations
-                print(f"平均応答時間: {avg_time:.4f}秒 ({iterations}回測定)")
+                iterations = int(input("測定回数 (デフォルト: 100): ") or 100)
+                window = int(input("同時に応答待ちにする件数 (デフォルト: 1): ") or 1)
+                summary = tester.response_time_test(iterations, window)
+                if summary.get('count'):
+                    print(f"p50: {summary['p50_ms']:.2f}ms, p95: {summary['p95_ms']:.2f}ms, "
+                          f"p99: {summary['p99_ms']:.2f}ms, {summary['throughput']:.1f}件/秒 ({summary['count']}回測定)")
+                    print(summary['histogram'])
+                else:
+                    print("応答がありません")
             elif choice == "6":
+                tester.verbose = False
                 tester.run_automated_test()
+                tester.verbose = True
             elif choice == "7":
                 filename = input("保存ファイル名 (デフォルト: test_log.json): ") or "test_log.json"
                 tester.save_log(filename)
             elif choice == "8":
                 filename = input("保存ファイル名 (デフォルト: test_results.csv): ") or "test_results.csv"
                 tester.save_test_results(filename)
+            elif choice == "9":
+                filename = input("保存ファイル名 (.csv または .bin, デフォルト: capture.csv): ") or "capture.csv"
+                duration = float(input("キャプチャ時間 秒 (デフォルト: 10): ") or 10)
+                written, stats = tester.capture(filename, duration, 'bin' if filename.endswith('.bin') else 'csv')
+                print(f"{written}件を保存しました ({written / duration:.1f}件/秒)")
+                tester.print_latency_summary(stats)
             elif choice == "0":
                 break
             else:
@@ -271,4 +686,4 @@ def main():
         print("\nプログラムを終了します")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
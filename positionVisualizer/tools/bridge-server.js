@@ -27,6 +27,8 @@
   
   // Connect to LeverAPI WebSocket (Socket.IO)
   let leverApiSocket = null;
+  let slotMap = null; // { version, slots } announced by LeverAPI in slot mode
+  let slotMapRequestedFor = null; // map_version of the last frame that triggered a slot_map resend
   if (LEVER_API_URL) {
     try {
       leverApiSocket = io(LEVER_API_URL, {
@@ -39,6 +41,47 @@
 
       leverApiSocket.on('connect', () => {
         console.log('[bridge] Connected to LeverAPI WebSocket at', LEVER_API_URL);
+        // Request slot-indexed frames; older LeverAPI versions ignore this and keep sending per-device events
+        slotMap = null;
+        slotMapRequestedFor = null;
+        leverApiSocket.emit('slot_mode', { enabled: true });
+      });
+
+      // Slot mapping announced by LeverAPI (slot index -> device_id)
+      leverApiSocket.on('slot_map', (data) => {
+        if (data && Array.isArray(data.slots)) {
+          slotMap = data;
+          console.log(`[bridge] slot_map v${data.version}:`, data.slots);
+        }
+      });
+
+      // Dense value array, one entry per slot
+      leverApiSocket.on('slot_frame', (frame) => {
+        try {
+          if (!frame || !Array.isArray(frame.values)) return;
+          // Slot numbers are only meaningful through the matching slot_map; without it, ask LeverAPI to resend both
+          if (!slotMap || frame.map_version !== slotMap.version) {
+            if (slotMapRequestedFor !== frame.map_version) {
+              slotMapRequestedFor = frame.map_version;
+              console.log(`[bridge] slot_frame for map v${frame.map_version} (have v${slotMap ? slotMap.version : 'none'}), requesting slot_map`);
+              leverApiSocket.emit('slot_mode', { enabled: true });
+            }
+            return;
+          }
+          // Resolve slot -> device_id -> visualizer index, same mapping as the per-device events
+          const newValues = [null, null, null, null, null, null];
+          const count = Math.min(slotMap.slots.length, frame.values.length);
+          for (let i = 0; i < count; i++) {
+            const deviceId = slotMap.slots[i];
+            if (!deviceId || typeof frame.values[i] !== 'number') continue;
+            const index = getDeviceIndex(deviceId);
+            if (index >= 0 && index < 6) newValues[index] = frame.values[i];
+          }
+          latest = { ...latest, values: newValues, ts: Date.now() };
+          broadcast({ type: 'state', payload: latest });
+        } catch (error) {
+          console.error('Error processing slot_frame:', error);
+        }
       });
 
       leverApiSocket.on('disconnect', () => {